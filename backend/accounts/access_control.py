@@ -3,9 +3,9 @@ from functools import wraps
 from rest_framework.response import Response
 from rest_framework import status
 from organizations.models import OrganizationMembership
+from core.services.org_context import OrgContextService
+from core.services.entitlements import EntitlementService
 from django.utils.decorators import method_decorator
-from accounts.constants import PRO_FEATURES_ACCOUNTANT, PRO_FEATURES_MEMBER
-from django.utils import timezone
 from django.http import JsonResponse
 
 logger = logging.getLogger(__name__)
@@ -14,12 +14,13 @@ class AccessControlError(Exception):
     """Excepción personalizada para errores de control de acceso"""
     pass
 
-def get_user_role_in_org(user, org):
-    try:
-        membership = OrganizationMembership.objects.get(user=user, organization=org)
-        return membership.role
-    except OrganizationMembership.DoesNotExist:
-        return None
+def get_user_role_in_org(user, org, request=None):
+    # Contexto ya resuelto en el request (middleware) o caché en memoria de membresías
+    if request is not None:
+        context = OrgContextService.get_request_context(request, org)
+    else:
+        context = OrgContextService.get_context(user, org.id)
+    return context.role if context else None
 
 def require_access(required_roles=None, require_pro=False, allow_accountant_always=False, sponsor_only=False):
     """
@@ -57,13 +58,13 @@ def require_access(required_roles=None, require_pro=False, allow_accountant_alwa
                 raise AccessControlError("Only sponsors can perform this action.")
 
             # Check role access
-            user_role = get_user_role_in_org(user, org)
+            user_role = get_user_role_in_org(user, org, request=request)
             if required_roles and user_role not in required_roles:
                 logger.warning(f"Access denied: Insufficient role {user_role} for user {user.id}")
                 raise AccessControlError("Insufficient role permissions.")
 
             # Check Pro access
-            if require_pro and not has_pro_access(user, org):
+            if require_pro and not has_pro_access(user, org, request=request):
                 logger.warning(f"Access denied: Pro access required for user {user.id}")
                 raise AccessControlError("Pro access required.")
 
@@ -71,33 +72,8 @@ def require_access(required_roles=None, require_pro=False, allow_accountant_alwa
         return _wrapped_view
     return decorator
 
-def has_pro_access(user, organization=None, feature=None):
-    now = timezone.now()
-    # Acceso Pro global o trial
-    if getattr(user, 'pro_features', False) or (getattr(user, 'pro_trial_until', None) and user.pro_trial_until and user.pro_trial_until > now):
-        if feature:
-            if user.account_type == "accountant" and feature in PRO_FEATURES_ACCOUNTANT:
-                return True
-            if user.account_type == "personal" and feature in PRO_FEATURES_MEMBER:
-                return True
-        else:
-            return True
-    # Acceso por feature específica en la lista
-    if feature and feature in getattr(user, 'pro_features_list', []):
-        return True
-    # Acceso Pro por organización
-    if organization:
-        if getattr(organization, 'plan', None) == 'pro':
-            if feature:
-                if user.account_type == "accountant" and feature in PRO_FEATURES_ACCOUNTANT:
-                    return True
-                if user.account_type == "personal" and feature in PRO_FEATURES_MEMBER:
-                    return True
-            else:
-                return True
-        # Membership con pro_features_for_accountant
-        if hasattr(organization, 'memberships') and organization.memberships.filter(user=user, pro_features_for_accountant=True).exists():
-            return True
-    return False
+def has_pro_access(user, organization=None, feature=None, request=None):
+    # Bitset de derechos precalculado (ver core.services.entitlements)
+    return EntitlementService.has_pro_access(user, organization, feature=feature, request=request)
 
 # Para CBV, puedes usar method_decorator(require_access(...)) en dispatch o métodos específicos. 
\ No newline at end of file
@@ -0,0 +1,58 @@
+import time
+import uuid
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from core.services.access_control import AccessControlService
+
+
+class Command(BaseCommand):
+    help = 'Mide el coste de invalidar la caché de control de acceso según el número de claves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                            help='Número de claves cacheadas para el usuario en cada ronda')
+        parser.add_argument('--repeat', type=int, default=5, help='Invalidaciones medidas por ronda')
+
+    def handle(self, *args, **options):
+        supports_keys = hasattr(cache, 'keys')
+        self.stdout.write(f"{'claves':>8} {'INCR (ms)':>12} {'KEYS (ms)':>12}")
+
+        for size in options['sizes']:
+            # IDs sintéticos para no tocar entradas reales
+            run_id = uuid.uuid4().hex[:8]
+            user_id = f"bench-{run_id}"
+            org_ids = [f"bench-{run_id}-{index}" for index in range(size)]
+            keys = self.populate(user_id, org_ids)
+
+            versioned = self.measure(lambda: AccessControlService.clear_user_cache(user_id), options['repeat'])
+            if AccessControlService.get_cache_key(user_id, org_ids[0], 'role') == keys[0]:
+                self.stdout.write(self.style.ERROR('La invalidación no cambió la versión del namespace'))
+
+            legacy = None
+            if supports_keys:
+                # Coste del esquema anterior: buscar las claves por patrón
+                legacy = self.measure(
+                    lambda: cache.keys(f"{AccessControlService.CACHE_KEY_PREFIX}{user_id}:*"), options['repeat']
+                )
+
+            self.stdout.write(
+                f"{size:>8} {versioned:>12.3f} {legacy:>12.3f}" if legacy is not None
+                else f"{size:>8} {versioned:>12.3f} {'n/a':>12}"
+            )
+            cache.delete_many(keys + [AccessControlService.get_namespace_key('user', user_id)] + [
+                AccessControlService.get_namespace_key('org', org_id) for org_id in org_ids
+            ])
+
+        if not supports_keys:
+            self.stdout.write(self.style.WARNING('El backend de caché no soporta keys(); solo se mide INCR'))
+
+    def populate(self, user_id, org_ids):
+        keys = [AccessControlService.get_cache_key(user_id, org_id, 'role') for org_id in org_ids]
+        cache.set_many({key: 'member' for key in keys}, AccessControlService.CACHE_TIMEOUT)
+        return keys
+
+    def measure(self, func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) * 1000 / repeat
@@ -1,5 +1,6 @@
 import logging
-from organizations.models import Organization, OrganizationMembership
+from organizations.models import Organization
+from core.services.org_context import OrgContextService
 from django.http import JsonResponse
 from core.exceptions import OrganizationError
 from rest_framework_simplejwt.authentication import JWTAuthentication
@@ -28,6 +29,7 @@ class OrganizationMiddleware(MiddlewareMixin):
             '/api/organizations/',
             '/api/organizations/create/',
             '/api/payments/webhook/',
+            '/api/payments/stripe/webhook/',
             '/api/accounts/profile/',
             '/api/accounts/me/',
             '/api/profile/',
@@ -67,35 +69,40 @@ class OrganizationMiddleware(MiddlewareMixin):
 
         if org_id:
             try:
-                org = Organization.objects.get(id=org_id)
-                # Verificar que el usuario pertenece a la organización
-                if not OrganizationMembership.objects.filter(user=request.user, organization=org).exists():
+                org_id = int(org_id)
+            except (TypeError, ValueError):
+                org_id = None
+            # Membresías del usuario resueltas una vez y cacheadas en memoria
+            context = OrgContextService.get_context(request.user, org_id) if org_id else None
+            if context is None:
+                if org_id and Organization.objects.filter(id=org_id).exists():
                     logger.error(f"Usuario {request.user} no pertenece a la organización {org_id}")
                     return JsonResponse({
                         'detail': 'No perteneces a esta organización.',
                         'code': 'organization_not_member'
                     }, status=403)
-                request.organization = org
-                logger.info(f"Organización {org_id} inyectada por header/query en request de {request.user}")
-            except Organization.DoesNotExist:
                 logger.error(f"Organización {org_id} no encontrada para request de {request.user}")
                 return JsonResponse({
                     'detail': 'Organización no encontrada.',
                     'code': 'organization_not_found'
                 }, status=404)
+            request.organization = context.organization
+            request.org_context = context
+            logger.info(f"Organización {org_id} inyectada por header/query en request de {request.user}")
         else:
-            memberships = OrganizationMembership.objects.filter(user=request.user)
-            if memberships.count() == 1:
-                org = memberships.first().organization
-                request.organization = org
-                logger.info(f"Organización {org.id} inyectada por membresía única en request de {request.user}")
-            elif memberships.count() > 1:
+            memberships = list(OrgContextService.get_memberships(request.user).values())
+            if len(memberships) == 1:
+                context = OrgContextService.build_context(memberships[0])
+                request.organization = context.organization
+                request.org_context = context
+                logger.info(f"Organización {context.organization_id} inyectada por membresía única en request de {request.user}")
+            elif len(memberships) > 1:
                 # Si el usuario tiene múltiples organizaciones, requerimos que especifique una
                 logger.warning(f"Usuario {request.user} tiene múltiples organizaciones. Se requiere especificar una.")
                 return JsonResponse({
                     'detail': 'Se requiere especificar una organización.',
                     'code': 'organization_required',
-                    'organizations': [{'id': m.organization.id, 'name': m.organization.name} for m in memberships],
+                    'organizations': [{'id': m.organization_id, 'name': m.organization_name} for m in memberships],
                     'debug_info': {
                         'user_id': request.user.id,
                         'username': request.user.username,
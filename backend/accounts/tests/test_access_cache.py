@@ -0,0 +1,44 @@
+import pytest
+from unittest.mock import patch
+from django.core.cache import cache
+from accounts.models import User
+from organizations.models import Organization, OrganizationMembership
+from core.services.access_control import AccessControlService
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+def test_clear_user_cache_is_a_single_incr_without_keys_scan():
+    keys = [AccessControlService.get_cache_key(7, org_id, 'role') for org_id in range(50)]
+    cache.set_many({key: 'admin' for key in keys})
+
+    with patch.object(cache, 'incr', wraps=cache.incr) as incr, \
+            patch.object(cache, 'keys', create=True) as keys_scan:
+        AccessControlService.clear_user_cache(7)
+
+    incr.assert_called_once()
+    keys_scan.assert_not_called()
+    assert all(AccessControlService.get_cache_key(7, org_id, 'role') not in keys for org_id in range(50))
+
+def test_clear_org_cache_only_affects_that_org():
+    before = [AccessControlService.get_cache_key(user_id, 1) for user_id in range(3)]
+    other = AccessControlService.get_cache_key(0, 2)
+
+    AccessControlService.clear_org_cache(1)
+
+    assert [AccessControlService.get_cache_key(user_id, 1) for user_id in range(3)] != before
+    assert AccessControlService.get_cache_key(0, 2) == other
+
+@pytest.mark.django_db
+def test_membership_change_invalidates_cached_role():
+    user = User.objects.create(username="cached_role_user")
+    org = Organization.objects.create(name="Cached Role Org")
+    membership = OrganizationMembership.objects.create(user=user, organization=org, role="member")
+    assert AccessControlService.get_user_role_in_org(user, org) == "member"
+
+    membership.role = "admin"
+    membership.save()
+    assert AccessControlService.get_user_role_in_org(user, org) == "admin"
@@ -0,0 +1,62 @@
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from accounts.models import User
+from organizations.models import Organization, OrganizationMembership
+from core.services.entitlements import EntitlementService
+from core.services.org_context import OrgContextService
+
+@pytest.fixture(autouse=True)
+def clear_org_context():
+    OrgContextService.clear()
+    yield
+    OrgContextService.clear()
+
+@pytest.mark.django_db
+def test_org_plan_grants_only_account_type_features():
+    user = User.objects.create(username="plan_user", account_type="personal")
+    org = Organization.objects.create(name="Plan Org", plan="pro")
+    assert EntitlementService.has_pro_access(user, org) is True
+    assert EntitlementService.has_pro_access(user, org, feature="bank_integrations") is True
+    assert EntitlementService.has_pro_access(user, org, feature="multi_org_panel") is False
+
+@pytest.mark.django_db
+def test_accountant_membership_flag_grants_every_feature():
+    user = User.objects.create(username="flag_user", account_type="personal")
+    org = Organization.objects.create(name="Flag Org")
+    OrganizationMembership.objects.create(user=user, organization=org, role="accountant", pro_features_for_accountant=True)
+    assert EntitlementService.has_pro_access(user, org, feature="audit_tools") is True
+    assert EntitlementService.has_pro_access(user) is False
+
+@pytest.mark.django_db
+def test_checks_are_answered_without_queries(django_assert_num_queries):
+    user = User.objects.create(username="bits_user", account_type="accountant", pro_features_list=["custom_feature"])
+    org = Organization.objects.create(name="Bits Org")
+    OrganizationMembership.objects.create(user=user, organization=org, role="admin")
+    EntitlementService.has_pro_access(user, org)
+
+    with django_assert_num_queries(0):
+        assert EntitlementService.has_pro_access(user, org, feature="custom_feature") is True
+        assert EntitlementService.has_pro_access(user, org, feature="incentives") is False
+        assert EntitlementService.has_pro_access(user, org) is False
+
+@pytest.mark.django_db
+def test_expired_trial_is_recomputed():
+    user = User.objects.create(username="expiring_user", account_type="accountant", pro_trial_until=timezone.now() + timedelta(days=1))
+    assert EntitlementService.has_pro_access(user, feature="incentives") is True
+
+    user.pro_trial_until = timezone.now() - timedelta(seconds=1)
+    assert EntitlementService.has_pro_access(user, feature="incentives") is False
+
+@pytest.mark.django_db
+def test_org_bits_are_stored_with_the_context_and_refreshed_on_plan_change():
+    user = User.objects.create(username="stored_bits_user", account_type="personal")
+    org = Organization.objects.create(name="Stored Bits Org")
+    OrganizationMembership.objects.create(user=user, organization=org, role="admin")
+    assert OrgContextService.get_context(user, org.id).entitlement_mask == 0
+    assert EntitlementService.has_pro_access(user, org) is False
+
+    org.plan = "pro"
+    org.save()
+    assert OrgContextService.get_context(user, org.id).entitlement_mask != 0
+    assert EntitlementService.has_pro_access(user, org, feature="bank_integrations") is True
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+import pytest
+from django.test import RequestFactory
+from accounts.models import User
+from organizations.models import Organization, OrganizationMembership
+from accounts.access_control import get_user_role_in_org
+from core.services.org_context import OrgContextService
+
+@pytest.fixture(autouse=True)
+def clear_org_context():
+    OrgContextService.clear()
+    yield
+    OrgContextService.clear()
+
+@pytest.fixture
+def membership():
+    user = User.objects.create(username="ctx_user")
+    org = Organization.objects.create(name="Ctx Org", plan="pro")
+    return OrganizationMembership.objects.create(user=user, organization=org, role="accountant")
+
+@pytest.mark.django_db
+def test_memberships_are_cached_in_process(membership, django_assert_num_queries):
+    user = membership.user
+    with django_assert_num_queries(1):
+        OrgContextService.get_memberships(user)
+    with django_assert_num_queries(0):
+        context = OrgContextService.get_context(user, membership.organization_id)
+    assert context.role == "accountant"
+    assert context.organization == membership.organization
+    assert context.is_pro_plan is True
+
+@pytest.mark.django_db
+def test_membership_change_invalidates_cache(membership):
+    user = membership.user
+    assert OrgContextService.get_context(user, membership.organization_id).role == "accountant"
+
+    membership.role = "admin"
+    membership.save()
+    assert OrgContextService.get_context(user, membership.organization_id).role == "admin"
+
+    membership.delete()
+    assert OrgContextService.get_context(user, membership.organization_id) is None
+
+@pytest.mark.django_db
+def test_organization_change_invalidates_cache(membership):
+    org = membership.organization
+    OrgContextService.get_context(membership.user, org.id)
+
+    org.plan = "free"
+    org.save()
+    assert OrgContextService.get_context(membership.user, org.id).is_pro_plan is False
+
+@pytest.mark.django_db
+def test_role_is_memoized_on_request(membership, django_assert_num_queries):
+    request = RequestFactory().get("/")
+    request.user = membership.user
+    request.organization = membership.organization
+
+    assert get_user_role_in_org(request.user, request.organization, request=request) == "accountant"
+    OrgContextService.clear()
+    with django_assert_num_queries(0):
+        assert get_user_role_in_org(request.user, request.organization, request=request) == "accountant"
+
+@pytest.mark.django_db
+def test_invalidation_reaches_other_processes(membership):
+    class OtherProcess(OrgContextService):
+        """Same service with its own in-process LRU, as in a second worker"""
+        _lock = threading.Lock()
+        _entries = OrderedDict()
+
+    user = membership.user
+    assert OtherProcess.get_context(user, membership.organization_id).role == "accountant"
+
+    # The signal runs in this process; the other one only shares the cache backend
+    membership.role = "viewer"
+    membership.save()
+    assert OtherProcess.get_context(user, membership.organization_id).role == "viewer"
+
+    membership.delete()
+    assert OtherProcess.get_context(user, membership.organization_id) is None
@@ -0,0 +1,51 @@
+import logging
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError, AuthenticationFailed
+
+logger = logging.getLogger(__name__)
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Autenticación JWT para conexiones WebSocket.
+
+    Los navegadores no permiten cabeceras propias en el handshake, así que el
+    token de acceso se acepta en el query string (``?token=<access>``) o, para
+    otros clientes, en la cabecera ``Authorization: Bearer <access>``. Deja el
+    usuario en ``scope['user']`` (AnonymousUser si el token falta o no es válido).
+    """
+
+    def __init__(self, inner):
+        super().__init__(inner)
+        self.jwt_auth = JWTAuthentication()
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        raw_token = self.get_raw_token(scope)
+        scope['user'] = await self.get_user(raw_token) if raw_token else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def get_raw_token(scope):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        if query.get('token'):
+            return query['token'][0]
+        for name, value in scope.get('headers', []):
+            if name == b'authorization':
+                parts = value.decode().split()
+                if len(parts) == 2 and parts[0].lower() == 'bearer':
+                    return parts[1]
+        return None
+
+    @database_sync_to_async
+    def get_user(self, raw_token):
+        try:
+            validated_token = self.jwt_auth.get_validated_token(raw_token)
+            return self.jwt_auth.get_user(validated_token)
+        except (InvalidToken, TokenError, AuthenticationFailed) as e:
+            logger.warning(f"Token WebSocket inválido: {e}")
+            return AnonymousUser()
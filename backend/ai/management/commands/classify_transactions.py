@@ -0,0 +1,42 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from organizations.models import Organization
+from transactions.models import Transaction
+from ai.ml.classifiers.transaction import TransactionClassifier
+from ai.ml.registry import model_registry
+
+
+class Command(BaseCommand):
+    help = 'Clasifica en lote las transacciones no analizadas de una organización'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--organization', type=int, required=True, help='ID de la organización')
+        parser.add_argument('--batch-size', type=int, default=settings.AI_CLASSIFICATION_BATCH_SIZE,
+                            help='Transacciones por llamada a predict_proba')
+        parser.add_argument('--all', action='store_true',
+                            help='Reclasificar también las transacciones ya analizadas')
+
+    def handle(self, *args, **options):
+        if not Organization.objects.filter(pk=options['organization']).exists():
+            raise CommandError(f"La organización {options['organization']} no existe")
+
+        classifier = model_registry.get(TransactionClassifier)
+        if classifier.model is None:
+            raise CommandError(f"No hay un modelo entrenado en {classifier.model_path}")
+
+        transactions = Transaction.objects.filter(organization_id=options['organization'])
+        if not options['all']:
+            transactions = transactions.filter(ai_analyzed=False)
+
+        total = transactions.count()
+        self.stdout.write(f'Clasificando {total} transacciones...')
+
+        started = time.monotonic()
+        stats = classifier.predict_batch(transactions, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        rate = stats['classified'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Se clasificaron {stats['classified']} transacciones en {elapsed:.2f}s ({rate:.0f} transacciones/s)"
+        ))
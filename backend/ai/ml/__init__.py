@@ -7,10 +7,13 @@ from .base import BaseMLModel
 from .classifiers.transaction import TransactionClassifier
 from .predictors.expense import ExpensePredictor
 from .analyzers.behavior import BehaviorAnalyzer
+from .registry import ModelRegistry, model_registry
 
 __all__ = [
     'BaseMLModel',
     'TransactionClassifier',
     'ExpensePredictor',
     'BehaviorAnalyzer',
+    'ModelRegistry',
+    'model_registry',
 ] 
\ No newline at end of file
@@ -1,6 +1,7 @@
 """
 Behavior analyzer for identifying spending patterns and anomalies.
 """
+from sklearn.base import clone
 from sklearn.cluster import DBSCAN
 from sklearn.preprocessing import StandardScaler
 import numpy as np
@@ -24,6 +25,19 @@ class BehaviorAnalyzer(BaseMLModel):
             metric='euclidean'
         )
     
+    def train(self, transactions):
+        """
+        No-op: the analyzer is unsupervised and fits its clustering on every
+        analyzed set (see ``analyze_spending_patterns``).
+        """
+        return None
+
+    def predict(self, transactions):
+        """
+        Analyze the spending patterns of ``transactions``.
+        """
+        return self.analyze_spending_patterns(transactions)
+    
     def _prepare_features(self, transactions):
         """
         Prepare features for behavior analysis.
@@ -54,11 +68,10 @@ class BehaviorAnalyzer(BaseMLModel):
         Returns:
             np.array: Boolean array indicating anomalies
         """
-        # Scale features
-        scaled_features = self.scaler.fit_transform(features)
-        
-        # Fit clustering model
-        clusters = self.clustering_model.fit_predict(scaled_features)
+        # The analyzer is shared through the model registry: fit unfitted
+        # copies so concurrent analyses never touch its estimators
+        scaled_features = clone(self.scaler).fit_transform(features)
+        clusters = clone(self.clustering_model).fit_predict(scaled_features)
         
         # Mark points in cluster -1 as anomalies
         return clusters == -1
@@ -62,13 +62,16 @@ class BaseMLModel(ABC):
             self.logger.error(f"Error saving model: {str(e)}")
             raise
     
-    def load(self):
+    def load(self, mmap_mode=None):
         """
         Load a trained model from disk.
+        
+        Args:
+            mmap_mode: joblib memory-map mode for numpy arrays (e.g. 'r'), or None
         """
         try:
             if self.model_path.exists():
-                self.model = joblib.load(self.model_path)
+                self.model = joblib.load(self.model_path, mmap_mode=mmap_mode)
                 self.logger.info(f"Model loaded from {self.model_path}")
             else:
                 self.logger.warning(f"No saved model found at {self.model_path}")
@@ -1,10 +1,12 @@
 """
 Transaction classifier for categorizing financial transactions.
 """
+from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
+from itertools import islice
 import numpy as np
 import pandas as pd
 from ..base import BaseMLModel
@@ -19,13 +21,16 @@ class TransactionClassifier(BaseMLModel):
     
     def __init__(self):
         super().__init__('transaction_classifier')
+        # TF-IDF only sees the description column; the numeric columns are scaled
         self.pipeline = Pipeline([
-            ('vectorizer', TfidfVectorizer(
-                max_features=1000,
-                stop_words='english',
-                ngram_range=(1, 2)
-            )),
-            ('scaler', StandardScaler(with_mean=False)),
+            ('features', ColumnTransformer([
+                ('vectorizer', TfidfVectorizer(
+                    max_features=1000,
+                    stop_words='english',
+                    ngram_range=(1, 2)
+                ), 'description'),
+                ('scaler', StandardScaler(), list(self.NUMERIC_FEATURES)),
+            ])),
             ('classifier', RandomForestClassifier(
                 n_estimators=100,
                 max_depth=10,
@@ -33,6 +38,10 @@ class TransactionClassifier(BaseMLModel):
             ))
         ])
         self.categories = None
+
+    # Fields read from the database for batch inference
+    BATCH_FIELDS = ('id', 'description', 'amount', 'date')
+    NUMERIC_FEATURES = ('amount', 'day_of_week', 'day_of_month', 'month')
     
     def _prepare_features(self, transactions):
         """
@@ -48,7 +57,7 @@ class TransactionClassifier(BaseMLModel):
             transactions = [transactions]
             
         features = pd.DataFrame({
-            'description': [t.description for t in transactions],
+            'description': [t.description or '' for t in transactions],
             'amount': [float(t.amount) for t in transactions],
             'day_of_week': [t.date.weekday() for t in transactions],
             'day_of_month': [t.date.day for t in transactions],
@@ -56,6 +65,30 @@ class TransactionClassifier(BaseMLModel):
         })
         
         return features
+
+    def _prepare_batch_features(self, rows):
+        """
+        Build the feature frame for many transactions at once, column-wise.
+
+        Args:
+            rows: List of dicts with the keys in ``BATCH_FIELDS``
+
+        Returns:
+            pd.DataFrame: Same columns as ``_prepare_features``
+        """
+        count = len(rows)
+        amounts = np.fromiter((row['amount'] or 0 for row in rows), dtype=np.float64, count=count)
+        days = np.array([row['date'] for row in rows], dtype='datetime64[D]')
+        months = days.astype('datetime64[M]')
+
+        return pd.DataFrame({
+            'description': [row['description'] or '' for row in rows],
+            'amount': amounts,
+            # 1970-01-01 was a Thursday (weekday() == 3)
+            'day_of_week': (days.astype(np.int64) + 3) % 7,
+            'day_of_month': (days - months).astype(np.int64) + 1,
+            'month': months.astype(np.int64) % 12 + 1
+        })
     
     def train(self, transactions):
         """
@@ -76,6 +109,7 @@ class TransactionClassifier(BaseMLModel):
             self.pipeline.fit(X, y)
             
             # Save the trained model
+            self.model = self.pipeline
             self.save()
             
             self.logger.info(f"Model trained on {len(transactions)} transactions")
@@ -84,6 +118,14 @@ class TransactionClassifier(BaseMLModel):
             self.logger.error(f"Error training model: {str(e)}")
             raise
     
+    def load(self, mmap_mode=None):
+        """
+        Load the trained pipeline from disk.
+        """
+        super().load(mmap_mode=mmap_mode)
+        if self.model is not None:
+            self.pipeline = self.model
+    
     def predict(self, transaction):
         """
         Predict the category for a transaction.
@@ -111,6 +153,72 @@ class TransactionClassifier(BaseMLModel):
             self.logger.error(f"Error making prediction: {str(e)}")
             raise
     
+    def iter_predictions(self, transactions, batch_size=1000):
+        """
+        Score transactions with one ``predict_proba`` per batch, yielding each batch.
+
+        Args:
+            transactions: Transaction queryset, or list of dicts with ``BATCH_FIELDS``
+            batch_size: Number of transactions scored per ``predict_proba`` call
+
+        Yields:
+            list: (transaction_id, category_id, confidence_score) tuples of one batch
+        """
+        if hasattr(transactions, 'values'):
+            rows = transactions.order_by().values(*self.BATCH_FIELDS).iterator(chunk_size=batch_size)
+        else:
+            rows = iter(transactions)
+
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            try:
+                probs = self.pipeline.predict_proba(self._prepare_batch_features(batch))
+            except Exception as e:
+                self.logger.error(f"Error making batch prediction: {str(e)}")
+                raise
+
+            best = np.argmax(probs, axis=1)
+            category_ids = self.pipeline.classes_[best]
+            confidences = probs[np.arange(len(batch)), best]
+            yield [
+                (row['id'], int(category_id), float(confidence))
+                for row, category_id, confidence in zip(batch, category_ids, confidences)
+            ]
+
+    def predict_batch(self, transactions, batch_size=1000):
+        """
+        Predict categories for many transactions and store them batch by batch.
+
+        Each batch is written with ``bulk_update`` (``ai_category_suggestion``,
+        ``ai_confidence`` and ``ai_analyzed``) as soon as it is scored, so
+        memory does not grow with the number of transactions.
+
+        Args:
+            transactions: Transaction queryset, or list of dicts with ``BATCH_FIELDS``
+            batch_size: Number of transactions scored per ``predict_proba`` call
+
+        Returns:
+            dict: Number of transactions classified and batches written
+        """
+        stats = {'classified': 0, 'batches': 0}
+        for predictions in self.iter_predictions(transactions, batch_size=batch_size):
+            Transaction.objects.bulk_update([
+                Transaction(
+                    id=transaction_id,
+                    ai_analyzed=True,
+                    ai_confidence=confidence,
+                    ai_category_suggestion_id=category_id
+                )
+                for transaction_id, category_id, confidence in predictions
+            ], ['ai_analyzed', 'ai_confidence', 'ai_category_suggestion'], batch_size=batch_size)
+            stats['classified'] += len(predictions)
+            stats['batches'] += 1
+
+        self.logger.info(f"Batch prediction done for {stats['classified']} transactions")
+        return stats
+
     def evaluate(self, test_transactions):
         """
         Evaluate the model's performance.
@@ -3,12 +3,12 @@ Expense predictor for forecasting future expenses.
 """
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler
+import joblib
 import numpy as np
 import pandas as pd
 from ..base import BaseMLModel
 from django.db.models import Q
-from transactions.models import Transaction
-from datetime import timedelta
+from transactions.models import Transaction, Category
 
 class ExpensePredictor(BaseMLModel):
     """
@@ -25,6 +25,32 @@ class ExpensePredictor(BaseMLModel):
             random_state=42
         )
     
+    @property
+    def is_trained(self):
+        """Whether the scaler (and so the regressor) has been fitted."""
+        return hasattr(self.scaler, 'mean_')
+
+    def save(self):
+        """
+        Save the regressor together with its fitted scaler.
+        """
+        try:
+            self.model_path.parent.mkdir(parents=True, exist_ok=True)
+            joblib.dump({'model': self.model, 'scaler': self.scaler}, self.model_path)
+            self.logger.info(f"Model saved to {self.model_path}")
+        except Exception as e:
+            self.logger.error(f"Error saving model: {str(e)}")
+            raise
+
+    def load(self, mmap_mode=None):
+        """
+        Load the regressor and its scaler from disk.
+        """
+        super().load(mmap_mode=mmap_mode)
+        if isinstance(self.model, dict):
+            self.scaler = self.model['scaler']
+            self.model = self.model['model']
+
     def _prepare_features(self, transactions):
         """
         Prepare features for training or prediction.
@@ -134,40 +160,80 @@ class ExpensePredictor(BaseMLModel):
             self.logger.error(f"Error making prediction: {str(e)}")
             raise
     
-    def predict_sequence(self, start_date, days=30):
+    def _prepare_grid_features(self, start_date, days, category_ids):
+        """
+        Build the day x category feature grid for a forecast horizon.
+        
+        Args:
+            start_date: First day of the horizon
+            days: Number of days in the horizon
+            category_ids: Category IDs to forecast
+            
+        Returns:
+            tuple: (np.ndarray of dates, pd.DataFrame with one row per (day, category))
         """
-        Predict expenses for a sequence of days.
+        dates = np.arange(
+            np.datetime64(start_date, 'D'), np.datetime64(start_date, 'D') + days
+        )
+        months = dates.astype('datetime64[M]')
+        n_categories = len(category_ids)
+
+        features = pd.DataFrame({
+            # 1970-01-01 was a Thursday (weekday() == 3)
+            'day_of_week': np.repeat((dates.astype(np.int64) + 3) % 7, n_categories),
+            'day_of_month': np.repeat((dates - months).astype(np.int64) + 1, n_categories),
+            'month': np.repeat(months.astype(np.int64) % 12 + 1, n_categories),
+            'category_id': np.tile(np.asarray(category_ids, dtype=np.int64), days)
+        })
+
+        return dates, features
+
+    def predict_sequence(self, organization, start_date, days=30, category_ids=None):
+        """
+        Predict expenses per category and in total for a sequence of days.
+        
+        The whole day x category grid is scaled and predicted in a single call.
         
         Args:
+            organization: Organization whose categories are forecast (required)
             start_date: Start date for prediction
             days: Number of days to predict
+            category_ids: Explicit category IDs, limited to the organization's
+                categories (defaults to the categories used by its transactions)
             
         Returns:
-            pd.DataFrame: Predictions for each day
+            pd.DataFrame: One row per day with ``predicted_amount`` (total) and
+            ``by_category`` ({category_id: amount})
         """
         try:
-            predictions = []
-            current_date = start_date
-            
-            for _ in range(days):
-                # Get all categories
-                categories = Transaction.objects.values_list('category_id', flat=True).distinct()
-                
-                # Predict for each category
-                daily_total = 0
-                for category_id in categories:
-                    prediction = self.predict(current_date, category_id)
-                    daily_total += prediction
-                
-                predictions.append({
-                    'date': current_date,
-                    'predicted_amount': daily_total
-                })
-                
-                current_date += timedelta(days=1)
-            
-            return pd.DataFrame(predictions)
+            if organization is None:
+                raise ValueError("An organization is required to predict expenses")
+            if category_ids is None:
+                category_ids = Transaction.objects.filter(
+                    organization=organization, category__isnull=False
+                ).order_by().values_list('category_id', flat=True).distinct()
+            else:
+                category_ids = Category.objects.filter(
+                    organization=organization, id__in=list(category_ids)
+                ).values_list('id', flat=True)
+            category_ids = sorted(category_ids)
+
+            dates, features = self._prepare_grid_features(start_date, days, category_ids)
+
+            if category_ids:
+                predictions = self.model.predict(self.scaler.transform(features))
+                grid = np.clip(predictions, 0, None).reshape(days, len(category_ids))
+            else:
+                grid = np.zeros((days, 0))
+
+            return pd.DataFrame({
+                'date': dates.astype(object),
+                'predicted_amount': grid.sum(axis=1),
+                'by_category': [
+                    dict(zip(category_ids, row.tolist())) for row in grid
+                ]
+            })
             
         except Exception as e:
             self.logger.error(f"Error making sequence prediction: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
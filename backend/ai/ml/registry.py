@@ -0,0 +1,115 @@
+"""
+Process-wide registry of loaded ML models.
+"""
+import threading
+import time
+from django.conf import settings
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger('ai.ml.registry')
+
+
+class ModelRegistry:
+    """
+    Keeps one loaded instance of each ``BaseMLModel`` subclass per worker process.
+
+    The model file is loaded from ``ML_MODELS_DIR`` the first time a model is
+    requested (optionally memory-mapped through joblib's ``mmap_mode``) and is
+    reloaded only when the file's modification time or size changes. Load
+    timings are kept per model and exposed through ``stats()``.
+    """
+
+    def __init__(self, mmap_mode=None):
+        self.mmap_mode = mmap_mode
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, model_class):
+        """
+        Return the shared, loaded instance of ``model_class``.
+
+        Args:
+            model_class: BaseMLModel subclass
+
+        Returns:
+            BaseMLModel: Loaded instance (untrained if no model file exists yet)
+        """
+        entry = self._entries.get(model_class)
+        if entry is not None and entry['version'] == self._file_version(entry['instance']):
+            entry['hits'] += 1
+            return entry['instance']
+
+        with self._lock:
+            # Another thread may have loaded it while we were waiting
+            entry = self._entries.get(model_class)
+            if entry is not None and entry['version'] == self._file_version(entry['instance']):
+                entry['hits'] += 1
+                return entry['instance']
+            return self._load(model_class, previous=entry)['instance']
+
+    def reload(self, model_class):
+        """Force a reload of ``model_class`` from disk."""
+        with self._lock:
+            return self._load(model_class, previous=self._entries.get(model_class))['instance']
+
+    def clear(self):
+        """Drop every loaded model."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Load statistics for every registered model.
+
+        Returns:
+            dict: model_name -> loaded flag, load timings, load count and cache hits
+        """
+        return {
+            entry['instance'].model_name: {
+                'path': str(entry['instance'].model_path),
+                'loaded': entry['version'] is not None,
+                'mmap_mode': self.mmap_mode,
+                'loads': entry['loads'],
+                'hits': entry['hits'],
+                'last_load_seconds': entry['last_load_seconds'],
+                'total_load_seconds': entry['total_load_seconds'],
+                'loaded_at': entry['loaded_at'],
+            }
+            for entry in list(self._entries.values())
+        }
+
+    def _load(self, model_class, previous=None):
+        instance = model_class()
+        version = self._file_version(instance)
+
+        started = time.perf_counter()
+        if version is not None:
+            instance.load(mmap_mode=self.mmap_mode)
+        elapsed = time.perf_counter() - started
+
+        entry = {
+            'instance': instance,
+            'version': version,
+            'loads': (previous['loads'] if previous else 0) + 1,
+            'hits': previous['hits'] if previous else 0,
+            'last_load_seconds': round(elapsed, 6),
+            'total_load_seconds': round((previous['total_load_seconds'] if previous else 0) + elapsed, 6),
+            'loaded_at': timezone.now().isoformat(),
+        }
+        self._entries[model_class] = entry
+        if version is not None:
+            logger.info(f"Loaded {instance.model_name} in {elapsed:.3f}s")
+        return entry
+
+    @staticmethod
+    def _file_version(instance):
+        """(mtime, size) of the model file, or None if it doesn't exist."""
+        try:
+            stat = instance.model_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+
+model_registry = ModelRegistry(mmap_mode=getattr(settings, 'ML_MODELS_MMAP_MODE', None))
@@ -7,6 +7,7 @@ from .models import AIInteraction, AIInsight, AIPrediction
 from .ml.classifiers.transaction import TransactionClassifier
 from .ml.predictors.expense import ExpensePredictor
 from .ml.analyzers.behavior import BehaviorAnalyzer
+from .ml.registry import model_registry
 from transactions.models import Transaction
 import json
 import logging
@@ -22,17 +23,17 @@ class AIService:
         """
         Initialize AI service with ML models.
         """
-        self.transaction_classifier = TransactionClassifier()
-        self.expense_predictor = ExpensePredictor()
-        self.behavior_analyzer = BehaviorAnalyzer()
-        
-        # Load trained models if available
+        # Shared per-process instances: loaded from disk once and reloaded
+        # only when the model file changes
         try:
-            self.transaction_classifier.load()
-            self.expense_predictor.load()
-            self.behavior_analyzer.load()
+            self.transaction_classifier = model_registry.get(TransactionClassifier)
+            self.expense_predictor = model_registry.get(ExpensePredictor)
+            self.behavior_analyzer = model_registry.get(BehaviorAnalyzer)
         except Exception as e:
             logger.warning(f"Could not load trained models: {str(e)}")
+            self.transaction_classifier = TransactionClassifier()
+            self.expense_predictor = ExpensePredictor()
+            self.behavior_analyzer = BehaviorAnalyzer()
     
     def process_query(self, user, query, context=None, interaction_type='general'):
         """
@@ -120,12 +121,33 @@ class AIService:
             logger.error(f"Error analyzing transaction: {str(e)}")
             raise
     
-    def predict_expenses(self, user, start_date, days=30):
+    def classify_transactions(self, transactions, batch_size=None):
         """
-        Predict future expenses.
+        Classify many transactions in batches and store the suggestions.
+        
+        Args:
+            transactions: Transaction queryset
+            batch_size: Transactions per prediction call
+            
+        Returns:
+            dict: Number of transactions classified and batches written
+        """
+        try:
+            return self.transaction_classifier.predict_batch(
+                transactions,
+                batch_size=batch_size or settings.AI_CLASSIFICATION_BATCH_SIZE
+            )
+        except Exception as e:
+            logger.error(f"Error classifying transactions: {str(e)}")
+            raise
+    
+    def predict_expenses(self, user, organization, start_date, days=30):
+        """
+        Predict future expenses of an organization.
         
         Args:
             user: User object
+            organization: Organization whose expenses are forecast
             start_date: Start date for prediction
             days: Number of days to predict
             
@@ -133,30 +155,44 @@ class AIService:
             dict: Prediction results
         """
         try:
-            # Get historical transactions
-            transactions = Transaction.objects.filter(
-                user=user,
+            # Get historical transactions of the organization
+            transactions = list(Transaction.objects.filter(
+                organization=organization,
+                category__isnull=False,
                 date__lt=start_date
-            ).order_by('-date')[:1000]
+            ).select_related('category').order_by('-date')[:1000])
             
-            # Train predictor if needed
-            if not self.expense_predictor.model:
-                self.expense_predictor.train(transactions)
+            # Train predictor if needed. The registry instance is shared by every
+            # request of this worker, so a separate instance is trained and saved
+            # and the registry swaps it in
+            if not self.expense_predictor.is_trained:
+                if not transactions:
+                    raise ValueError("No categorized transactions to train the expense predictor on")
+                ExpensePredictor().train(transactions)
+                self.expense_predictor = model_registry.reload(ExpensePredictor)
             
             # Make predictions
-            predictions = self.expense_predictor.predict_sequence(start_date, days)
+            predictions = self.expense_predictor.predict_sequence(organization, start_date, days)
+            records = [
+                {
+                    'date': row['date'].isoformat(),
+                    'predicted_amount': float(row['predicted_amount']),
+                    'by_category': {str(category_id): amount for category_id, amount in row['by_category'].items()},
+                }
+                for row in predictions.to_dict('records')
+            ]
             
             # Create prediction record
             prediction = AIPrediction.objects.create(
                 user=user,
-                type='expense',
-                prediction=predictions.to_dict('records'),
+                type='spending',
+                prediction=records,
                 confidence_score=0.8,  # Placeholder
                 prediction_date=start_date
             )
             
             return {
-                'predictions': predictions.to_dict('records'),
+                'predictions': records,
                 'prediction_id': prediction.id
             }
             
@@ -133,4 +133,20 @@ def test_handle_empty_transactions(analyzer):
 def test_handle_invalid_transaction(analyzer, sample_transactions):
     """Test handling of invalid transaction."""
     with pytest.raises(ValueError):
-        analyzer.analyze_spending_patterns([None]) 
\ No newline at end of file
+        analyzer.analyze_spending_patterns([None]) 
+def test_detect_anomalies_leaves_shared_estimators_unfitted(analyzer):
+    """The registry shares one analyzer, so analyses must not fit its estimators."""
+    import pandas as pd
+    features = pd.DataFrame({
+        'amount': [10.0] * 10 + [1000.0],
+        'day_of_week': [1] * 11,
+        'hour': [0] * 11,
+        'category_id': [1] * 11,
+        'merchant_id': [0] * 11,
+    })
+
+    anomalies = analyzer._detect_anomalies(features)
+
+    assert anomalies[-1] and not anomalies[:-1].any()
+    assert not hasattr(analyzer.scaler, 'mean_')
+    assert not hasattr(analyzer.clustering_model, 'labels_')
@@ -4,8 +4,13 @@ Unit tests for the expense predictor.
 
 import pytest
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from unittest.mock import Mock, patch
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from organizations.models import Organization, OrganizationMembership
 from transactions.models import Transaction, Category
 from ai.ml.predictors.expense import ExpensePredictor
 
@@ -121,4 +126,72 @@ def test_handle_invalid_category(predictor, sample_transactions):
     predictor.train(sample_transactions)
     
     with pytest.raises(ValueError):
-        predictor.predict(datetime.now().date(), None) 
\ No newline at end of file
+        predictor.predict(datetime.now().date(), None) 
+
+@pytest.fixture
+def two_organizations(db, settings, tmp_path):
+    """Two tenants with their own categories and expense history."""
+    settings.ML_MODELS_DIR = str(tmp_path)
+    orgs = []
+    for name in ('Org A', 'Org B'):
+        org = Organization.objects.create(name=name)
+        categories = [Category.objects.create(name=f"{name} {i}", organization=org) for i in range(2)]
+        for i in range(20):
+            Transaction.objects.create(
+                organization=org, type='EXPENSE', category=categories[i % 2],
+                amount=Decimal('10.00') + i, date=date(2025, 1, 1) + timedelta(days=i)
+            )
+        orgs.append((org, categories))
+    return orgs
+
+def test_predict_sequence_matches_per_day_predictions(two_organizations):
+    """The vectorized grid equals one predict() call per (day, category)."""
+    (org, categories), _ = two_organizations
+    predictor = ExpensePredictor()
+    predictor.train(list(Transaction.objects.select_related('category')))
+
+    start = date(2025, 2, 1)
+    forecast = predictor.predict_sequence(org, start, days=5)
+
+    assert len(forecast) == 5
+    for offset, row in enumerate(forecast.to_dict('records')):
+        day = start + timedelta(days=offset)
+        expected = {category.id: predictor.predict(day, category.id) for category in categories}
+        assert row['date'] == day
+        assert row['by_category'] == pytest.approx(expected)
+        assert row['predicted_amount'] == pytest.approx(sum(expected.values()))
+
+def test_predict_sequence_is_scoped_to_the_organization(two_organizations):
+    """Only the organization's categories are forecast, even when others are requested."""
+    (org, categories), (_, other_categories) = two_organizations
+    predictor = ExpensePredictor()
+    predictor.train(list(Transaction.objects.select_related('category')))
+
+    forecast = predictor.predict_sequence(org, date(2025, 2, 1), days=2)
+    assert set(forecast.iloc[0]['by_category']) == {category.id for category in categories}
+
+    forecast = predictor.predict_sequence(
+        org, date(2025, 2, 1), days=2, category_ids=[categories[0].id, other_categories[0].id]
+    )
+    assert set(forecast.iloc[0]['by_category']) == {categories[0].id}
+
+    with pytest.raises(ValueError):
+        predictor.predict_sequence(None, date(2025, 2, 1))
+
+def test_expenses_endpoint_uses_request_organization(two_organizations):
+    """The forecast endpoint passes the request's organization through."""
+    (org, categories), _ = two_organizations
+    user = User.objects.create_user(username='forecaster', password='pass')
+    OrganizationMembership.objects.create(user=user, organization=org, role='admin')
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}',
+        HTTP_X_ORGANIZATION_ID=str(org.id)
+    )
+
+    response = client.post('/api/ai/predictions/expenses/', {'start_date': '2025-02-01', 'days': 3}, format='json')
+
+    assert response.status_code == 201
+    predictions = response.json()['predictions']
+    assert [row['date'] for row in predictions] == ['2025-02-01', '2025-02-02', '2025-02-03']
+    assert set(predictions[0]['by_category']) == {str(category.id) for category in categories}
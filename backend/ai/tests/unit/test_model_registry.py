@@ -0,0 +1,85 @@
+"""
+Unit tests for the ML model registry.
+"""
+
+import os
+from datetime import date, timedelta
+from unittest.mock import Mock
+import joblib
+import pytest
+from ai.ml.base import BaseMLModel
+from ai.ml.predictors.expense import ExpensePredictor
+from ai.ml.registry import ModelRegistry
+
+class DummyModel(BaseMLModel):
+    """Minimal model persisted as a plain dict."""
+
+    def __init__(self):
+        super().__init__('dummy_model')
+
+    def train(self, data):
+        self.model = data
+        self.save()
+
+    def predict(self, data):
+        return self.model
+
+@pytest.fixture
+def models_dir(settings, tmp_path):
+    settings.ML_MODELS_DIR = str(tmp_path)
+    return tmp_path
+
+def test_model_is_loaded_once(models_dir):
+    """Repeated lookups reuse the loaded instance."""
+    DummyModel().train({'version': 1})
+    registry = ModelRegistry()
+
+    first = registry.get(DummyModel)
+    second = registry.get(DummyModel)
+
+    assert first is second
+    assert first.predict(None) == {'version': 1}
+    stats = registry.stats()['dummy_model']
+    assert stats['loaded'] is True
+    assert stats['loads'] == 1
+    assert stats['hits'] == 1
+    assert stats['last_load_seconds'] >= 0
+
+def test_model_is_reloaded_when_file_changes(models_dir):
+    """A new model file replaces the cached instance."""
+    DummyModel().train({'version': 1})
+    registry = ModelRegistry()
+    registry.get(DummyModel)
+
+    path = models_dir / 'dummy_model.joblib'
+    joblib.dump({'version': 2, 'padding': 'x' * 10}, path)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert registry.get(DummyModel).predict(None)['version'] == 2
+    assert registry.stats()['dummy_model']['loads'] == 2
+
+def test_missing_model_file(models_dir):
+    """Without a model file the registry returns an untrained instance."""
+    registry = ModelRegistry()
+
+    assert registry.get(DummyModel).model is None
+    assert registry.stats()['dummy_model']['loaded'] is False
+
+def test_trained_expense_predictor_is_swapped_in(models_dir):
+    """A predictor trained separately replaces the shared instance, scaler included."""
+    registry = ModelRegistry()
+    shared = registry.get(ExpensePredictor)
+    assert not shared.is_trained
+
+    transactions = [
+        Mock(date=date(2025, 1, 1) + timedelta(days=i), category=Mock(id=i % 3 + 1), amount=10.0 + i)
+        for i in range(30)
+    ]
+    trained = ExpensePredictor()
+    trained.train(transactions)
+    reloaded = registry.reload(ExpensePredictor)
+
+    assert not shared.is_trained
+    assert reloaded.is_trained
+    assert reloaded.predict(date(2025, 3, 1), 2) == trained.predict(date(2025, 3, 1), 2)
@@ -4,7 +4,7 @@ Unit tests for the transaction classifier.
 
 import pytest
 import numpy as np
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from unittest.mock import Mock, patch
 from transactions.models import Transaction, Category
 from ai.ml.classifiers.transaction import TransactionClassifier
@@ -111,4 +111,48 @@ def test_handle_invalid_transaction(classifier, sample_transactions):
     classifier.train(sample_transactions)
     
     with pytest.raises(ValueError):
-        classifier.predict(None) 
\ No newline at end of file
+        classifier.predict(None) 
+def _training_transactions(count):
+    """Plain objects with the attributes the classifier reads (no database)."""
+    groceries = Mock(id=1)
+    groceries.name = "Groceries"
+    transport = Mock(id=2)
+    transport.name = "Transport"
+    return [
+        Mock(
+            description="supermarket weekly shopping" if i % 2 else "metro ticket ride",
+            amount=50.0 + i,
+            date=date(2025, 1, 1) + timedelta(days=i),
+            category=groceries if i % 2 else transport,
+        )
+        for i in range(count)
+    ]
+
+def test_predict_batch_scores_every_row(settings, tmp_path):
+    """Batch inference returns one prediction per row, more rows than feature columns."""
+    settings.ML_MODELS_DIR = str(tmp_path)
+    classifier = TransactionClassifier()
+    classifier.train(_training_transactions(20))
+
+    rows = [
+        {
+            'id': i,
+            'description': "supermarket shopping" if i % 2 else "metro ride",
+            'amount': 60.0,
+            'date': date(2025, 3, 1) + timedelta(days=i),
+        }
+        for i in range(50)
+    ]
+    batches = list(classifier.iter_predictions(rows, batch_size=32))
+    assert [len(batch) for batch in batches] == [32, 18]
+    results = [prediction for batch in batches for prediction in batch]
+
+    assert [transaction_id for transaction_id, _, _ in results] == list(range(50))
+    assert results[1][1] == 1
+    assert results[0][1] == 2
+    assert all(0 <= confidence <= 1 for _, _, confidence in results)
+
+    # The saved pipeline is usable after reloading
+    reloaded = TransactionClassifier()
+    reloaded.load()
+    assert [p for batch in reloaded.iter_predictions(rows) for p in batch] == results
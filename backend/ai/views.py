@@ -1,14 +1,16 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from .models import AIInteraction, AIInsight, AIPrediction
 from .serializers import (
     AIInteractionSerializer, AIInsightSerializer, AIPredictionSerializer,
     AIQuerySerializer, AIFeedbackSerializer
 )
 from .services import AIService
+from .ml.registry import model_registry
 
 class AIInteractionViewSet(viewsets.ModelViewSet):
     serializer_class = AIInteractionSerializer
@@ -33,6 +35,11 @@ class AIInteractionViewSet(viewsets.ModelViewSet):
 
         return Response(response, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def model_stats(self, request):
+        """Load timings and cache hits of the ML models loaded by this worker"""
+        return Response(model_registry.stats())
+
     @action(detail=True, methods=['post'])
     def provide_feedback(self, request, pk=None):
         interaction = self.get_object()
@@ -76,6 +83,27 @@ class AIPredictionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return AIPrediction.objects.filter(user=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def expenses(self, request):
+        """Forecast the expenses of the request's organization for the next ``days`` days"""
+        organization = getattr(request, 'organization', None)
+        if organization is None:
+            return Response({'error': 'Organization is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start_date = parse_date(str(request.data.get('start_date', ''))) or timezone.now().date()
+            days = int(request.data.get('days', 30))
+        except (TypeError, ValueError):
+            return Response({'error': 'start_date must be YYYY-MM-DD and days an integer'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= 366:
+            return Response({'error': 'days must be between 1 and 366'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = AIService().predict_expenses(request.user, organization, start_date, days)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'])
     def record_actual_result(self, request, pk=None):
         prediction = self.get_object()
@@ -0,0 +1,54 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .models import Chat
+
+
+def chat_group_name(chat_id):
+    return f"chat_{chat_id}"
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Flujo en tiempo real de los mensajes de un chat.
+
+    Solo los participantes pueden suscribirse. Cada mensaje creado o editado
+    se recibe como evento ``chat.message`` (ver ``chat.signals``) y cada cambio
+    de reacciones como ``chat.reaction``, de modo que el cliente no necesita
+    consultar periódicamente ``ChatViewSet.messages``.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4001)
+            return
+        chat_id = self.scope['url_route']['kwargs']['chat_id']
+        if not await self.is_participant(chat_id, user):
+            await self.close(code=4003)
+            return
+        self.group_name = chat_group_name(chat_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if getattr(self, 'group_name', None):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', 'created': event['created'], 'message': event['message']})
+
+    async def chat_reaction(self, event):
+        await self.send_json({
+            'type': 'reaction',
+            'message_id': event['message_id'],
+            'reactions': event['reactions'],
+            'reaction_counts': event['reaction_counts'],
+        })
+
+    @database_sync_to_async
+    def is_participant(self, chat_id, user):
+        return Chat.objects.filter(id=chat_id, participants=user).exists()
@@ -0,0 +1,78 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_json_reactions(apps, schema_editor):
+    # {emoji: [user_id, ...]} -> una fila de MessageReaction por usuario y emoji
+    Message = apps.get_model("chat", "Message")
+    MessageReaction = apps.get_model("chat", "MessageReaction")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    user_ids = set(User.objects.values_list("id", flat=True))
+    rows = []
+    for message_id, reactions in Message.objects.exclude(reactions={}).values_list("id", "reactions").iterator():
+        for emoji, users in (reactions or {}).items():
+            for user_id in dict.fromkeys(users):
+                if str(user_id).isdigit() and int(user_id) in user_ids:
+                    rows.append(MessageReaction(message_id=message_id, user_id=int(user_id), emoji=emoji[:32]))
+    MessageReaction.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+
+def copy_reactions_back(apps, schema_editor):
+    Message = apps.get_model("chat", "Message")
+    MessageReaction = apps.get_model("chat", "MessageReaction")
+    reactions = {}
+    for message_id, emoji, user_id in MessageReaction.objects.filter(removed_at__isnull=True).values_list(
+        "message_id", "emoji", "user_id"
+    ):
+        reactions.setdefault(message_id, {}).setdefault(emoji, []).append(str(user_id))
+    for message_id, value in reactions.items():
+        Message.objects.filter(pk=message_id).update(reactions=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0002_message_updated_at_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageReaction",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("emoji", models.CharField(max_length=32)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("removed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "message",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reaction_set",
+                        to="chat.message",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="message_reactions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["message", "updated_at"], name="chat_messag_message_8f6b64_idx")],
+                "constraints": [
+                    models.UniqueConstraint(fields=("message", "user", "emoji"), name="unique_message_reaction")
+                ],
+            },
+        ),
+        migrations.RunPython(copy_json_reactions, copy_reactions_back),
+        migrations.RemoveField(
+            model_name="message",
+            name="reactions",
+        ),
+    ]
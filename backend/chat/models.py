@@ -20,12 +20,12 @@ class Message(models.Model):
     text = models.TextField(blank=True)
     attachment = models.FileField(upload_to='chat_attachments/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Cualquier cambio (edición, reacciones, borrado)
     reply_to = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='replies')
     edited_at = models.DateTimeField(null=True, blank=True)
     deleted_for = models.ManyToManyField(User, related_name='deleted_messages', blank=True)
     deleted_for_everyone = models.BooleanField(default=False)
-    # WhatsApp-style features
-    reactions = models.JSONField(default=dict, blank=True)  # {emoji: [user_id, ...]}
+    # WhatsApp-style features (reacciones en MessageReaction)
     pinned = models.BooleanField(default=False)
     starred_by = models.ManyToManyField(User, related_name='starred_messages', blank=True)
     forwarded_from = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='forwards')
@@ -36,3 +36,28 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['chat', 'created_at']),
+            models.Index(fields=['chat', 'updated_at']),
+        ]
+
+
+class MessageReaction(models.Model):
+    """Reacción de un usuario a un mensaje (una fila por usuario y emoji)"""
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='reaction_set')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='message_reactions')
+    emoji = models.CharField(max_length=32)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    removed_at = models.DateTimeField(null=True, blank=True)  # Se conserva para la sincronización
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['message', 'user', 'emoji'], name='unique_message_reaction'),
+        ]
+        indexes = [
+            models.Index(fields=['message', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.emoji} -> {self.message_id}"
@@ -0,0 +1,116 @@
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .consumers import chat_group_name
+from .models import MessageReaction
+
+logger = logging.getLogger(__name__)
+
+
+class MessageReactionService:
+    """
+    Reacciones a mensajes sobre la tabla MessageReaction.
+
+    Cada reacción es una fila propia (usuario, emoji), así que reacciones
+    concurrentes de distintos usuarios no compiten por la fila del mensaje ni
+    se pisan entre sí. Quitar una reacción la marca con ``removed_at`` para que
+    la sincronización incremental la vea. El resumen por mensaje
+    (``{emoji: [user_id, ...]}``) se cachea y se invalida en cada cambio.
+    """
+    CACHE_KEY_PREFIX = 'chat:reactions:'
+    CACHE_TIMEOUT = 60 * 60
+
+    @classmethod
+    def get_cache_key(cls, message_id):
+        return f"{cls.CACHE_KEY_PREFIX}{message_id}"
+
+    @classmethod
+    def set_reaction(cls, message, user, emoji, add=True):
+        """
+        Añade o quita la reacción ``emoji`` de ``user`` y devuelve el resumen del mensaje
+        """
+        now = timezone.now()
+        reactions = MessageReaction.objects.filter(message=message, user=user, emoji=emoji)
+        if add:
+            changed = reactions.filter(removed_at__isnull=False).update(removed_at=None, updated_at=now)
+            if not changed and not reactions.exists():
+                try:
+                    with transaction.atomic():
+                        MessageReaction.objects.create(message=message, user=user, emoji=emoji)
+                    changed = 1
+                except IntegrityError:
+                    # Otra petición del mismo usuario la creó a la vez
+                    changed = 0
+        else:
+            changed = reactions.filter(removed_at__isnull=True).update(removed_at=now, updated_at=now)
+
+        if changed:
+            cache.delete(cls.get_cache_key(message.id))
+            transaction.on_commit(lambda: cls.on_commit(message))
+        return cls.get_summary(message.id)
+
+    @classmethod
+    def on_commit(cls, message):
+        # Un lector concurrente pudo cachear el resumen antes del commit
+        cache.delete(cls.get_cache_key(message.id))
+        cls.broadcast(message)
+
+    @classmethod
+    def get_summary(cls, message_id):
+        return cls.get_summaries([message_id])[message_id]
+
+    @classmethod
+    def get_summaries(cls, message_ids):
+        """
+        Resumen de reacciones de varios mensajes: caché primero y una sola
+        consulta para los que falten.
+
+        Returns:
+            dict: message_id -> {emoji: [user_id, ...]}
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+        if not message_ids:
+            return {}
+        keys = {cls.get_cache_key(message_id): message_id for message_id in message_ids}
+        cached = cache.get_many(keys.keys())
+        summaries = {keys[key]: value for key, value in cached.items()}
+
+        missing = [message_id for message_id in message_ids if message_id not in summaries]
+        if missing:
+            loaded = {message_id: {} for message_id in missing}
+            rows = MessageReaction.objects.filter(
+                message_id__in=missing, removed_at__isnull=True
+            ).order_by('created_at', 'id').values_list('message_id', 'emoji', 'user_id')
+            for message_id, emoji, user_id in rows:
+                loaded[message_id].setdefault(emoji, []).append(str(user_id))
+            cache.set_many({cls.get_cache_key(message_id): value for message_id, value in loaded.items()},
+                           cls.CACHE_TIMEOUT)
+            summaries.update(loaded)
+        return summaries
+
+    @staticmethod
+    def get_counts(summary):
+        return {emoji: len(user_ids) for emoji, user_ids in summary.items()}
+
+    @classmethod
+    def broadcast(cls, message):
+        """Publicar las reacciones actualizadas en el chat del mensaje"""
+        try:
+            channel_layer = get_channel_layer()
+            if channel_layer is None:
+                return
+            summary = cls.get_summary(message.id)
+            async_to_sync(channel_layer.group_send)(
+                chat_group_name(message.chat_id),
+                {
+                    'type': 'chat.reaction',
+                    'message_id': message.id,
+                    'reactions': summary,
+                    'reaction_counts': cls.get_counts(summary),
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error enviando reacciones del mensaje {message.id}: {e}")
@@ -0,0 +1,6 @@
+from django.urls import path
+from .consumers import ChatConsumer
+
+websocket_urlpatterns = [
+    path('ws/chat/<int:chat_id>/', ChatConsumer.as_asgi()),
+]
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Chat, Message
+from .reactions import MessageReactionService
 from transactions.models import Transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -11,6 +12,16 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username']
 
+class MessageListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Reacciones de toda la página de una vez (caché + una consulta)
+        messages = list(data.all() if hasattr(data, 'all') else data)
+        self.context['reaction_summaries'] = MessageReactionService.get_summaries(
+            [message.id for message in messages]
+        )
+        return super().to_representation(messages)
+
+
 class MessageSerializer(serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     attachment = serializers.FileField(required=False, allow_null=True)
@@ -18,7 +29,8 @@ class MessageSerializer(serializers.ModelSerializer):
     edited_at = serializers.DateTimeField(read_only=True)
     deleted_for = serializers.PrimaryKeyRelatedField(many=True, queryset=User.objects.all(), required=False)
     deleted_for_everyone = serializers.BooleanField(required=False)
-    reactions = serializers.JSONField(required=False)
+    reactions = serializers.SerializerMethodField()
+    reaction_counts = serializers.SerializerMethodField()
     pinned = serializers.BooleanField(required=False)
     starred_by = serializers.PrimaryKeyRelatedField(many=True, queryset=User.objects.all(), required=False)
     forwarded_from = serializers.PrimaryKeyRelatedField(queryset=Message.objects.all(), required=False, allow_null=True)
@@ -27,8 +39,19 @@ class MessageSerializer(serializers.ModelSerializer):
         model = Message
         fields = [
             'id', 'chat', 'sender', 'text', 'attachment', 'created_at', 'reply_to', 'edited_at',
-            'deleted_for', 'deleted_for_everyone', 'reactions', 'pinned', 'starred_by', 'forwarded_from'
+            'deleted_for', 'deleted_for_everyone', 'reactions', 'reaction_counts', 'pinned', 'starred_by',
+            'forwarded_from'
         ]
+        list_serializer_class = MessageListSerializer
+
+    def get_reactions(self, obj):
+        summaries = self.context.get('reaction_summaries')
+        if summaries is not None and obj.id in summaries:
+            return summaries[obj.id]
+        return MessageReactionService.get_summary(obj.id)
+
+    def get_reaction_counts(self, obj):
+        return MessageReactionService.get_counts(self.get_reactions(obj))
 
     def update(self, instance, validated_data):
         user = self.context['request'].user
@@ -38,8 +61,6 @@ class MessageSerializer(serializers.ModelSerializer):
         instance.text = validated_data.get('text', instance.text)
         instance.edited_at = timezone.now()
         # WhatsApp-style features
-        if 'reactions' in validated_data:
-            instance.reactions = validated_data['reactions']
         if 'pinned' in validated_data:
             instance.pinned = validated_data['pinned']
         if 'starred_by' in validated_data:
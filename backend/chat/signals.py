@@ -0,0 +1,40 @@
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .consumers import chat_group_name
+from .models import Message
+from .serializers import MessageSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def broadcast_message(message, created):
+    """
+    Enviar un mensaje a los suscriptores WebSocket de su chat
+    """
+    try:
+        # Una capa mal configurada no debe convertir en error un mensaje ya guardado
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        async_to_sync(channel_layer.group_send)(
+            chat_group_name(message.chat_id),
+            {
+                'type': 'chat.message',
+                'created': created,
+                'message': MessageSerializer(message).data,
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error enviando el mensaje {message.id} por WebSocket: {e}")
+
+
+@receiver(post_save, sender=Message)
+def publish_message(sender, instance, created, **kwargs):
+    """
+    Publicar mensajes nuevos o editados una vez confirmada la transacción
+    """
+    transaction.on_commit(lambda: broadcast_message(instance, created))
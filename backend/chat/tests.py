@@ -1,6 +1,16 @@
-from django.test import TestCase
+from datetime import timedelta
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
-from .models import Chat, Message
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from financialhub.asgi import application
+from organizations.models import Organization
+from .models import Chat, Message, MessageReaction
+from .reactions import MessageReactionService
 
 User = get_user_model()
 
@@ -16,3 +26,178 @@ class ChatModelTest(TestCase):
         self.assertEqual(chat.participants.count(), 2)
         self.assertEqual(chat.messages.count(), 1)
         self.assertEqual(msg.text, 'Hello!')
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerTest(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Chat Org')
+        self.user1 = User.objects.create_user(username='ws_user1', password='pass')
+        self.user2 = User.objects.create_user(username='ws_user2', password='pass')
+        self.outsider = User.objects.create_user(username='ws_outsider', password='pass')
+        self.chat = Chat.objects.create()
+        self.chat.participants.set([self.user1, self.user2])
+
+    def connect(self, path, user=None):
+        if user is not None:
+            path = f"{path}?token={AccessToken.for_user(user)}"
+        return WebsocketCommunicator(application, path)
+
+    async def test_participants_receive_new_messages(self):
+        communicator = self.connect(f'/ws/chat/{self.chat.id}/', self.user2)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await database_sync_to_async(self.create_message)('Hola')
+
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['type'], 'message')
+        self.assertTrue(event['created'])
+        self.assertEqual(event['message']['text'], 'Hola')
+        self.assertEqual(event['message']['sender']['username'], 'ws_user1')
+        await communicator.disconnect()
+
+    async def test_rejects_anonymous_users_and_non_participants(self):
+        for user, code in ((None, 4001), (self.outsider, 4003)):
+            communicator = self.connect(f'/ws/chat/{self.chat.id}/', user)
+            connected, close_code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(close_code, code)
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels_missing.layers.Layer'}})
+    def test_broken_channel_layer_does_not_break_saving(self):
+        message = self.create_message('Sin WebSocket')
+        with self.captureOnCommitCallbacks(execute=True):
+            MessageReactionService.set_reaction(message, self.user2, '👍')
+        self.assertTrue(Message.objects.filter(pk=message.pk).exists())
+
+    def create_message(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(chat=self.chat, sender=self.user1, text=text, organization=self.organization)
+
+
+class ChatHistoryTest(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name='History Org')
+        self.user1 = User.objects.create_user(username='history1', password='pass')
+        self.user2 = User.objects.create_user(username='history2', password='pass')
+        self.chat = Chat.objects.create()
+        self.chat.participants.set([self.user1, self.user2])
+        self.messages = [
+            Message.objects.create(chat=self.chat, sender=self.user1, text=f'm{index}', organization=self.organization)
+            for index in range(5)
+        ]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user2)}')
+        self.url = f'/api/chat/chats/{self.chat.id}/'
+
+    def texts(self, response):
+        return [message['text'] for message in response.data['results']]
+
+    def test_cursor_pagination(self):
+        latest = self.client.get(self.url + 'messages/', {'limit': 2})
+        self.assertEqual(latest.status_code, 200)
+        self.assertEqual(self.texts(latest), ['m3', 'm4'])
+        self.assertTrue(latest.data['has_more'])
+
+        older = self.client.get(self.url + 'messages/', {'limit': 2, 'before': latest.data['before']})
+        self.assertEqual(self.texts(older), ['m1', 'm2'])
+        oldest = self.client.get(self.url + 'messages/', {'limit': 2, 'before': older.data['before']})
+        self.assertEqual(self.texts(oldest), ['m0'])
+        self.assertFalse(oldest.data['has_more'])
+
+        newer = self.client.get(self.url + 'messages/', {'limit': 3, 'after': self.messages[0].id})
+        self.assertEqual(self.texts(newer), ['m1', 'm2', 'm3'])
+        self.assertTrue(newer.data['has_more'])
+
+        self.assertEqual(self.client.get(self.url + 'messages/', {'before': 'x'}).status_code, 400)
+
+    def test_sync_returns_changed_messages_only(self):
+        since = timezone.now()
+        Message.objects.filter(pk__in=[m.pk for m in self.messages]).update(updated_at=since - timedelta(minutes=1))
+
+        edited = self.messages[1]
+        edited.text = 'editado'
+        edited.save()
+        self.client.patch(f'/api/chat/messages/{self.messages[3].id}/delete_for_me/')
+
+        response = self.client.get(self.url + 'sync/', {'since': since.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.texts(response), ['editado', 'm3'])
+        self.assertEqual(response.data['results'][1]['deleted_for'], [self.user2.id])
+        self.assertFalse(response.data['has_more'])
+
+        again = self.client.get(self.url + 'sync/', {'since': response.data['since']})
+        self.assertEqual(again.data['results'], [])
+        self.assertEqual(self.client.get(self.url + 'sync/').status_code, 400)
+
+    def test_sync_pages_through_messages_changed_at_the_same_instant(self):
+        since = timezone.now() - timedelta(minutes=5)
+        Message.objects.filter(pk__in=[m.pk for m in self.messages]).update(updated_at=since + timedelta(minutes=1))
+
+        seen = []
+        params = {'since': since.isoformat(), 'limit': 2}
+        while True:
+            response = self.client.get(self.url + 'sync/', params)
+            seen.extend(message['id'] for message in response.data['results'])
+            if not response.data['has_more']:
+                break
+            params.update(since=response.data['since'], since_id=response.data['since_id'])
+
+        # Un cursor solo por fecha se saltaría los mensajes con el mismo instante
+        self.assertEqual(seen, [m.id for m in self.messages])
+        self.assertEqual(self.client.get(self.url + 'sync/', dict(params, since_id='x')).status_code, 400)
+
+
+class MessageReactionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organization = Organization.objects.create(name='Reaction Org')
+        self.user1 = User.objects.create_user(username='react1', password='pass')
+        self.user2 = User.objects.create_user(username='react2', password='pass')
+        self.chat = Chat.objects.create()
+        self.chat.participants.set([self.user1, self.user2])
+        self.message = Message.objects.create(chat=self.chat, sender=self.user1, text='Hola', organization=self.organization)
+        self.clients = {}
+        for user in (self.user1, self.user2):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+            self.clients[user.id] = client
+        self.url = f'/api/chat/messages/{self.message.id}/'
+
+    def react(self, user, emoji, add=True):
+        return self.clients[user.id].patch(self.url + 'react/', {'emoji': emoji, 'add': add}, format='json')
+
+    def test_reactions_do_not_rewrite_the_message(self):
+        updated_at = Message.objects.get(pk=self.message.pk).updated_at
+        self.react(self.user1, '👍')
+        self.react(self.user1, '👍')
+        response = self.react(self.user2, '👍')
+
+        self.assertEqual(response.data['reactions'], {'👍': [str(self.user1.id), str(self.user2.id)]})
+        self.assertEqual(response.data['reaction_counts'], {'👍': 2})
+        self.assertEqual(MessageReaction.objects.count(), 2)
+        self.assertEqual(Message.objects.get(pk=self.message.pk).updated_at, updated_at)
+
+        removed = self.react(self.user1, '👍', add=False)
+        self.assertEqual(removed.data['reaction_counts'], {'👍': 1})
+        self.assertIsNotNone(MessageReaction.objects.get(user=self.user1).removed_at)
+
+        star = self.clients[self.user2.id].patch(self.url + 'star/', {'star': True}, format='json')
+        self.assertEqual(star.data['starred_by'], [self.user2.id])
+        self.assertEqual(Message.objects.get(pk=self.message.pk).updated_at, updated_at)
+
+    def test_history_and_sync_include_cached_reactions(self):
+        since = timezone.now()
+        Message.objects.filter(pk=self.message.pk).update(updated_at=since - timedelta(minutes=1))
+        self.react(self.user2, '🎉')
+
+        history = self.clients[self.user1.id].get(f'/api/chat/chats/{self.chat.id}/messages/')
+        self.assertEqual(history.data['results'][0]['reaction_counts'], {'🎉': 1})
+
+        sync = self.clients[self.user1.id].get(f'/api/chat/chats/{self.chat.id}/sync/', {'since': since.isoformat()})
+        self.assertEqual([message['id'] for message in sync.data['results']], [self.message.id])
+
+        # El resumen cacheado evita volver a consultar la tabla
+        with self.assertNumQueries(0):
+            self.assertEqual(MessageReactionService.get_summary(self.message.id), {'🎉': [str(self.user2.id)]})
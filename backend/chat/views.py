@@ -1,10 +1,14 @@
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
-from .models import Chat, Message
+from .models import Chat, Message, MessageReaction
+from .reactions import MessageReactionService
 from .serializers import ChatSerializer, MessageSerializer
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import logging
 import traceback
 
@@ -15,15 +19,16 @@ logger = logging.getLogger(__name__)
 class ChatViewSet(viewsets.ModelViewSet):
     serializer_class = ChatSerializer
     permission_classes = [permissions.IsAuthenticated]
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    SYNC_LIMIT = 500
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
             return Chat.objects.none()
         if not self.request.user.is_authenticated:
             return Chat.objects.none()
-        queryset = Chat.objects.filter(participants=self.request.user).distinct()
-        logger.info(f"User {self.request.user.username} requesting chats. Found {queryset.count()} chats")
-        return queryset
+        return Chat.objects.filter(participants=self.request.user).distinct()
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -33,8 +38,7 @@ class ChatViewSet(viewsets.ModelViewSet):
     def get_object(self):
         try:
             obj = super().get_object()
-            logger.info(f"User {self.request.user.username} accessing chat {obj.id}")
-            logger.info(f"Chat participants: {[u.username for u in obj.participants.all()]}")
+            logger.debug(f"User {self.request.user.username} accessing chat {obj.id}")
             return obj
         except Exception as e:
             logger.error(f"Error in get_object: {str(e)}")
@@ -43,39 +47,119 @@ class ChatViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
+        """
+        Historial paginado por cursor (de más nuevo a más antiguo).
+
+        Parámetros: ``before`` / ``after`` (id de mensaje) y ``limit``. Los
+        mensajes de cada página se devuelven en orden cronológico.
+        """
+        chat = self.get_object()
         try:
-            logger.info(f"Attempting to fetch messages for chat {pk}")
-            logger.info(f"User: {request.user.username}")
-            
-            chat = self.get_object()
-            logger.info(f"Successfully retrieved chat {chat.id}")
-            
-            if not chat.participants.filter(id=request.user.id).exists():
-                logger.warning(f"User {request.user.username} tried to access chat {pk} without permission")
-                return Response(
-                    {"detail": "You don't have permission to access this chat"},
-                    status=status.HTTP_403_FORBIDDEN
+            limit = self._get_limit(request)
+            before = self._get_cursor_message(chat, request.query_params.get('before'))
+            after = self._get_cursor_message(chat, request.query_params.get('after'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        messages = self._message_queryset(chat)
+        if after is not None:
+            # Hacia adelante: los siguientes mensajes después del cursor
+            messages = messages.filter(
+                Q(created_at__gt=after.created_at) | Q(created_at=after.created_at, id__gt=after.id)
+            ).order_by('created_at', 'id')
+        else:
+            if before is not None:
+                messages = messages.filter(
+                    Q(created_at__lt=before.created_at) | Q(created_at=before.created_at, id__lt=before.id)
                 )
+            messages = messages.order_by('-created_at', '-id')
 
-            messages = chat.messages.order_by('created_at')
-            logger.info(f"Found {messages.count()} messages for chat {chat.id}")
-            
-            serializer = MessageSerializer(messages, many=True)
-            return Response(serializer.data)
-            
-        except ObjectDoesNotExist:
-            logger.error(f"Chat {pk} not found")
-            return Response(
-                {"detail": "Chat not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        except Exception as e:
-            logger.error(f"Error fetching messages for chat {pk}: {str(e)}")
-            logger.error(traceback.format_exc())
-            return Response(
-                {"detail": f"An error occurred while fetching messages: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        page = list(messages[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        if after is None:
+            page.reverse()
+
+        return Response({
+            'results': MessageSerializer(page, many=True, context={'request': request}).data,
+            'has_more': has_more,
+            'before': page[0].id if page else None,
+            'after': page[-1].id if page else None,
+        })
+
+    @action(detail=True, methods=['get'])
+    def sync(self, request, pk=None):
+        """
+        Sincronización incremental: mensajes creados o modificados (ediciones,
+        reacciones, borrados) después de ``since``. Las reacciones quitadas se
+        reflejan en el resumen ``reactions`` del mensaje.
+
+        El cursor es el par (``since``, ``since_id``): varios mensajes pueden
+        compartir el mismo instante de cambio, así que el id desempata. El
+        cliente repite la llamada con el cursor devuelto mientras ``has_more``
+        sea verdadero.
+        """
+        chat = self.get_object()
+        since = parse_datetime(request.query_params.get('since') or '')
+        if since is None:
+            return Response({'detail': 'since debe ser una fecha ISO 8601.'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        since_id = request.query_params.get('since_id') or None
+        try:
+            since_id = int(since_id) if since_id is not None else None
+        except ValueError:
+            return Response({'detail': 'since_id debe ser un número entero.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = self._get_limit(request, default=self.SYNC_LIMIT, maximum=self.SYNC_LIMIT)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        server_time = timezone.now()
+        # Las reacciones viven en su propia tabla: cuentan como cambio del mensaje
+        reacted = MessageReaction.objects.filter(message__chat=chat, updated_at__gte=since).values('message_id')
+        last_reaction = MessageReaction.objects.filter(
+            message=OuterRef('pk')
+        ).order_by('-updated_at').values('updated_at')[:1]
+        after_cursor = Q(changed_at__gt=since)
+        if since_id is not None:
+            after_cursor |= Q(changed_at=since, id__gt=since_id)
+        page = list(
+            self._message_queryset(chat).filter(
+                Q(updated_at__gte=since) | Q(id__in=reacted)
+            ).annotate(
+                changed_at=Greatest('updated_at', Coalesce(Subquery(last_reaction), 'updated_at'))
+            ).filter(after_cursor).order_by('changed_at', 'id')[:limit + 1]
+        )
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        return Response({
+            'results': MessageSerializer(page, many=True, context={'request': request}).data,
+            'has_more': has_more,
+            'since': (page[-1].changed_at if has_more else server_time).isoformat(),
+            'since_id': page[-1].id if has_more else None,
+        })
+
+    def _message_queryset(self, chat):
+        return chat.messages.select_related('sender').prefetch_related('deleted_for', 'starred_by')
+
+    def _get_limit(self, request, default=None, maximum=None):
+        default = default or self.PAGE_SIZE
+        maximum = maximum or self.MAX_PAGE_SIZE
+        try:
+            limit = int(request.query_params.get('limit', default))
+        except (TypeError, ValueError):
+            raise ValueError('limit debe ser un número entero.')
+        return max(1, min(limit, maximum))
+
+    def _get_cursor_message(self, chat, message_id):
+        if message_id in (None, ''):
+            return None
+        try:
+            return chat.messages.only('id', 'created_at').get(id=int(message_id))
+        except (TypeError, ValueError, Message.DoesNotExist):
+            raise ValueError(f'Cursor de mensaje inválido: {message_id}')
 
 class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
@@ -96,6 +180,8 @@ class MessageViewSet(viewsets.ModelViewSet):
         message = self.get_object()
         user = request.user
         message.deleted_for.add(user)
+        # El cambio en la M2M no pasa por save(): se marca para la sincronización
+        Message.objects.filter(pk=message.pk).update(updated_at=timezone.now())
         return Response({'status': 'deleted for you'})
 
     @action(detail=True, methods=['patch'], url_path='delete_for_everyone')
@@ -111,25 +197,19 @@ class MessageViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['patch'], url_path='react')
     def react(self, request, pk=None):
         message = self.get_object()
-        user = request.user
         emoji = request.data.get('emoji')
         add = request.data.get('add', True)
         if not emoji:
             return Response({'error': 'Emoji is required.'}, status=400)
-        reactions = message.reactions or {}
-        user_id = str(user.id)
-        if add:
-            reactions.setdefault(emoji, [])
-            if user_id not in reactions[emoji]:
-                reactions[emoji].append(user_id)
-        else:
-            if emoji in reactions and user_id in reactions[emoji]:
-                reactions[emoji].remove(user_id)
-                if not reactions[emoji]:
-                    del reactions[emoji]
-        message.reactions = reactions
-        message.save()
-        return Response({'status': 'reacted', 'reactions': reactions})
+        if len(emoji) > 32:
+            return Response({'error': 'Emoji is too long.'}, status=400)
+        # Una fila por usuario y emoji: no se reescribe el mensaje
+        reactions = MessageReactionService.set_reaction(message, request.user, emoji, add=bool(add))
+        return Response({
+            'status': 'reacted',
+            'reactions': reactions,
+            'reaction_counts': MessageReactionService.get_counts(reactions),
+        })
 
     @action(detail=True, methods=['patch'], url_path='pin')
     def pin(self, request, pk=None):
@@ -144,11 +224,11 @@ class MessageViewSet(viewsets.ModelViewSet):
         message = self.get_object()
         user = request.user
         star = request.data.get('star', True)
+        # Solo cambia la tabla M2M; la fila del mensaje no se vuelve a guardar
         if star:
             message.starred_by.add(user)
         else:
             message.starred_by.remove(user)
-        message.save()
         return Response({'status': 'starred', 'starred_by': list(message.starred_by.values_list('id', flat=True))})
 
     @action(detail=True, methods=['patch'], url_path='forward')
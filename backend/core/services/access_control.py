@@ -1,9 +1,9 @@
 import logging
 from functools import wraps
 from django.core.cache import cache
-from django.utils import timezone
 from organizations.models import Organization, OrganizationMembership
-from accounts.constants import PRO_FEATURES_ACCOUNTANT, PRO_FEATURES_MEMBER
+from core.services.cache_versions import CacheVersionService
+from core.services.entitlements import EntitlementService
 from core.exceptions import AccessControlError
 from django.http import JsonResponse
 
@@ -15,34 +15,47 @@ class AccessControlService:
     CACHE_TIMEOUT = 300  # 5 minutes
     CACHE_KEY_PREFIX = 'access_control:'
     
+    @classmethod
+    def get_namespace_key(cls, scope, scope_id):
+        """Cache key holding the namespace version (generation) of a user or an organization"""
+        return f"{cls.CACHE_KEY_PREFIX}ns:{scope}:{scope_id}"
+
+    @classmethod
+    def get_namespace_versions(cls, user_id, org_id):
+        """Current namespace versions of a user and an organization (one round trip)"""
+        user_key = cls.get_namespace_key('user', user_id)
+        org_key = cls.get_namespace_key('org', org_id)
+        versions = CacheVersionService.get_versions([user_key, org_key])
+        return versions[user_key], versions[org_key]
+
     @classmethod
     def get_cache_key(cls, user_id, org_id, feature=None):
-        """Generate cache key for access control checks"""
-        key = f"{cls.CACHE_KEY_PREFIX}{user_id}:{org_id}"
+        """Generate cache key for access control checks, scoped to the user and org namespaces"""
+        user_version, org_version = cls.get_namespace_versions(user_id, org_id)
+        key = f"{cls.CACHE_KEY_PREFIX}{user_id}:{org_id}:{user_version}:{org_version}"
         if feature:
             key += f":{feature}"
         return key
 
+    @classmethod
+    def bump_namespace(cls, scope, scope_id):
+        """Invalidate every entry of a namespace with a single INCR"""
+        CacheVersionService.bump(cls.get_namespace_key(scope, scope_id))
+
     @classmethod
     def clear_user_cache(cls, user_id):
         """Clear all access control cache entries for a user"""
-        pattern = f"{cls.CACHE_KEY_PREFIX}{user_id}:*"
-        keys = cache.keys(pattern)
-        if keys:
-            cache.delete_many(keys)
+        cls.bump_namespace('user', user_id)
 
     @classmethod
     def clear_org_cache(cls, org_id):
         """Clear all access control cache entries for an organization"""
-        pattern = f"{cls.CACHE_KEY_PREFIX}*:{org_id}:*"
-        keys = cache.keys(pattern)
-        if keys:
-            cache.delete_many(keys)
+        cls.bump_namespace('org', org_id)
 
     @classmethod
     def get_user_role_in_org(cls, user, org):
         """Get user's role in an organization with caching"""
-        cache_key = f"{cls.CACHE_KEY_PREFIX}role:{user.id}:{org.id}"
+        cache_key = cls.get_cache_key(user.id, org.id, 'role')
         role = cache.get(cache_key)
         
         if role is None:
@@ -57,60 +70,12 @@ class AccessControlService:
         return role
 
     @classmethod
-    def has_pro_access(cls, user, organization=None, feature=None):
+    def has_pro_access(cls, user, organization=None, feature=None, request=None):
         """
-        Check if user has Pro access with clear hierarchy:
-        1. Global Pro access
-        2. Trial access
-        3. Organization Pro access
-        4. Feature-specific access
+        Check if user has Pro access (optionally to a specific feature).
+        Delegates to the entitlement engine, which answers from a precomputed bitset.
         """
-        cache_key = cls.get_cache_key(user.id, organization.id if organization else 'global', feature)
-        cached_result = cache.get(cache_key)
-        
-        if cached_result is not None:
-            return cached_result
-
-        now = timezone.now()
-        result = False
-
-        # 1. Check global Pro access
-        if getattr(user, 'pro_features', False):
-            result = True
-            logger.info(f"Global Pro access granted for user {user.id}")
-        
-        # 2. Check trial access
-        elif (getattr(user, 'pro_trial_until', None) and 
-              user.pro_trial_until and 
-              user.pro_trial_until > now):
-            result = True
-            logger.info(f"Trial access granted for user {user.id}")
-        
-        # 3. Check organization Pro access
-        elif organization:
-            if getattr(organization, 'plan', None) == 'pro':
-                if feature:
-                    if (user.account_type == "accountant" and feature in PRO_FEATURES_ACCOUNTANT) or \
-                       (user.account_type == "personal" and feature in PRO_FEATURES_MEMBER):
-                        result = True
-                        logger.info(f"Organization Pro access granted for user {user.id} in org {organization.id}")
-                else:
-                    result = True
-                    logger.info(f"Organization Pro access granted for user {user.id} in org {organization.id}")
-            
-            # Check accountant-specific Pro features
-            elif (hasattr(organization, 'memberships') and 
-                  organization.memberships.filter(user=user, pro_features_for_accountant=True).exists()):
-                result = True
-                logger.info(f"Accountant Pro features granted for user {user.id} in org {organization.id}")
-        
-        # 4. Check feature-specific access
-        elif feature and feature in getattr(user, 'pro_features_list', []):
-            result = True
-            logger.info(f"Feature-specific access granted for user {user.id}")
-
-        cache.set(cache_key, result, cls.CACHE_TIMEOUT)
-        return result
+        return EntitlementService.has_pro_access(user, organization, feature=feature, request=request)
 
     @classmethod
     def require_access(cls, required_roles=None, require_pro=False, allow_accountant_always=False, sponsor_only=False):
@@ -150,7 +115,7 @@ class AccessControlService:
                     raise AccessControlError("Insufficient role permissions.")
 
                 # Check Pro access
-                if require_pro and not cls.has_pro_access(user, org):
+                if require_pro and not cls.has_pro_access(user, org, request=request):
                     logger.warning(f"Access denied: Pro access required for user {user.id}")
                     raise AccessControlError("Pro subscription required.")
 
@@ -0,0 +1,39 @@
+import time
+from django.core.cache import cache
+
+
+class CacheVersionService:
+    """
+    Generation counters for versioned cache namespaces.
+
+    Entries embed the current version of their namespace in the key, so a
+    whole namespace is invalidated with a single INCR instead of deleting keys.
+    """
+
+    @staticmethod
+    def initial_version():
+        # Seeded from the clock: if the counter is evicted, the new generation
+        # is still newer than any key written before the eviction
+        return int(time.time() * 1000)
+
+    @classmethod
+    def get_versions(cls, keys):
+        """Current version of each counter in ``keys`` (one round trip when all exist)"""
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                cache.add(key, cls.initial_version(), None)
+                versions[key] = cache.get(key)
+        return versions
+
+    @classmethod
+    def get_version(cls, key):
+        return cls.get_versions([key])[key]
+
+    @classmethod
+    def bump(cls, key):
+        """Move the namespace to a new generation"""
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, cls.initial_version(), None)
@@ -0,0 +1,141 @@
+import logging
+from dataclasses import dataclass
+from django.utils import timezone
+from accounts.constants import PRO_FEATURES_ACCOUNTANT, PRO_FEATURES_MEMBER
+from core.services.org_context import OrgContextService
+
+logger = logging.getLogger('access_control')
+
+# Catálogo de features Pro: cada una ocupa un bit a partir del bit 2
+PRO_FEATURES = tuple(dict.fromkeys(PRO_FEATURES_ACCOUNTANT + PRO_FEATURES_MEMBER))
+PRO_BIT = 1 << 0          # Acceso Pro general (has_pro_access sin feature)
+ALL_FEATURES_BIT = 1 << 1  # Todas las features (membresía con pro_features_for_accountant)
+FEATURE_BITS = {feature: 1 << (index + 2) for index, feature in enumerate(PRO_FEATURES)}
+
+
+def features_mask(features):
+    """Bitset de las features del catálogo incluidas en ``features``"""
+    mask = 0
+    for feature in features:
+        mask |= FEATURE_BITS.get(feature, 0)
+    return mask
+
+
+ACCOUNT_TYPE_MASKS = {
+    'accountant': features_mask(PRO_FEATURES_ACCOUNTANT),
+    'personal': features_mask(PRO_FEATURES_MEMBER),
+}
+
+
+@dataclass(frozen=True)
+class Entitlements:
+    """Derechos Pro de un usuario (en una organización) como bitset"""
+    mask: int = 0
+    extra_features: frozenset = frozenset()
+
+    def has(self, feature=None):
+        if feature is None:
+            return bool(self.mask & PRO_BIT)
+        if self.mask & ALL_FEATURES_BIT:
+            return True
+        bit = FEATURE_BITS.get(feature)
+        if bit is None:
+            # Features fuera del catálogo solo se conceden por la lista del usuario
+            return feature in self.extra_features
+        return bool(self.mask & bit)
+
+    def __or__(self, other):
+        return Entitlements(self.mask | other.mask, self.extra_features | other.extra_features)
+
+
+class EntitlementService:
+    """
+    Motor único de derechos Pro (reemplaza las dos implementaciones de has_pro_access).
+
+    Los derechos se precalculan como bitset en dos partes:
+    - del usuario (Pro global, trial vigente, lista de features), memorizada en
+      la instancia del usuario hasta que cambian sus campos o vence el trial;
+    - de la organización (plan Pro, membresía con pro_features_for_accountant),
+      calculada al cargar las membresías y guardada con ellas en el contexto
+      cacheado (OrgContextService), que las señales de organizaciones y
+      membresías invalidan cuando cambian.
+    Cada consulta es una operación de bits, sin acceder a la base de datos.
+    """
+
+    @classmethod
+    def user_entitlements(cls, user):
+        """Derechos que el usuario tiene por sí mismo, memorizados en la instancia"""
+        fingerprint = (
+            getattr(user, 'pro_features', False),
+            getattr(user, 'pro_trial_until', None),
+            tuple(getattr(user, 'pro_features_list', None) or ()),
+            getattr(user, 'account_type', None),
+        )
+        now = timezone.now()
+        cached = getattr(user, '_entitlements_cache', None)
+        if cached and cached[0] == fingerprint and (cached[1] is None or cached[1] > now):
+            return cached[2]
+
+        pro_features, trial_until, features_list, account_type = fingerprint
+        trial_active = bool(trial_until and trial_until > now)
+        mask = features_mask(features_list)
+        if pro_features or trial_active:
+            mask |= PRO_BIT | ACCOUNT_TYPE_MASKS.get(account_type, 0)
+        entitlements = Entitlements(
+            mask=mask,
+            extra_features=frozenset(feature for feature in features_list if feature not in FEATURE_BITS),
+        )
+
+        # Un trial vigente caduca: el bitset solo vale hasta su fin (si no hay Pro global)
+        valid_until = trial_until if trial_active and not pro_features else None
+        user._entitlements_cache = (fingerprint, valid_until, entitlements)
+        return entitlements
+
+    @staticmethod
+    def membership_mask(plan, pro_features_for_accountant=False):
+        """Bits que da una organización (y la membresía en ella), sin los que dependen del tipo de cuenta"""
+        mask = 0
+        if plan == 'pro':
+            mask |= PRO_BIT
+        if pro_features_for_accountant:
+            mask |= PRO_BIT | ALL_FEATURES_BIT
+        return mask
+
+    @classmethod
+    def organization_entitlements(cls, user, organization, request=None):
+        """Derechos que el usuario obtiene de una organización"""
+        if request is not None:
+            context = OrgContextService.get_request_context(request, organization)
+        else:
+            context = OrgContextService.get_context(user, organization.id)
+        if context is not None:
+            mask = context.entitlement_mask
+        else:
+            # Sin membresía solo cuenta el plan de la organización
+            mask = cls.membership_mask(getattr(organization, 'plan', None))
+        if mask & PRO_BIT:
+            mask |= ACCOUNT_TYPE_MASKS.get(getattr(user, 'account_type', None), 0)
+        return Entitlements(mask=mask)
+
+    @classmethod
+    def get_entitlements(cls, user, organization=None, request=None):
+        """Bitset combinado del usuario en la organización (o global si no hay organización)"""
+        entitlements = cls.user_entitlements(user)
+        if organization is not None:
+            entitlements = entitlements | cls.organization_entitlements(user, organization, request=request)
+        return entitlements
+
+    @classmethod
+    def has_pro_access(cls, user, organization=None, feature=None, request=None):
+        """
+        Indica si el usuario tiene acceso Pro (a una feature concreta, si se indica).
+
+        Args:
+            user: Usuario
+            organization: Organización en la que se evalúa el acceso (opcional)
+            feature: Feature Pro concreta (opcional)
+            request: Request actual, para reutilizar el contexto de organización ya resuelto
+        """
+        if user is None or not getattr(user, 'is_authenticated', True):
+            return False
+        return cls.get_entitlements(user, organization, request=request).has(feature)
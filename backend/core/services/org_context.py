@@ -0,0 +1,207 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from core.services.cache_versions import CacheVersionService
+from organizations.models import Organization, OrganizationMembership
+
+
+@dataclass(frozen=True)
+class MembershipInfo:
+    """Snapshot of one membership of a user, with the fields of its organization"""
+    membership_id: int
+    organization_id: int
+    organization_name: str
+    role: str
+    pro_features_for_accountant: bool
+    organization_values: tuple
+    entitlement_mask: int = 0  # Pro bits granted by the organization (see EntitlementService)
+
+
+@dataclass(frozen=True)
+class OrgContext:
+    """Organization resolved for a request: the organization, the membership and its role"""
+    organization: Organization
+    membership_id: int
+    role: str
+    pro_features_for_accountant: bool
+    entitlement_mask: int = 0
+
+    @property
+    def organization_id(self):
+        return self.organization.id
+
+    @property
+    def is_pro_plan(self):
+        return self.organization.plan == 'pro'
+
+
+class OrgContextService:
+    """
+    Resolves the memberships of a user once and serves them from an in-process LRU.
+
+    Each entry holds every membership of a user (one query with the organization
+    joined) and expires after ``ORG_CONTEXT_CACHE_TTL`` seconds. Entries are also
+    versioned: membership changes bump the user's version and organization
+    changes bump the organization's version (see ``organizations.signals``).
+    The versions live in the shared cache (``CacheVersionService``) and are read
+    with one ``get_many`` per lookup, so a role downgrade or a removed
+    membership takes effect in every worker on its next request.
+    """
+
+    ORG_FIELDS = [field.attname for field in Organization._meta.concrete_fields]
+    CACHE_KEY_PREFIX = 'org_context:'
+
+    _lock = threading.Lock()
+    _entries = OrderedDict()
+
+    @classmethod
+    def get_ttl(cls):
+        return getattr(settings, 'ORG_CONTEXT_CACHE_TTL', 30)
+
+    @classmethod
+    def get_max_entries(cls):
+        return getattr(settings, 'ORG_CONTEXT_CACHE_SIZE', 1024)
+
+    @classmethod
+    def get_version_key(cls, scope, scope_id):
+        return f"{cls.CACHE_KEY_PREFIX}version:{scope}:{scope_id}"
+
+    @classmethod
+    def invalidate_user(cls, user_id):
+        """Invalidate the cached memberships of a user in every process"""
+        CacheVersionService.bump(cls.get_version_key('user', user_id))
+
+    @classmethod
+    def invalidate_org(cls, org_id):
+        """Invalidate every cached membership that points to an organization, in every process"""
+        CacheVersionService.bump(cls.get_version_key('org', org_id))
+
+    @classmethod
+    def clear(cls):
+        """Drop every cached entry"""
+        with cls._lock:
+            cls._entries.clear()
+
+    @classmethod
+    def get_memberships(cls, user):
+        """
+        All memberships of a user as ``{organization_id: MembershipInfo}``.
+        """
+        ttl = cls.get_ttl()
+        if not ttl:
+            return cls._load_memberships(user.id)
+
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(user.id)
+        org_ids = list(entry['org_versions']) if entry is not None and entry['expires_at'] > now else []
+        user_key = cls.get_version_key('user', user.id)
+        # Versions are read before loading so a concurrent change marks the entry stale
+        versions = CacheVersionService.get_versions(
+            [user_key] + [cls.get_version_key('org', org_id) for org_id in org_ids]
+        )
+        if entry is not None and cls._is_fresh(entry, user.id, versions, now):
+            with cls._lock:
+                if user.id in cls._entries:
+                    cls._entries.move_to_end(user.id)
+            return entry['memberships']
+
+        memberships = cls._load_memberships(user.id)
+        missing = [cls.get_version_key('org', org_id) for org_id in memberships
+                   if cls.get_version_key('org', org_id) not in versions]
+        if missing:
+            versions.update(CacheVersionService.get_versions(missing))
+
+        with cls._lock:
+            cls._entries[user.id] = {
+                'expires_at': now + ttl,
+                'user_version': versions[user_key],
+                'org_versions': {
+                    org_id: versions[cls.get_version_key('org', org_id)] for org_id in memberships
+                },
+                'memberships': memberships,
+            }
+            cls._entries.move_to_end(user.id)
+            while len(cls._entries) > cls.get_max_entries():
+                cls._entries.popitem(last=False)
+        return memberships
+
+    @classmethod
+    def get_context(cls, user, org_id):
+        """
+        OrgContext of ``user`` in organization ``org_id``, or None if not a member.
+        """
+        info = cls.get_memberships(user).get(int(org_id))
+        if info is None:
+            return None
+        return cls.build_context(info)
+
+    @classmethod
+    def build_context(cls, info):
+        """Build a fresh OrgContext (and Organization instance) from a cached membership"""
+        organization = Organization.from_db(DEFAULT_DB_ALIAS, cls.ORG_FIELDS, info.organization_values)
+        return OrgContext(
+            organization=organization,
+            membership_id=info.membership_id,
+            role=info.role,
+            pro_features_for_accountant=info.pro_features_for_accountant,
+            entitlement_mask=info.entitlement_mask,
+        )
+
+    @classmethod
+    def get_request_context(cls, request, org=None):
+        """
+        OrgContext of the current request, memoized on the request.
+
+        Args:
+            request: HttpRequest or DRF Request
+            org: Organization to resolve (defaults to ``request.organization``)
+        """
+        request_org = getattr(request, 'organization', None)
+        org = org if org is not None else request_org
+        if org is None:
+            return None
+        context = getattr(request, 'org_context', None)
+        if context is not None and context.organization_id == org.id:
+            return context
+        context = cls.get_context(request.user, org.id)
+        # Solo se memoriza el contexto de la organización del propio request
+        if request_org is not None and request_org.id == org.id:
+            request.org_context = context
+        return context
+
+    @classmethod
+    def _is_fresh(cls, entry, user_id, versions, now):
+        if entry['expires_at'] <= now:
+            return False
+        if entry['user_version'] != versions.get(cls.get_version_key('user', user_id)):
+            return False
+        return all(
+            version == versions.get(cls.get_version_key('org', org_id))
+            for org_id, version in entry['org_versions'].items()
+        )
+
+    @classmethod
+    def _load_memberships(cls, user_id):
+        # The entitlement bits are computed here, so they are refreshed with the entry
+        from core.services.entitlements import EntitlementService
+        memberships = OrganizationMembership.objects.filter(user_id=user_id).select_related('organization')
+        return {
+            membership.organization_id: MembershipInfo(
+                membership_id=membership.id,
+                organization_id=membership.organization_id,
+                organization_name=membership.organization.name,
+                role=membership.role,
+                pro_features_for_accountant=membership.pro_features_for_accountant,
+                organization_values=tuple(
+                    getattr(membership.organization, field) for field in cls.ORG_FIELDS
+                ),
+                entitlement_mask=EntitlementService.membership_mask(
+                    membership.organization.plan, membership.pro_features_for_accountant
+                ),
+            )
+            for membership in memberships.order_by('joined_at', 'id')
+        }
@@ -1,11 +1,14 @@
 import logging
 import stripe
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
-from payments.models import Subscription
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from payments.models import Subscription, StripeEvent
 from organizations.models import Organization
-from core.exceptions import StripeError, SubscriptionError, ValidationError
+from core.exceptions import StripeError, SubscriptionError
 
 logger = logging.getLogger('payments')
 
@@ -14,6 +17,9 @@ class SubscriptionService:
     
     CACHE_TIMEOUT = 300  # 5 minutes
     CACHE_KEY_PREFIX = 'subscription:'
+    SUBSCRIPTION_EVENT_TYPES = ('customer.subscription.updated', 'customer.subscription.deleted')
+    EVENT_RETRY_BASE_DELAY = 60  # seconds, doubled on every failed attempt
+    EVENT_RETRY_MAX_DELAY = 60 * 60
     
     @classmethod
     def get_cache_key(cls, org_id):
@@ -73,132 +79,295 @@ class SubscriptionService:
             logger.error(f"Error cancelling Stripe subscription: {str(e)}")
             raise StripeError(f"Error cancelling subscription: {str(e)}")
 
+    @classmethod
+    def get_stale_after(cls):
+        """Seconds after which the local status is revalidated against Stripe"""
+        return getattr(settings, 'SUBSCRIPTION_STATUS_STALE_AFTER', 300)
+
+    @classmethod
+    def get_refresh_lock_key(cls, org_id):
+        return f"{cls.CACHE_KEY_PREFIX}refresh:{org_id}"
+
+    @classmethod
+    def serialize_status(cls, subscription):
+        """Status payload built from the local Subscription row"""
+        return {
+            'status': subscription.status,
+            'current_period_end': subscription.current_period_end,
+            'plan': subscription.plan,
+            'cancel_at_period_end': subscription.cancel_at_period_end,
+            'synced_at': subscription.synced_at,
+        }
+
+    @classmethod
+    def is_stale(cls, status_data):
+        synced_at = status_data.get('synced_at')
+        if synced_at is None:
+            return True
+        return (timezone.now() - synced_at).total_seconds() > cls.get_stale_after()
+
     @classmethod
     def get_subscription_status(cls, organization):
-        """Get subscription status with caching"""
+        """
+        Get subscription status, local-first (stale-while-revalidate).
+
+        The status is read from the Subscription row, which webhooks keep
+        up to date, and cached. If the last sync with Stripe is older than
+        SUBSCRIPTION_STATUS_STALE_AFTER the current value is still returned and
+        a single background refresh is scheduled.
+        """
         cache_key = cls.get_cache_key(organization.id)
-        cached_status = cache.get(cache_key)
-        
-        if cached_status is not None:
-            return cached_status
+        status_data = cache.get(cache_key)
 
-        try:
-            subscription = Subscription.objects.get(organization=organization)
-            stripe_sub = stripe.Subscription.retrieve(subscription.stripe_subscription_id)
-            
-            status_data = {
-                'status': stripe_sub['status'],
-                'current_period_end': timezone.datetime.fromtimestamp(
-                    stripe_sub['current_period_end'], 
-                    tz=timezone.utc
-                ),
-                'plan': subscription.plan,
-                'cancel_at_period_end': stripe_sub['cancel_at_period_end']
-            }
-            
+        if status_data is None:
+            subscription = Subscription.objects.filter(organization=organization).first()
+            if subscription is None:
+                logger.warning(f"No subscription found for organization {organization.id}")
+                return None
+            status_data = dict(cls.serialize_status(subscription), subscription_id=subscription.id)
             cache.set(cache_key, status_data, cls.CACHE_TIMEOUT)
-            return status_data
-        except Subscription.DoesNotExist:
-            logger.warning(f"No subscription found for organization {organization.id}")
+
+        if cls.is_stale(status_data):
+            cls.schedule_refresh(organization.id, status_data['subscription_id'])
+
+        return {key: value for key, value in status_data.items() if key != 'subscription_id'}
+
+    @classmethod
+    def schedule_refresh(cls, org_id, subscription_id):
+        """
+        Enqueue a background refresh from Stripe, coalescing concurrent requests:
+        only the caller that acquires the lock enqueues the task.
+        """
+        lock_key = cls.get_refresh_lock_key(org_id)
+        if not cache.add(lock_key, subscription_id, cls.CACHE_TIMEOUT):
+            return False
+        try:
+            from payments.tasks import refresh_subscription_status
+            refresh_subscription_status.delay(subscription_id)
+        except Exception as e:
+            cache.delete(lock_key)
+            logger.warning(f"Could not schedule subscription refresh for organization {org_id}: {str(e)}")
+            return False
+        return True
+
+    @classmethod
+    def refresh_subscription_status(cls, subscription_id):
+        """Retrieve the subscription from Stripe and sync the local row"""
+        subscription = Subscription.objects.select_related('organization').filter(pk=subscription_id).first()
+        if subscription is None:
             return None
+        try:
+            stripe_sub = stripe.Subscription.retrieve(subscription.stripe_subscription_id)
+            return cls.sync_from_stripe(subscription, stripe_sub)
         except stripe.error.StripeError as e:
-            logger.error(f"Error getting subscription status: {str(e)}")
+            logger.error(f"Error refreshing subscription status: {str(e)}")
             raise StripeError(f"Error getting subscription status: {str(e)}")
+        finally:
+            cache.delete(cls.get_refresh_lock_key(subscription.organization_id))
+
+    @classmethod
+    def sync_from_stripe(cls, subscription, subscription_data):
+        """Update the local subscription (and the organization plan) from Stripe data"""
+        subscription.status = subscription_data['status']
+        subscription.current_period_end = datetime.fromtimestamp(
+            subscription_data['current_period_end'],
+            tz=dt_timezone.utc
+        )
+        subscription.cancel_at_period_end = bool(subscription_data.get('cancel_at_period_end', False))
+        subscription.synced_at = timezone.now()
+        subscription.save()
+
+        # Update organization plan
+        org = subscription.organization
+        plan = 'pro' if subscription_data['status'] == 'active' else 'free'
+        if org.plan != plan:
+            org.plan = plan
+            org.save()
+
+        # Clear caches
+        cls.clear_subscription_cache(org.id)
+        from core.services.access_control import AccessControlService
+        AccessControlService.clear_org_cache(org.id)
+        return subscription
 
     @classmethod
-    def handle_webhook_event(cls, event):
-        """Handle Stripe webhook events"""
+    def record_webhook_event(cls, payload):
+        """
+        Store a webhook event once per Stripe event id and schedule its processing.
+
+        Args:
+            payload: Decoded event JSON as sent by Stripe
+
+        Returns:
+            tuple: (StripeEvent, created) - created is False for retried deliveries
+        """
+        data_object = payload.get('data', {}).get('object', {}) or {}
+        event_type = payload.get('type', '')
+        if event_type.startswith('customer.subscription.'):
+            stripe_subscription_id = data_object.get('id') or ''
+        else:
+            stripe_subscription_id = data_object.get('subscription') or ''
+        created_ts = payload.get('created')
+
+        event, created = StripeEvent.objects.get_or_create(
+            stripe_event_id=payload['id'],
+            defaults={
+                'type': event_type,
+                'stripe_subscription_id': stripe_subscription_id,
+                'payload': payload,
+                'event_created': datetime.fromtimestamp(created_ts, tz=dt_timezone.utc) if created_ts else None,
+            }
+        )
+        if created:
+            db_transaction.on_commit(lambda: cls.schedule_event_processing(stripe_subscription_id))
+        else:
+            logger.info(f"Duplicate webhook event {payload['id']} ignored")
+        return event, created
+
+    @classmethod
+    def schedule_event_processing(cls, stripe_subscription_id):
+        """Enqueue the processing of the pending events of a subscription"""
         try:
-            if event.type == 'customer.subscription.updated':
-                cls._handle_subscription_updated(event.data.object)
-            elif event.type == 'customer.subscription.deleted':
-                cls._handle_subscription_deleted(event.data.object)
-            elif event.type == 'invoice.payment_succeeded':
-                cls._handle_payment_succeeded(event.data.object)
-            elif event.type == 'invoice.payment_failed':
-                cls._handle_payment_failed(event.data.object)
-            
-            logger.info(f"Successfully processed webhook event {event.type}")
+            from payments.tasks import process_stripe_events
+            process_stripe_events.delay(stripe_subscription_id)
         except Exception as e:
-            logger.error(f"Error processing webhook event {event.type}: {str(e)}")
-            raise StripeError(f"Error processing webhook: {str(e)}")
+            # The events stay pending and are picked up by process_pending_stripe_events
+            logger.warning(f"Could not enqueue webhook processing for {stripe_subscription_id}: {str(e)}")
 
     @classmethod
-    def _handle_subscription_updated(cls, subscription_data):
-        """Handle subscription update webhook"""
-        try:
-            subscription = Subscription.objects.get(
-                stripe_subscription_id=subscription_data['id']
-            )
-            
-            subscription.status = subscription_data['status']
-            subscription.current_period_end = timezone.datetime.fromtimestamp(
-                subscription_data['current_period_end'],
-                tz=timezone.utc
-            )
-            subscription.save()
-            
-            # Update organization plan
-            org = subscription.organization
-            if subscription_data['status'] == 'active':
-                org.plan = 'pro'
+    def process_pending_events(cls, stripe_subscription_id):
+        """
+        Process the pending webhook events of one subscription, in Stripe order.
+
+        The Subscription row is locked for the whole batch so events of the same
+        subscription are never processed concurrently. State changes are
+        coalesced: only the latest update (or a deletion, which is final) is
+        written; earlier updates are marked as superseded. Stripe does not
+        guarantee delivery order either, so a batch whose latest state event is
+        older than the last one applied to the subscription (or that arrives
+        after its deletion) is superseded as a whole.
+
+        Stripe already got a 200, so a failed batch (including events that
+        arrive before their Subscription row exists) stays pending and is
+        retried by the periodic sweep with exponential backoff; it is only
+        marked failed after STRIPE_EVENT_MAX_ATTEMPTS attempts.
+
+        Returns:
+            int: Number of events handled
+        """
+        with db_transaction.atomic():
+            subscription = None
+            if stripe_subscription_id:
+                subscription = Subscription.objects.select_for_update().select_related('organization').filter(
+                    stripe_subscription_id=stripe_subscription_id
+                ).first()
+            events = list(StripeEvent.objects.select_for_update().filter(
+                stripe_subscription_id=stripe_subscription_id, status='pending'
+            ).order_by('event_created', 'id'))
+            if not events:
+                return 0
+
+            state_events = [event for event in events if event.type in cls.SUBSCRIPTION_EVENT_TYPES]
+            deleted = [event for event in state_events if event.type == 'customer.subscription.deleted']
+            final_event = deleted[-1] if deleted else (state_events[-1] if state_events else None)
+            if final_event is not None and subscription is not None and cls._is_stale_event(subscription, final_event):
+                final_event = None
+
+            error = ''
+            if stripe_subscription_id and subscription is None:
+                error = f"Subscription {stripe_subscription_id} not found"
+                logger.error(error)
             else:
-                org.plan = 'free'
-            org.save()
-            
-            # Clear caches
-            cls.clear_subscription_cache(org.id)
-            from core.services.access_control import AccessControlService
-            AccessControlService.clear_org_cache(org.id)
-            
-            logger.info(f"Updated subscription {subscription.id} for organization {org.id}")
-        except Subscription.DoesNotExist:
-            logger.error(f"Subscription {subscription_data['id']} not found")
-            raise ValidationError("Subscription not found")
+                try:
+                    with db_transaction.atomic():
+                        cls._apply_events(subscription, events, final_event)
+                except Exception as e:
+                    error = str(e)
+                    logger.error(f"Error processing webhook events for {stripe_subscription_id}: {error}")
+
+            now = timezone.now()
+            for event in events:
+                event.attempts += 1
+                event.error = error
+                if error:
+                    if event.attempts >= cls.get_max_event_attempts():
+                        event.status = 'failed'
+                    event.next_attempt_at = now + cls.get_retry_delay(event.attempts)
+                elif event.type in cls.SUBSCRIPTION_EVENT_TYPES and event is not final_event:
+                    event.status = 'superseded'
+                else:
+                    event.status = 'processed'
+                    event.processed_at = now
+            StripeEvent.objects.bulk_update(events, ['status', 'attempts', 'error', 'processed_at', 'next_attempt_at'])
+
+            if subscription is not None:
+                org_id = subscription.organization_id
+                db_transaction.on_commit(lambda: cls.clear_subscription_cache(org_id))
+        return len(events)
 
     @classmethod
-    def _handle_subscription_deleted(cls, subscription_data):
-        """Handle subscription deletion webhook"""
-        try:
-            subscription = Subscription.objects.get(
-                stripe_subscription_id=subscription_data['id']
-            )
-            org = subscription.organization
-            
-            # Update organization plan
-            org.plan = 'free'
-            org.save()
-            
-            # Clear caches
-            cls.clear_subscription_cache(org.id)
-            from core.services.access_control import AccessControlService
-            AccessControlService.clear_org_cache(org.id)
-            
-            logger.info(f"Deleted subscription {subscription.id} for organization {org.id}")
-        except Subscription.DoesNotExist:
-            logger.error(f"Subscription {subscription_data['id']} not found")
-            raise ValidationError("Subscription not found")
+    def get_max_event_attempts(cls):
+        return getattr(settings, 'STRIPE_EVENT_MAX_ATTEMPTS', 10)
 
     @classmethod
-    def _handle_payment_succeeded(cls, invoice_data):
-        """Handle successful payment webhook"""
-        try:
-            subscription = Subscription.objects.get(
-                stripe_subscription_id=invoice_data['subscription']
-            )
-            logger.info(f"Payment succeeded for subscription {subscription.id}")
-        except Subscription.DoesNotExist:
-            logger.error(f"Subscription {invoice_data['subscription']} not found")
-            raise ValidationError("Subscription not found")
+    def get_retry_delay(cls, attempts):
+        """Backoff before the next attempt of a failed event batch"""
+        return timedelta(seconds=min(cls.EVENT_RETRY_BASE_DELAY * 2 ** (attempts - 1), cls.EVENT_RETRY_MAX_DELAY))
 
     @classmethod
-    def _handle_payment_failed(cls, invoice_data):
-        """Handle failed payment webhook"""
-        try:
-            subscription = Subscription.objects.get(
-                stripe_subscription_id=invoice_data['subscription']
-            )
-            logger.warning(f"Payment failed for subscription {subscription.id}")
-        except Subscription.DoesNotExist:
-            logger.error(f"Subscription {invoice_data['subscription']} not found")
-            raise ValidationError("Subscription not found") 
\ No newline at end of file
+    def get_due_subscription_ids(cls):
+        """Subscriptions with pending events that are not waiting for a retry"""
+        return list(StripeEvent.objects.filter(status='pending').filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now())
+        ).values_list('stripe_subscription_id', flat=True).distinct().order_by())
+
+    @classmethod
+    def _is_stale_event(cls, subscription, event):
+        """Whether a state event was overtaken by one already applied to the subscription"""
+        last_applied = subscription.last_event_created
+        if last_applied and event.event_created and event.event_created < last_applied:
+            return True
+        if event.type == 'customer.subscription.deleted':
+            return False
+        # A deletion is final: later updates must not bring the subscription back
+        return StripeEvent.objects.filter(
+            stripe_subscription_id=subscription.stripe_subscription_id,
+            type='customer.subscription.deleted', status='processed',
+        ).exists()
+
+    @classmethod
+    def _apply_events(cls, subscription, events, final_event):
+        if final_event is not None:
+            subscription_data = final_event.payload['data']['object']
+            if final_event.event_created:
+                subscription.last_event_created = final_event.event_created
+            if final_event.type == 'customer.subscription.deleted':
+                cls.mark_subscription_deleted(subscription, subscription_data)
+            else:
+                cls.sync_from_stripe(subscription, subscription_data)
+        # Invoices without a subscription (one-off charges) carry an empty id
+        subscription_label = subscription.id if subscription is not None else 'none'
+        for event in events:
+            if event.type == 'invoice.payment_succeeded':
+                logger.info(f"Payment succeeded for subscription {subscription_label}")
+            elif event.type == 'invoice.payment_failed':
+                logger.warning(f"Payment failed for subscription {subscription_label}")
+        logger.info(f"Processed {len(events)} webhook events for {subscription.stripe_subscription_id if subscription else 'no subscription'}")
+
+    @classmethod
+    def mark_subscription_deleted(cls, subscription, subscription_data):
+        """Mark the local subscription as canceled and downgrade the organization"""
+        subscription.status = subscription_data.get('status') or 'canceled'
+        subscription.synced_at = timezone.now()
+        subscription.save(update_fields=['status', 'synced_at', 'last_event_created', 'updated_at'])
+        org = subscription.organization
+        
+        # Update organization plan
+        org.plan = 'free'
+        org.save()
+        
+        # Clear caches
+        cls.clear_subscription_cache(org.id)
+        from core.services.access_control import AccessControlService
+        AccessControlService.clear_org_cache(org.id)
+        return subscription
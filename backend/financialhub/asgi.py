@@ -2,6 +2,8 @@
 ASGI config for financialhub project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections are authenticated with the
+JWT access token and routed to the notification and chat consumers.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +15,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'financialhub.settings')
 
-application = get_asgi_application()
+# Django must be set up before importing the consumers (they import models)
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+from accounts.websocket import JWTAuthMiddleware  # noqa: E402
+from chat.routing import websocket_urlpatterns as chat_websocket_urlpatterns  # noqa: E402
+from notifications.routing import websocket_urlpatterns as notification_websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        JWTAuthMiddleware(
+            URLRouter(notification_websocket_urlpatterns + chat_websocket_urlpatterns)
+        )
+    ),
+})
@@ -20,15 +20,18 @@ ALLOWED_HOSTS = ['*']
 
 # Application definition
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
+    'channels',
     'accounts',
     'organizations',
     'transactions',
@@ -203,6 +206,16 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'process-pending-stripe-events': {
+        'task': 'payments.tasks.process_pending_stripe_events',
+        'schedule': 60.0,
+    },
+    'process-scheduled-notifications': {
+        'task': 'notifications.tasks.process_scheduled_notifications',
+        'schedule': 60.0,
+    },
+}
 
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -212,18 +225,43 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@financialhub.com')
+NOTIFICATION_DIGEST_THRESHOLD = int(os.getenv('NOTIFICATION_DIGEST_THRESHOLD', 3))  # emails per user per batch before digesting
+NOTIFICATION_DISPATCH_BATCH_SIZE = int(os.getenv('NOTIFICATION_DISPATCH_BATCH_SIZE', 500))
+NOTIFICATION_MAX_DELIVERY_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_DELIVERY_ATTEMPTS', 5))  # failed email sends before giving up
 
 # AI settings
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 AI_MODEL = os.getenv('AI_MODEL', 'gpt-4')
 AI_TEMPERATURE = float(os.getenv('AI_TEMPERATURE', 0.7))
 AI_MAX_TOKENS = int(os.getenv('AI_MAX_TOKENS', 2000))
+ML_MODELS_DIR = os.getenv('ML_MODELS_DIR', os.path.join(BASE_DIR, 'ml_models'))
+ML_MODELS_MMAP_MODE = os.getenv('ML_MODELS_MMAP_MODE') or None  # e.g. 'r' to memory-map model arrays
+AI_CLASSIFICATION_BATCH_SIZE = int(os.getenv('AI_CLASSIFICATION_BATCH_SIZE', 2000))
+
+# Transaction search backend: 'elasticsearch' or 'postgres' (no cluster needed)
+TRANSACTION_SEARCH_BACKEND = os.getenv('TRANSACTION_SEARCH_BACKEND', 'elasticsearch')
+
+# Elasticsearch settings
+ELASTICSEARCH_DSL = {
+    'default': {
+        'hosts': os.getenv('ELASTICSEARCH_HOST', 'http://localhost:9200'),
+        'timeout': 30,
+        'retry_on_timeout': True,
+        'max_retries': 3,
+    },
+}
+ELASTICSEARCH_INDEX_SHARDS = int(os.getenv('ELASTICSEARCH_INDEX_SHARDS', 3))
+ELASTICSEARCH_INDEX_CHUNK_SIZE = int(os.getenv('ELASTICSEARCH_INDEX_CHUNK_SIZE', 500))
+ELASTICSEARCH_INDEX_WORKERS = int(os.getenv('ELASTICSEARCH_INDEX_WORKERS', 4))
+ELASTICSEARCH_SIGNAL_BATCH_SIZE = int(os.getenv('ELASTICSEARCH_SIGNAL_BATCH_SIZE', 500))
 
 # Stripe settings
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
 STRIPE_PRICE_ID = os.getenv('STRIPE_PRICE_ID')
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv('STRIPE_EVENT_MAX_ATTEMPTS', 10))
+SUBSCRIPTION_STATUS_STALE_AFTER = int(os.getenv('SUBSCRIPTION_STATUS_STALE_AFTER', 300))  # seconds
 
 # Feature flags
 ENABLE_AI_INSIGHTS = True
@@ -260,6 +298,10 @@ CACHES = {
     }
 }
 
+# In-process cache of the user's organization memberships (OrganizationMiddleware / require_access)
+ORG_CONTEXT_CACHE_TTL = int(os.getenv('ORG_CONTEXT_CACHE_TTL', 30))  # seconds, 0 disables it
+ORG_CONTEXT_CACHE_SIZE = int(os.getenv('ORG_CONTEXT_CACHE_SIZE', 1024))  # users kept per process
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -2,6 +2,7 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
 from django.utils import timezone
 from .models import FinancialGoal, GoalMilestone, GoalContribution
 from .serializers import (
@@ -28,14 +29,16 @@ class FinancialGoalViewSet(viewsets.ModelViewSet):
         serializer = GoalProgressUpdateSerializer(data=request.data)
         
         if serializer.is_valid():
-            goal.current_amount = serializer.validated_data['current_amount']
-            if 'status' in serializer.validated_data:
-                goal.status = serializer.validated_data['status']
-            goal.save()
-            
-            # Notificar si el goal está cerca de completarse
-            if goal.progress_percentage >= 90:
-                self._notify_goal_progress(goal)
+            # Las notificaciones se despachan juntas al confirmar la transacción
+            with transaction.atomic():
+                goal.current_amount = serializer.validated_data['current_amount']
+                if 'status' in serializer.validated_data:
+                    goal.status = serializer.validated_data['status']
+                goal.save()
+
+                # Notificar si el goal está cerca de completarse
+                if goal.progress_percentage >= 90:
+                    self._notify_goal_progress(goal)
             
             return Response(FinancialGoalSerializer(goal).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -46,12 +49,13 @@ class FinancialGoalViewSet(viewsets.ModelViewSet):
         serializer = GoalContributionCreateSerializer(data=request.data)
         
         if serializer.is_valid():
-            contribution = serializer.save(goal=goal)
-            goal.current_amount += contribution.amount
-            goal.save()
-            
-            # Notificar sobre la nueva contribución
-            self._notify_contribution(goal, contribution)
+            with transaction.atomic():
+                contribution = serializer.save(goal=goal)
+                goal.current_amount += contribution.amount
+                goal.save()
+
+                # Notificar sobre la nueva contribución
+                self._notify_contribution(goal, contribution)
             
             return Response(GoalContributionSerializer(contribution).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -7,7 +7,20 @@ from incentives.serializers import IncentiveSerializer
 from accounts.models import User
 from organizations.models import Organization
 from notifications.models import Notification
-from accounts.access_control import has_pro_access
+from core.services.entitlements import EntitlementService
+from core.services.org_context import OrgContextService
+
+def get_request_org(request, org_id):
+    """Organización indicada, sin consulta si es la del request o una de las del usuario"""
+    if not org_id:
+        return None
+    org = getattr(request, 'organization', None)
+    if org is not None and str(org.id) == str(org_id):
+        return org
+    context = OrgContextService.get_context(request.user, org_id)
+    if context is not None:
+        return context.organization
+    return Organization.objects.get(id=org_id)
 
 class IncentiveListCreateView(APIView):
     permission_classes = [IsAuthenticated]
@@ -15,8 +28,8 @@ class IncentiveListCreateView(APIView):
     def get(self, request):
         # Controlar acceso a feature Pro 'incentives'
         org_id = request.query_params.get('organization_id')
-        org = Organization.objects.get(id=org_id) if org_id else None
-        if not has_pro_access(request.user, org, feature='incentives'):
+        org = get_request_org(request, org_id)
+        if not EntitlementService.has_pro_access(request.user, org, feature='incentives', request=request):
             return Response({'detail': 'Acceso a incentivos solo para usuarios Pro.'}, status=status.HTTP_402_PAYMENT_REQUIRED)
         if getattr(request.user, 'role', None) == 'accountant':
             incentives = Incentive.objects.filter(accountant=request.user).order_by('-created_at')
@@ -28,8 +41,8 @@ class IncentiveListCreateView(APIView):
     def post(self, request):
         # Controlar acceso a feature Pro 'incentives'
         org_id = request.data.get('organization')
-        org = Organization.objects.get(id=org_id) if org_id else None
-        if not has_pro_access(request.user, org, feature='incentives'):
+        org = get_request_org(request, org_id)
+        if not EntitlementService.has_pro_access(request.user, org, feature='incentives', request=request):
             return Response({'detail': 'Acceso a incentivos solo para usuarios Pro.'}, status=status.HTTP_402_PAYMENT_REQUIRED)
         if getattr(request.user, 'role', None) != 'accountant':
             return Response({'detail': 'Solo los contadores pueden crear incentivos.'}, status=status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,33 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Real-time notifications of the authenticated user.
+
+    Joins the ``user_<id>`` group the dispatcher sends to, and forwards each
+    ``notification.message`` / ``notification.batch`` event to the client.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4001)
+            return
+        self.group_name = f"user_{user.id}"
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if getattr(self, 'group_name', None):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def notification_message(self, event):
+        await self.send_json({'type': 'notification', 'notification': event['message']})
+
+    async def notification_batch(self, event):
+        await self.send_json({'type': 'notifications', 'notifications': event['messages']})
@@ -0,0 +1,354 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Notification
+
+logger = logging.getLogger('notifications')
+
+
+class NotificationDispatcher:
+    """
+    Delivers notifications outside the request cycle.
+
+    ``NotificationService`` only inserts the rows and queues their ids here. Ids
+    queued while a transaction is open are flushed once it commits, as a single
+    ``dispatch_notifications`` task, so a request that creates several
+    notifications pays for one enqueue and nothing else.
+
+    The task delivers the whole batch at once:
+    - real-time: one channel-layer event per user (the notification itself, or
+      a ``notification.batch`` event with all of them), every ``group_send``
+      awaited inside a single event loop;
+    - email: all messages go through one SMTP connection with
+      ``send_messages``; a user with ``NOTIFICATION_DIGEST_THRESHOLD`` or more
+      emails in the batch gets a single digest instead.
+
+    Each notification is claimed (``dispatched_at``) before it is delivered,
+    so neither a retried task nor the scheduler sends it twice; scheduled
+    notifications are picked up by ``process_due``.
+
+    Email is delivered at least once: if the SMTP send fails, the batch is
+    released (``dispatched_at`` cleared and ``scheduled_for`` pushed back with
+    exponential backoff) for the scheduler to retry, up to
+    ``NOTIFICATION_MAX_DELIVERY_ATTEMPTS`` attempts. Real-time events are best
+    effort: the notification is already stored and clients load it from the API.
+    """
+
+    METRICS_CACHE_KEY = 'notifications:dispatcher:last_run'
+
+    _local = threading.local()
+
+    @classmethod
+    def get_digest_threshold(cls):
+        return getattr(settings, 'NOTIFICATION_DIGEST_THRESHOLD', 3)
+
+    @classmethod
+    def get_batch_size(cls):
+        return getattr(settings, 'NOTIFICATION_DISPATCH_BATCH_SIZE', 500)
+
+    @classmethod
+    def get_max_attempts(cls):
+        return getattr(settings, 'NOTIFICATION_MAX_DELIVERY_ATTEMPTS', 5)
+
+    @staticmethod
+    def get_retry_delay(attempts):
+        """Seconds before retrying a delivery that failed ``attempts`` times"""
+        return min(60 * 2 ** (attempts - 1), 3600)
+
+    @classmethod
+    def enqueue(cls, notification_ids):
+        """Queue notifications for delivery once the current transaction commits"""
+        if not notification_ids:
+            return
+        pending = getattr(cls._local, 'pending', None)
+        if pending is None:
+            pending = cls._local.pending = []
+        pending.extend(notification_ids)
+        # Every enqueue registers a flush; the first one to run drains the whole list
+        db_transaction.on_commit(cls.flush)
+
+    @classmethod
+    def flush(cls):
+        """Send every queued id to the dispatcher task"""
+        notification_ids = list(dict.fromkeys(getattr(cls._local, 'pending', None) or []))
+        cls._local.pending = []
+        if not notification_ids:
+            return
+        try:
+            from notifications.tasks import dispatch_notifications
+            dispatch_notifications.delay(notification_ids)
+        except Exception as e:
+            # Without a broker the notifications are delivered in this process
+            logger.warning(f"Could not enqueue notification dispatch, delivering inline: {e}")
+            cls.dispatch(notification_ids)
+
+    @classmethod
+    def dispatch(cls, notification_ids):
+        """
+        Claim the given notifications and deliver them.
+
+        Notifications already claimed (by another task or by the scheduler) or
+        scheduled for later are skipped, so a notification is delivered once.
+        """
+        notifications = cls.claim(
+            Notification.objects.filter(cls.due_filter(timezone.now()), id__in=notification_ids)
+        )
+        return cls.deliver(notifications)
+
+    @staticmethod
+    def due_filter(now):
+        return Q(scheduled_for__isnull=True) | Q(scheduled_for__lte=now)
+
+    @classmethod
+    def claim(cls, queryset, limit=None):
+        """
+        Mark up to ``limit`` undispatched notifications of ``queryset`` as dispatched.
+
+        The rows are selected with ``SELECT ... FOR UPDATE SKIP LOCKED`` and
+        marked in the same transaction, so concurrent workers claim disjoint
+        batches without waiting on each other.
+
+        Returns:
+            list: Claimed notifications, with their user
+        """
+        with db_transaction.atomic():
+            ids = queryset.filter(dispatched_at__isnull=True).select_for_update(
+                skip_locked=True
+            ).order_by('scheduled_for', 'created_at', 'id').values_list('id', flat=True)
+            ids = list(ids[:limit] if limit else ids)
+            if ids:
+                Notification.objects.filter(id__in=ids).update(dispatched_at=timezone.now())
+        if not ids:
+            return []
+        return list(Notification.objects.filter(id__in=ids).select_related('user'))
+
+    @classmethod
+    def deliver(cls, notifications):
+        """
+        Deliver a batch of notifications through the channel layer and email.
+
+        Notifications whose email could not be sent are released for a retry.
+
+        Returns:
+            dict: Number of notifications, real-time events, emails sent and failed notifications
+        """
+        by_user = defaultdict(list)
+        for notification in sorted(notifications, key=lambda n: (n.user_id, n.created_at, n.id)):
+            by_user[notification.user_id].append(notification)
+
+        realtime_events = cls.send_realtime(by_user)
+        emails, failed = cls.send_emails(by_user)
+        if failed:
+            cls.release(failed)
+        return {
+            'notifications': len(notifications),
+            'realtime_events': realtime_events,
+            'emails': emails,
+            'failed': len(failed),
+        }
+
+    @classmethod
+    def release(cls, notifications):
+        """
+        Record a failed delivery and put the notifications back in the queue.
+
+        They become due again after ``get_retry_delay``; once they reach
+        ``NOTIFICATION_MAX_DELIVERY_ATTEMPTS`` they stay dispatched and are only logged.
+        """
+        now = timezone.now()
+        max_attempts = cls.get_max_attempts()
+        retry_ids = defaultdict(list)
+        exhausted = []
+        for notification in notifications:
+            attempts = notification.delivery_attempts + 1
+            if attempts >= max_attempts:
+                exhausted.append(notification.id)
+            else:
+                retry_ids[attempts].append(notification.id)
+        with db_transaction.atomic():
+            for attempts, ids in retry_ids.items():
+                Notification.objects.filter(id__in=ids).update(
+                    dispatched_at=None,
+                    delivery_attempts=attempts,
+                    scheduled_for=now + timedelta(seconds=cls.get_retry_delay(attempts)),
+                )
+            if exhausted:
+                Notification.objects.filter(id__in=exhausted).update(delivery_attempts=max_attempts)
+        if exhausted:
+            logger.error(f"Giving up on delivering notifications {exhausted} after {max_attempts} attempts")
+
+    @classmethod
+    def process_due(cls, batch_size=None, max_batches=None):
+        """
+        Claim and deliver due notifications in batches until none are left.
+
+        Safe to run from several workers at once. The run's metrics are stored
+        in the cache and returned.
+
+        Args:
+            batch_size: Notifications claimed per batch (``NOTIFICATION_DISPATCH_BATCH_SIZE``)
+            max_batches: Stop after this many batches (unlimited by default)
+        """
+        batch_size = batch_size or cls.get_batch_size()
+        started = time.monotonic()
+        stats = {'batches': 0, 'dispatched': 0, 'realtime_events': 0, 'emails': 0, 'failed': 0,
+                 'max_lag_seconds': 0.0}
+        total_lag = 0.0
+
+        while max_batches is None or stats['batches'] < max_batches:
+            notifications = cls.claim(
+                Notification.objects.filter(cls.due_filter(timezone.now())), limit=batch_size
+            )
+            if not notifications:
+                break
+            result = cls.deliver(notifications)
+            stats['batches'] += 1
+            stats['dispatched'] += result['notifications']
+            stats['realtime_events'] += result['realtime_events']
+            stats['emails'] += result['emails']
+            stats['failed'] += result['failed']
+            for notification in notifications:
+                # Lag between the time it was due and the time it was claimed
+                lag = (notification.dispatched_at - (notification.scheduled_for or notification.created_at)).total_seconds()
+                total_lag += lag
+                stats['max_lag_seconds'] = max(stats['max_lag_seconds'], lag)
+            if len(notifications) < batch_size:
+                break
+
+        elapsed = time.monotonic() - started
+        stats['max_lag_seconds'] = round(stats['max_lag_seconds'], 3)
+        stats['avg_lag_seconds'] = round(total_lag / stats['dispatched'], 3) if stats['dispatched'] else 0.0
+        stats['seconds'] = round(elapsed, 3)
+        stats['per_second'] = round(stats['dispatched'] / elapsed, 1) if elapsed else None
+        stats['finished_at'] = timezone.now().isoformat()
+
+        if stats['dispatched']:
+            cache.set(cls.METRICS_CACHE_KEY, stats, None)
+            logger.info(
+                f"Dispatched {stats['dispatched']} notifications in {stats['batches']} batches "
+                f"({stats['per_second']}/s, max lag {stats['max_lag_seconds']}s)"
+            )
+        return stats
+
+    @classmethod
+    def get_metrics(cls):
+        """Current backlog of due notifications and the metrics of the last run that dispatched any"""
+        now = timezone.now()
+        backlog = Notification.objects.filter(cls.due_filter(now), dispatched_at__isnull=True)
+        oldest = backlog.order_by('scheduled_for', 'created_at').values_list('scheduled_for', 'created_at').first()
+        oldest_due = (oldest[0] or oldest[1]) if oldest else None
+        return {
+            'backlog': backlog.count(),
+            'oldest_lag_seconds': round((now - oldest_due).total_seconds(), 3) if oldest_due else 0.0,
+            'last_run': cache.get(cls.METRICS_CACHE_KEY),
+        }
+
+    @classmethod
+    def send_realtime(cls, by_user):
+        """Send one event per user to its ``user_<id>`` group"""
+        if not by_user:
+            return 0
+        events = [(f"user_{user_id}", cls.build_event(items)) for user_id, items in by_user.items()]
+        try:
+            channel_layer = get_channel_layer()
+            if channel_layer is None:
+                return 0
+            async_to_sync(cls._group_send_all)(channel_layer, events)
+        except Exception as e:
+            logger.error(f"Error sending real-time notifications: {e}")
+            return 0
+        return len(events)
+
+    @staticmethod
+    async def _group_send_all(channel_layer, events):
+        await asyncio.gather(*(channel_layer.group_send(group, event) for group, event in events))
+
+    @classmethod
+    def build_event(cls, notifications):
+        if len(notifications) == 1:
+            return {
+                "type": "notification.message",
+                "message": cls.serialize(notifications[0]),
+            }
+        return {
+            "type": "notification.batch",
+            "messages": [cls.serialize(notification) for notification in notifications],
+        }
+
+    @staticmethod
+    def serialize(notification):
+        return {
+            "id": notification.id,
+            "type": notification.type,
+            "title": notification.title,
+            "message": notification.message,
+            "created_at": notification.created_at.isoformat(),
+        }
+
+    @classmethod
+    def send_emails(cls, by_user):
+        """
+        Send every email of the batch over a single SMTP connection
+
+        Returns:
+            tuple: Emails sent and the notifications left undelivered if the send failed
+        """
+        threshold = cls.get_digest_threshold()
+        messages = []
+        emailed = []
+        for items in by_user.values():
+            user = items[0].user
+            if not user.email or not cls.should_send_email(user):
+                continue
+            if threshold and len(items) >= threshold:
+                messages.append(cls.build_digest(user, items))
+            else:
+                messages.extend(cls.build_email(notification) for notification in items)
+            emailed.extend(items)
+
+        if not messages:
+            return 0, []
+        try:
+            with get_connection() as connection:
+                return connection.send_messages(messages) or 0, []
+        except Exception as e:
+            logger.error(f"Error sending email notifications, {len(emailed)} will be retried: {e}")
+            return 0, emailed
+
+    @staticmethod
+    def should_send_email(user):
+        """
+        Check if email notifications are enabled for the user
+        """
+        preferences = getattr(user, 'notification_preferences', None) or {}
+        return preferences.get('email_enabled', True)
+
+    @staticmethod
+    def build_email(notification):
+        return EmailMessage(
+            subject=notification.title,
+            body=notification.message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[notification.user.email],
+        )
+
+    @staticmethod
+    def build_digest(user, notifications):
+        lines = [f"- {notification.title}: {notification.message}" for notification in notifications]
+        return EmailMessage(
+            subject=f"Tienes {len(notifications)} notificaciones nuevas",
+            body="\n".join(lines),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email],
+        )
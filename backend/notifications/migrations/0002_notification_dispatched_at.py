@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+def mark_existing_dispatched(apps, schema_editor):
+    # Las notificaciones previas ya se enviaron al crearse
+    Notification = apps.get_model("notifications", "Notification")
+    Notification.objects.filter(dispatched_at__isnull=True).update(dispatched_at=models.F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="dispatched_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_dispatched, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("dispatched_at__isnull", True)),
+                fields=["scheduled_for", "created_at"],
+                name="notifications_undispatched_idx",
+            ),
+        ),
+    ]
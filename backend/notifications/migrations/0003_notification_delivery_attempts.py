@@ -0,0 +1,18 @@
+# Generated by Django 5.1.9 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0002_notification_dispatched_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="delivery_attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
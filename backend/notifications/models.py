@@ -27,6 +27,8 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     scheduled_for = models.DateTimeField(null=True, blank=True)  # For scheduled notifications
+    dispatched_at = models.DateTimeField(null=True, blank=True)  # Claimed for delivery by the dispatcher
+    delivery_attempts = models.PositiveSmallIntegerField(default=0)  # Failed deliveries so far
     expires_at = models.DateTimeField(null=True, blank=True)
     action_url = models.URLField(blank=True, null=True)  # URL for action button
     action_text = models.CharField(max_length=50, blank=True, null=True)
@@ -37,6 +39,11 @@ class Notification(models.Model):
             models.Index(fields=['user', 'is_read']),
             models.Index(fields=['type', 'priority']),
             models.Index(fields=['scheduled_for']),
+            models.Index(
+                fields=['scheduled_for', 'created_at'],
+                condition=models.Q(dispatched_at__isnull=True),
+                name='notifications_undispatched_idx',
+            ),
         ]
 
     def __str__(self):
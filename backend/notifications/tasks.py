@@ -0,0 +1,15 @@
+from celery import shared_task
+
+
+@shared_task(ignore_result=True)
+def dispatch_notifications(notification_ids):
+    """Deliver a batch of notifications (channel layer and email)"""
+    from notifications.dispatcher import NotificationDispatcher
+    return NotificationDispatcher.dispatch(notification_ids)
+
+
+@shared_task(ignore_result=True)
+def process_scheduled_notifications():
+    """Periodic task: deliver the due notifications in batches"""
+    from notifications.dispatcher import NotificationDispatcher
+    return NotificationDispatcher.process_due()
@@ -0,0 +1,150 @@
+from datetime import timedelta
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import User
+from financialhub.asgi import application
+from notifications.dispatcher import NotificationDispatcher
+from notifications.models import Notification
+from notifications.services import NotificationService
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    NOTIFICATION_DIGEST_THRESHOLD=3,
+)
+class NotificationDispatcherTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='notified', password='pass', email='notified@example.com')
+        self.other = User.objects.create_user(username='other', password='pass', email='other@example.com')
+        self.service = NotificationService()
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(f"user_{self.user.id}", self.channel)
+
+    def notify(self, user, title):
+        return self.service.create_notification(user=user, type='info', title=title, message=f'{title}!')
+
+    def test_nothing_is_delivered_inside_the_request(self):
+        with patch('notifications.tasks.dispatch_notifications.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.notify(self.user, 'Uno')
+                second = self.notify(self.user, 'Dos')
+
+        # Un solo envío a la cola para todo lo creado en la transacción
+        delay.assert_called_once_with([first.id, second.id])
+        self.assertEqual(mail.outbox, [])
+
+    def test_batch_is_grouped_per_user_and_digested(self):
+        with patch('notifications.tasks.dispatch_notifications.delay', side_effect=NotificationDispatcher.dispatch):
+            with self.captureOnCommitCallbacks(execute=True):
+                for title in ('Uno', 'Dos', 'Tres'):
+                    self.notify(self.user, title)
+                self.notify(self.other, 'Otro')
+
+        event = async_to_sync(self.layer.receive)(self.channel)
+        self.assertEqual(event['type'], 'notification.batch')
+        self.assertEqual([message['title'] for message in event['messages']], ['Uno', 'Dos', 'Tres'])
+
+        self.assertEqual(len(mail.outbox), 2)
+        digest = next(email for email in mail.outbox if email.to == ['notified@example.com'])
+        self.assertIn('3 notificaciones', digest.subject)
+        self.assertIn('- Tres: Tres!', digest.body)
+
+    def test_email_preferences_and_scheduled_notifications(self):
+        self.user.notification_preferences = {'email_enabled': False}
+        self.user.save()
+        scheduled = self.service.create_notification(
+            user=self.other, type='info', title='Luego', message='Luego',
+            scheduled_for=timezone.now() + timedelta(hours=1)
+        )
+
+        with patch('notifications.tasks.dispatch_notifications.delay', side_effect=NotificationDispatcher.dispatch):
+            with self.captureOnCommitCallbacks(execute=True):
+                notification = self.notify(self.user, 'Solo WebSocket')
+
+        event = async_to_sync(self.layer.receive)(self.channel)
+        self.assertEqual(event['type'], 'notification.message')
+        self.assertEqual(event['message']['id'], notification.id)
+        self.assertEqual(mail.outbox, [])
+
+        Notification.objects.filter(pk=scheduled.pk).update(scheduled_for=timezone.now())
+        with patch('notifications.tasks.dispatch_notifications.delay', side_effect=NotificationDispatcher.dispatch):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.service.process_scheduled_notifications()
+        self.assertEqual([email.subject for email in mail.outbox], ['Luego'])
+
+    def test_scheduler_claims_due_notifications_once_in_batches(self):
+        past = timezone.now() - timedelta(minutes=5)
+        for index in range(5):
+            self.service.create_notification(
+                user=self.other, type='info', title=f'Programada {index}', message='...',
+                scheduled_for=timezone.now() + timedelta(hours=1)
+            )
+        Notification.objects.update(scheduled_for=past)
+        future = self.service.create_notification(
+            user=self.other, type='info', title='Futura', message='...',
+            scheduled_for=timezone.now() + timedelta(hours=1)
+        )
+
+        stats = self.service.process_scheduled_notifications(batch_size=2)
+
+        self.assertEqual((stats['dispatched'], stats['batches']), (5, 3))
+        self.assertGreaterEqual(stats['max_lag_seconds'], 300)
+        self.assertEqual(Notification.objects.filter(dispatched_at__isnull=True).get(), future)
+        # Una segunda pasada (u otro worker) no vuelve a enviarlas
+        self.assertEqual(self.service.process_scheduled_notifications()['dispatched'], 0)
+        self.assertEqual(NotificationDispatcher.dispatch(list(Notification.objects.values_list('id', flat=True)))['notifications'], 0)
+
+        metrics = NotificationDispatcher.get_metrics()
+        self.assertEqual(metrics['backlog'], 0)
+        self.assertEqual(metrics['last_run']['dispatched'], 5)
+
+    @override_settings(NOTIFICATION_MAX_DELIVERY_ATTEMPTS=2)
+    def test_failed_email_is_released_for_retry_until_attempts_run_out(self):
+        notification = self.service.create_notification(
+            user=self.other, type='info', title='Reintento', message='...', scheduled_for=timezone.now()
+        )
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP caído')):
+            stats = self.service.process_scheduled_notifications()
+        notification.refresh_from_db()
+        self.assertEqual((stats['dispatched'], stats['failed']), (1, 1))
+        self.assertIsNone(notification.dispatched_at)
+        self.assertEqual(notification.delivery_attempts, 1)
+        self.assertGreater(notification.scheduled_for, timezone.now())
+
+        Notification.objects.filter(pk=notification.pk).update(scheduled_for=timezone.now())
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP caído')):
+            self.service.process_scheduled_notifications()
+        notification.refresh_from_db()
+        # Agotados los intentos queda como despachada y no se vuelve a reclamar
+        self.assertIsNotNone(notification.dispatched_at)
+        self.assertEqual(notification.delivery_attempts, 2)
+        self.assertEqual(self.service.process_scheduled_notifications()['dispatched'], 0)
+        self.assertEqual(mail.outbox, [])
+
+    async def test_consumer_forwards_the_user_group_events(self):
+        communicator = WebsocketCommunicator(application, f'/ws/notifications/?token={AccessToken.for_user(self.user)}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        notification = {'id': 1, 'type': 'info', 'title': 'Hola', 'message': '...', 'created_at': ''}
+        await self.layer.group_send(f"user_{self.user.id}", {'type': 'notification.message', 'message': notification})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'notification', 'notification': notification})
+
+        await self.layer.group_send(f"user_{self.user.id}", {'type': 'notification.batch', 'messages': [notification]})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'notifications', 'notifications': [notification]})
+        await communicator.disconnect()
+
+        anonymous = WebsocketCommunicator(application, '/ws/notifications/?token=invalid')
+        connected, code = await anonymous.connect()
+        self.assertEqual((connected, code), (False, 4001))
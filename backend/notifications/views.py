@@ -1,13 +1,14 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.utils import timezone
 from .models import Notification
 from .serializers import (
     NotificationSerializer,
     NotificationBulkUpdateSerializer
 )
+from .dispatcher import NotificationDispatcher
 from .services import NotificationService
 
 class NotificationViewSet(viewsets.ModelViewSet):
@@ -44,4 +45,9 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         count = self.get_queryset().filter(is_read=False).count()
-        return Response({'unread_count': count}) 
\ No newline at end of file
+        return Response({'unread_count': count})
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def dispatch_stats(self, request):
+        """Backlog of due notifications and throughput of the last dispatcher run"""
+        return Response(NotificationDispatcher.get_metrics())
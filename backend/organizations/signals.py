@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.services.access_control import AccessControlService
+from core.services.org_context import OrgContextService
+from .models import Organization, OrganizationMembership
+
+
+@receiver(post_save, sender=OrganizationMembership)
+@receiver(post_delete, sender=OrganizationMembership)
+def invalidate_membership_context(sender, instance, **kwargs):
+    """
+    Invalidar el contexto de organización cacheado del usuario al cambiar su membresía
+    """
+    OrgContextService.invalidate_user(instance.user_id)
+    AccessControlService.clear_user_cache(instance.user_id)
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def invalidate_organization_context(sender, instance, **kwargs):
+    """
+    Invalidar los contextos cacheados que apuntan a la organización (plan, nombre, etc.)
+    """
+    OrgContextService.invalidate_org(instance.id)
+    AccessControlService.clear_org_cache(instance.id)
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.9 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscription",
+            name="cancel_at_period_end",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="subscription",
+            name="synced_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
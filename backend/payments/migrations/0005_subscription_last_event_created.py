@@ -0,0 +1,18 @@
+# Generated by Django 5.1.9 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0004_stripeevent_next_attempt_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="subscription",
+            name="last_event_created",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -8,6 +8,9 @@ class Subscription(models.Model):
     plan = models.CharField(max_length=32)
     status = models.CharField(max_length=32)
     current_period_end = models.DateTimeField()
+    cancel_at_period_end = models.BooleanField(default=False)
+    synced_at = models.DateTimeField(null=True, blank=True)  # Última sincronización con Stripe
+    last_event_created = models.DateTimeField(null=True, blank=True)  # Fecha del último evento de estado aplicado
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -17,4 +20,35 @@ class Payment(models.Model):
     currency = models.CharField(max_length=8)
     paid_at = models.DateTimeField()
     stripe_payment_intent = models.CharField(max_length=128)
-    status = models.CharField(max_length=32) 
\ No newline at end of file
+    status = models.CharField(max_length=32) 
+class StripeEvent(models.Model):
+    """
+    Registro de eventos de webhook de Stripe, uno por id de evento.
+    El webhook solo lo guarda; el procesamiento ocurre en segundo plano.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('superseded', 'Superseded'),  # Reemplazado por un evento posterior de la misma suscripción
+        ('failed', 'Failed'),
+    ]
+
+    stripe_event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=64)
+    stripe_subscription_id = models.CharField(max_length=128, blank=True, default='')
+    payload = models.JSONField()
+    event_created = models.DateTimeField(null=True, blank=True)  # Campo "created" del evento en Stripe
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)  # Reintento tras un fallo (backoff)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['stripe_subscription_id', 'status', 'event_created']),
+        ]
+
+    def __str__(self):
+        return f"{self.type} ({self.stripe_event_id})"
@@ -73,6 +73,7 @@ def attach_subscription_to_org(org: Organization, stripe_customer_id, stripe_sub
                 'plan': plan,
                 'status': status,
                 'current_period_end': current_period_end,
+                'synced_at': timezone.now(),
             }
         )
         return subscription
@@ -80,16 +81,6 @@ def attach_subscription_to_org(org: Organization, stripe_customer_id, stripe_sub
         raise ValidationError(f"Error attaching subscription to organization: {str(e)}")
 
 def get_subscription_status(organization):
-    try:
-        subscription = Subscription.objects.get(organization=organization)
-        stripe_sub = get_stripe_subscription(subscription.stripe_subscription_id)
-        return {
-            'status': stripe_sub['status'],
-            'current_period_end': timezone.datetime.fromtimestamp(stripe_sub['current_period_end'], tz=timezone.utc),
-            'plan': subscription.plan,
-            'cancel_at_period_end': stripe_sub['cancel_at_period_end']
-        }
-    except Subscription.DoesNotExist:
-        return None
-    except stripe.error.StripeError as e:
-        raise ValidationError(f"Error getting subscription status: {str(e)}") 
\ No newline at end of file
+    # Lectura local-first con revalidación en segundo plano (ver SubscriptionService)
+    from core.services.subscription import SubscriptionService
+    return SubscriptionService.get_subscription_status(organization)
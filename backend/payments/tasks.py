@@ -0,0 +1,27 @@
+from celery import shared_task
+
+
+@shared_task(ignore_result=True)
+def refresh_subscription_status(subscription_id):
+    """Refrescar desde Stripe el estado local de una suscripción"""
+    from core.services.subscription import SubscriptionService
+    SubscriptionService.refresh_subscription_status(subscription_id)
+
+
+@shared_task(ignore_result=True)
+def process_stripe_events(stripe_subscription_id):
+    """Procesar en orden los eventos de webhook pendientes de una suscripción"""
+    from core.services.subscription import SubscriptionService
+    SubscriptionService.process_pending_events(stripe_subscription_id)
+
+
+@shared_task(ignore_result=True)
+def process_pending_stripe_events():
+    """
+    Barrido periódico (CELERY_BEAT_SCHEDULE): procesa los eventos que quedaron
+    pendientes porque no se pudo encolar su tarea o porque falló un intento
+    anterior y ya pasó su espera
+    """
+    from core.services.subscription import SubscriptionService
+    for stripe_subscription_id in SubscriptionService.get_due_subscription_ids():
+        SubscriptionService.process_pending_events(stripe_subscription_id)
@@ -0,0 +1,248 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from organizations.models import Organization, OrganizationMembership
+from core.services.subscription import SubscriptionService
+from payments.models import Subscription, StripeEvent
+
+
+class StripeSubscriptionStub:
+    """Stripe local: devuelve un objeto de suscripción fijo y cuenta las llamadas."""
+
+    def __init__(self, **overrides):
+        self.calls = []
+        self.data = {
+            'id': 'sub_123',
+            'status': 'active',
+            'current_period_end': int((timezone.now() + timedelta(days=30)).timestamp()),
+            'cancel_at_period_end': True,
+        }
+        self.data.update(overrides)
+
+    def retrieve(self, subscription_id):
+        self.calls.append(subscription_id)
+        return dict(self.data, id=subscription_id)
+
+
+class SubscriptionStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Billing Org')
+        self.subscription = Subscription.objects.create(
+            organization=self.org,
+            stripe_customer_id='cus_123',
+            stripe_subscription_id='sub_123',
+            plan='price_pro',
+            status='trialing',
+            current_period_end=timezone.now() + timedelta(days=10),
+            synced_at=timezone.now()
+        )
+        self.stripe = StripeSubscriptionStub()
+        patcher = patch('core.services.subscription.stripe.Subscription', self.stripe)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def mark_stale(self):
+        Subscription.objects.filter(pk=self.subscription.pk).update(synced_at=timezone.now() - timedelta(hours=1))
+        SubscriptionService.clear_subscription_cache(self.org.id)
+
+    def test_fresh_status_is_served_locally(self):
+        with patch('payments.tasks.refresh_subscription_status.delay') as delay:
+            status_data = SubscriptionService.get_subscription_status(self.org)
+            with self.assertNumQueries(0):
+                SubscriptionService.get_subscription_status(self.org)
+
+        self.assertEqual(status_data['status'], 'trialing')
+        self.assertEqual(self.stripe.calls, [])
+        delay.assert_not_called()
+
+    def test_stale_status_is_returned_and_refreshed_once(self):
+        self.mark_stale()
+        with patch('payments.tasks.refresh_subscription_status.delay') as delay:
+            first = SubscriptionService.get_subscription_status(self.org)
+            second = SubscriptionService.get_subscription_status(self.org)
+
+        self.assertEqual(first['status'], 'trialing')
+        self.assertEqual(second['status'], 'trialing')
+        delay.assert_called_once_with(self.subscription.id)
+        self.assertEqual(self.stripe.calls, [])
+
+        SubscriptionService.refresh_subscription_status(self.subscription.id)
+
+        self.assertEqual(self.stripe.calls, ['sub_123'])
+        refreshed = SubscriptionService.get_subscription_status(self.org)
+        self.assertEqual(refreshed['status'], 'active')
+        self.assertTrue(refreshed['cancel_at_period_end'])
+        self.org.refresh_from_db()
+        self.assertEqual(self.org.plan, 'pro')
+
+    def test_webhook_update_keeps_local_status_fresh(self):
+        SubscriptionService.get_subscription_status(self.org)
+        SubscriptionService.sync_from_stripe(self.subscription, dict(self.stripe.data, status='past_due'))
+
+        with patch('payments.tasks.refresh_subscription_status.delay') as delay:
+            status_data = SubscriptionService.get_subscription_status(self.org)
+        self.assertEqual(status_data['status'], 'past_due')
+        delay.assert_not_called()
+
+    def test_status_view_does_not_call_stripe(self):
+        user = User.objects.create_user(username='billing_admin', password='pass')
+        OrganizationMembership.objects.create(user=user, organization=self.org, role='admin')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+        response = client.get('/api/payments/stripe/subscription-status/', {'organization_id': self.org.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'trialing')
+        self.assertEqual(self.stripe.calls, [])
+
+
+class StripeWebhookTests(TestCase):
+    url = '/api/payments/stripe/webhook/'
+
+    def setUp(self):
+        cache.clear()
+        self.org = Organization.objects.create(name='Webhook Org')
+        self.subscription = Subscription.objects.create(
+            organization=self.org,
+            stripe_customer_id='cus_456',
+            stripe_subscription_id='sub_456',
+            plan='price_pro',
+            status='incomplete',
+            current_period_end=timezone.now()
+        )
+        self.client = APIClient()
+        patcher = patch('payments.views.stripe.Webhook.construct_event', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.period_end = int((timezone.now() + timedelta(days=30)).timestamp())
+
+    def event(self, event_id, event_type, created, **data):
+        subscription = {'id': 'sub_456', 'status': 'active', 'current_period_end': self.period_end}
+        subscription.update(data)
+        return {'id': event_id, 'type': event_type, 'created': created, 'data': {'object': subscription}}
+
+    def post(self, payload):
+        return self.client.post(self.url, payload, format='json', HTTP_STRIPE_SIGNATURE='sig')
+
+    def test_events_are_acknowledged_and_deduplicated(self):
+        with patch('payments.tasks.process_stripe_events.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.post(self.event('evt_1', 'customer.subscription.updated', 100))
+            with self.captureOnCommitCallbacks(execute=True):
+                retry = self.post(self.event('evt_1', 'customer.subscription.updated', 100))
+
+        self.assertEqual((first.status_code, retry.status_code), (200, 200))
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        delay.assert_called_once_with('sub_456')
+        # Nada se procesa dentro del request
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'incomplete')
+
+    def test_updates_for_a_subscription_are_coalesced_in_order(self):
+        with patch('payments.tasks.process_stripe_events.delay'):
+            self.post(self.event('evt_3', 'customer.subscription.updated', 300, status='past_due'))
+            self.post(self.event('evt_2', 'customer.subscription.updated', 200, status='active'))
+            self.post({'id': 'evt_4', 'type': 'invoice.payment_failed', 'created': 250,
+                       'data': {'object': {'id': 'in_1', 'subscription': 'sub_456'}}})
+
+        with patch.object(SubscriptionService, 'sync_from_stripe', wraps=SubscriptionService.sync_from_stripe) as sync:
+            handled = SubscriptionService.process_pending_events('sub_456')
+
+        self.assertEqual(handled, 3)
+        sync.assert_called_once()
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'past_due')
+        self.assertEqual(
+            dict(StripeEvent.objects.values_list('stripe_event_id', 'status')),
+            {'evt_2': 'superseded', 'evt_3': 'processed', 'evt_4': 'processed'}
+        )
+        self.assertEqual(SubscriptionService.process_pending_events('sub_456'), 0)
+
+    def test_deletion_wins_over_later_updates(self):
+        with patch('payments.tasks.process_stripe_events.delay'):
+            self.post(self.event('evt_5', 'customer.subscription.deleted', 100, status='canceled'))
+            self.post(self.event('evt_6', 'customer.subscription.updated', 200, status='active'))
+
+        SubscriptionService.process_pending_events('sub_456')
+
+        self.subscription.refresh_from_db()
+        self.org.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'canceled')
+        self.assertEqual(self.org.plan, 'free')
+
+    def test_events_delivered_out_of_order_across_batches(self):
+        with patch('payments.tasks.process_stripe_events.delay'):
+            self.post(self.event('evt_11', 'customer.subscription.updated', 300, status='past_due'))
+        SubscriptionService.process_pending_events('sub_456')
+
+        # Un evento más antiguo que llega después no sobrescribe el estado nuevo
+        with patch('payments.tasks.process_stripe_events.delay'):
+            self.post(self.event('evt_10', 'customer.subscription.updated', 200, status='active'))
+        SubscriptionService.process_pending_events('sub_456')
+        self.subscription.refresh_from_db()
+        self.assertEqual(self.subscription.status, 'past_due')
+        self.assertEqual(StripeEvent.objects.get(stripe_event_id='evt_10').status, 'superseded')
+
+        # Tras la baja, una actualización tardía no reactiva la suscripción
+        with patch('payments.tasks.process_stripe_events.delay'):
+            self.post(self.event('evt_12', 'customer.subscription.deleted', 400, status='canceled'))
+        SubscriptionService.process_pending_events('sub_456')
+        with patch('payments.tasks.process_stripe_events.delay'):
+            self.post(self.event('evt_13', 'customer.subscription.updated', 500, status='active'))
+        SubscriptionService.process_pending_events('sub_456')
+
+        self.subscription.refresh_from_db()
+        self.org.refresh_from_db()
+        self.assertEqual((self.subscription.status, self.org.plan), ('canceled', 'free'))
+        self.assertEqual(StripeEvent.objects.get(stripe_event_id='evt_13').status, 'superseded')
+
+    def test_events_for_unknown_subscription_are_retried_with_backoff(self):
+        with patch('payments.tasks.process_stripe_events.delay'):
+            self.post(self.event('evt_7', 'customer.subscription.updated', 100, id='sub_new'))
+
+        SubscriptionService.process_pending_events('sub_new')
+        event = StripeEvent.objects.get(stripe_event_id='evt_7')
+        self.assertEqual((event.status, event.attempts), ('pending', 1))
+        self.assertGreater(event.next_attempt_at, timezone.now())
+        # El barrido periódico respeta la espera
+        self.assertEqual(SubscriptionService.get_due_subscription_ids(), [])
+
+        # La suscripción aparece después (p. ej. la crea la vista de alta)
+        subscription = Subscription.objects.create(
+            organization=Organization.objects.create(name='Late Org'), stripe_customer_id='cus_789',
+            stripe_subscription_id='sub_new', plan='price_pro', status='incomplete', current_period_end=timezone.now()
+        )
+        StripeEvent.objects.filter(pk=event.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(SubscriptionService.get_due_subscription_ids(), ['sub_new'])
+        from payments.tasks import process_pending_stripe_events
+        process_pending_stripe_events()
+
+        event.refresh_from_db()
+        subscription.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('processed', 2))
+        self.assertEqual(subscription.status, 'active')
+
+    def test_events_fail_after_max_attempts(self):
+        with patch('payments.tasks.process_stripe_events.delay'):
+            self.post(self.event('evt_8', 'customer.subscription.updated', 100, id='sub_missing'))
+
+        with self.settings(STRIPE_EVENT_MAX_ATTEMPTS=2):
+            SubscriptionService.process_pending_events('sub_missing')
+            SubscriptionService.process_pending_events('sub_missing')
+        event = StripeEvent.objects.get(stripe_event_id='evt_8')
+        self.assertEqual((event.status, event.attempts), ('failed', 2))
+
+    def test_invoice_without_subscription_is_processed(self):
+        with patch('payments.tasks.process_stripe_events.delay'):
+            self.post({'id': 'evt_9', 'type': 'invoice.payment_succeeded', 'created': 100,
+                       'data': {'object': {'id': 'in_2', 'subscription': None}}})
+
+        self.assertEqual(SubscriptionService.process_pending_events(''), 1)
+        self.assertEqual(StripeEvent.objects.get(stripe_event_id='evt_9').status, 'processed')
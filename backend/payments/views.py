@@ -1,3 +1,4 @@
+import json
 import stripe
 from django.conf import settings
 from rest_framework.views import APIView
@@ -13,8 +14,7 @@ from payments.services import (
     cancel_stripe_subscription,
     get_stripe_subscription,
     update_stripe_subscription,
-    attach_subscription_to_org,
-    get_subscription_status
+    attach_subscription_to_org
 )
 from payments.models import Subscription, Payment
 from organizations.models import Organization, OrganizationMembership
@@ -23,7 +23,6 @@ from incentives.models import Incentive
 from accounts.models import User
 from django.http import HttpResponse
 from core.services.subscription import SubscriptionService
-from core.exceptions import StripeError
 from core.services.access_control import AccessControlService
 
 class CreateStripeSubscriptionView(APIView):
@@ -117,6 +116,7 @@ class CancelSubscriptionView(APIView):
             # Actualizar en nuestra base de datos
             subscription.status = 'canceled'
             subscription.save()
+            SubscriptionService.clear_subscription_cache(org.id)
 
             return Response({
                 'status': 'success',
@@ -170,6 +170,7 @@ class UpdateSubscriptionView(APIView):
                 tz=timezone.utc
             )
             subscription.save()
+            SubscriptionService.clear_subscription_cache(org.id)
 
             return Response({
                 'status': 'success',
@@ -210,7 +211,8 @@ class GetSubscriptionStatusView(APIView):
                 )
 
             org = Organization.objects.get(id=org_id)
-            status_data = get_subscription_status(org)
+            # Lectura local (fila Subscription + caché) con revalidación en segundo plano
+            status_data = SubscriptionService.get_subscription_status(org)
             
             if not status_data:
                 return Response(
@@ -262,13 +264,10 @@ class StripeWebhookView(APIView):
             )
         
         try:
-            SubscriptionService.handle_webhook_event(event)
+            # Registrar el evento (idempotente por id) y responder de inmediato;
+            # el procesamiento se hace en segundo plano por suscripción
+            SubscriptionService.record_webhook_event(json.loads(payload))
             return HttpResponse(status=200)
-        except StripeError as e:
-            return Response(
-                {'error': str(e)}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
         except Exception as e:
             return Response(
                 {'error': 'Internal server error'}, 
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django_elasticsearch_dsl import Document, Index, fields
 from django_elasticsearch_dsl.registries import registry
+from elasticsearch_dsl import MetaField
 from .models import Transaction
 from decimal import Decimal
 
@@ -18,11 +20,14 @@ class TransactionDocument(Document):
     source_account_id = fields.KeywordField()  # Para filtros por cuenta origen
     destination_account_id = fields.KeywordField()  # Para filtros por cuenta destino
     tags = fields.KeywordField(multi=True)  # Para filtros por tags
-    
+    organization_id = fields.KeywordField()  # Filtro obligatorio por organización (también es el routing)
+
     class Index:
         name = 'transactions'
         settings = {
-            'number_of_shards': 1,
+            # Cada organización vive en un único shard (routing), así que hay que
+            # reconstruir el índice (reset_elasticsearch) al cambiar este valor
+            'number_of_shards': getattr(settings, 'ELASTICSEARCH_INDEX_SHARDS', 1),
             'number_of_replicas': 0,
             'analysis': {
                 'analyzer': {
@@ -35,19 +40,28 @@ class TransactionDocument(Document):
             }
         }
     
+    class Meta:
+        # Todo documento se indexa, lee y borra con routing = organization_id
+        routing = MetaField(required=True)
+
     class Django:
         model = Transaction
-        ignore_signals = False
-        auto_refresh = True
+        # La indexación por señales va en bloque y asíncrona (transactions.indexing.SearchIndexQueue)
+        ignore_signals = True
+        auto_refresh = False
+
+    def prepare_organization_id(self, instance):
+        return str(instance.organization_id)
 
     def prepare_source_account_id(self, instance):
-        return str(instance.source_account.id) if instance.source_account else None
+        return str(instance.source_account_id) if instance.source_account_id else None
 
     def prepare_destination_account_id(self, instance):
-        return str(instance.destination_account.id) if instance.destination_account else None
+        return str(instance.destination_account_id) if instance.destination_account_id else None
 
     def prepare_amount(self, instance):
         return float(instance.amount) if instance.amount else 0.0
 
     def prepare_tags(self, instance):
-        return [tag.name for tag in instance.tags.all()] if instance.tags.exists() else [] 
\ No newline at end of file
+        # Usa los tags precargados (prefetch_related) si los hay: sin consultas extra
+        return [tag.name for tag in instance.tags.all()] 
\ No newline at end of file
@@ -0,0 +1,280 @@
+import codecs
+import csv
+import io
+import re
+import time
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+from django.db import transaction as db_transaction
+from django.utils import timezone
+from rest_framework import serializers
+from .models import Transaction, Category, Tag, MonthlyCategorySpend
+from .indexing import SearchIndexQueue
+from .summary import TransactionSummaryService
+
+
+TAG_SEPARATORS = re.compile(r'[;|]')
+OFX_TRANSACTION = re.compile(r'<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))', re.S | re.I)
+OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def parse_csv(stream):
+    """
+    Lee un CSV con cabecera y genera un dict por fila.
+
+    Columnas reconocidas: date, amount, type, description, merchant, status,
+    category_id, bank_transaction_id y tags (separados por ``;`` o ``|``).
+    """
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.StringIO(stream.decode('utf-8-sig'))
+    elif not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    for row in csv.DictReader(stream):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        tags = row.pop('tags', '')
+        row['tag_names'] = [name.strip() for name in TAG_SEPARATORS.split(tags) if name.strip()]
+        yield {key: value for key, value in row.items() if value not in ('', None)}
+
+
+def parse_ofx(stream, block_size=64 * 1024):
+    """
+    Extrae los movimientos <STMTTRN> de un extracto OFX (SGML 1.x o XML 2.x).
+
+    Importes negativos se importan como gastos y positivos como ingresos; FITID
+    se usa como ``bank_transaction_id``. El archivo se lee en bloques de
+    ``block_size`` y sólo se mantiene en memoria el movimiento en curso.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buffer = ''
+    for data in _read_blocks(stream, block_size):
+        buffer += data if isinstance(data, str) else decoder.decode(data)
+        end = 0
+        # Un movimiento sólo está completo cuando ya se ha leído lo que lo cierra
+        for match in OFX_TRANSACTION.finditer(buffer):
+            yield _ofx_row(match.group(1))
+            end = match.end()
+        buffer = buffer[end:]
+        # Sin ningún <STMTTRN> abierto, sólo hace falta conservar el final por si corta una etiqueta
+        if '<STMTTRN>' not in buffer.upper():
+            buffer = buffer[-len('<STMTTRN>'):]
+    buffer += decoder.decode(b'', final=True)
+    for match in OFX_TRANSACTION.finditer(buffer):
+        yield _ofx_row(match.group(1))
+
+
+def _read_blocks(stream, block_size):
+    if isinstance(stream, (str, bytes, bytearray)):
+        yield stream
+        return
+    while True:
+        data = stream.read(block_size)
+        if not data:
+            return
+        yield data
+
+
+def _ofx_row(block):
+    fields = {name.upper(): value.strip() for name, value in OFX_FIELD.findall(block)}
+    row = {'tag_names': []}
+    if fields.get('DTPOSTED'):
+        row['date'] = fields['DTPOSTED'][:8]
+    if fields.get('TRNAMT'):
+        amount = fields['TRNAMT'].replace(',', '.')
+        row['type'] = 'EXPENSE' if amount.startswith('-') else 'INCOME'
+        row['amount'] = amount.lstrip('-+')
+    if fields.get('FITID'):
+        row['bank_transaction_id'] = fields['FITID']
+    if fields.get('NAME'):
+        row['merchant'] = fields['NAME']
+    description = fields.get('MEMO') or fields.get('NAME')
+    if description:
+        row['description'] = description
+    return row
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+def get_parser(file_format=None, filename=None):
+    """Parser por formato explícito o, si no se indica, por la extensión del archivo"""
+    if not file_format and filename and '.' in filename:
+        file_format = filename.rsplit('.', 1)[1]
+    file_format = (file_format or 'csv').lower()
+    if file_format == 'qfx':
+        file_format = 'ofx'
+    if file_format not in PARSERS:
+        raise ValueError(f"Formato de importación no soportado: {file_format}")
+    return PARSERS[file_format]
+
+
+class TransactionImportRowSerializer(serializers.Serializer):
+    """Validación de una fila importada (sin tocar la base de datos)"""
+    DATE_FORMATS = ['%Y-%m-%d', '%Y%m%d', '%d/%m/%Y', 'iso-8601']
+
+    date = serializers.DateField(input_formats=DATE_FORMATS)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    type = serializers.ChoiceField(choices=Transaction.TRANSACTION_TYPES, default='EXPENSE')
+    status = serializers.ChoiceField(choices=Transaction.STATUS_CHOICES, default='pending')
+    description = serializers.CharField(required=False, allow_blank=True)
+    merchant = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    category_id = serializers.IntegerField(required=False, allow_null=True)
+    bank_transaction_id = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    tag_names = serializers.ListField(child=serializers.CharField(max_length=255), required=False)
+
+    def validate_category_id(self, value):
+        if value is not None and value not in self.context['category_ids']:
+            raise serializers.ValidationError("La categoría no pertenece a la organización")
+        return value
+
+
+class TransactionImporter:
+    """
+    Importación masiva de transacciones para una organización.
+
+    Procesa las filas en bloques de ``chunk_size``: valida el bloque, descarta los
+    ``bank_transaction_id`` ya importados (o repetidos en el archivo), resuelve
+    todos los tags del bloque con una consulta, inserta las transacciones con
+    ``bulk_create`` y las filas de la tabla M2M de tags también en bloque.
+
+    ``bulk_create`` no dispara señales, así que el ledger de gasto mensual se
+    actualiza con los deltas agregados del bloque y se invalida la caché del
+    resumen al terminar.
+    """
+    DEFAULT_CHUNK_SIZE = 1000
+    MAX_REPORTED_ERRORS = 100
+
+    def __init__(self, organization, user=None, chunk_size=None):
+        self.organization = organization
+        self.user = user
+        self.chunk_size = chunk_size or self.DEFAULT_CHUNK_SIZE
+        self.category_ids = set(
+            Category.objects.filter(organization=organization).values_list('id', flat=True)
+        )
+        self.validator = TransactionImportRowSerializer(context={'category_ids': self.category_ids})
+        self.seen_bank_ids = set()
+        self.stats = {
+            'rows': 0,
+            'created': 0,
+            'duplicates': 0,
+            'invalid': 0,
+            'errors': [],
+        }
+
+    def run(self, rows):
+        """Importa un iterable de filas (dicts) y devuelve las estadísticas"""
+        started = time.monotonic()
+        rows = iter(rows)
+        line = 0
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk, first_line=line + 1)
+            line += len(chunk)
+
+        if self.stats['created']:
+            TransactionSummaryService.invalidate(self.organization.id)
+
+        elapsed = time.monotonic() - started
+        self.stats['seconds'] = round(elapsed, 3)
+        self.stats['rows_per_second'] = round(self.stats['rows'] / elapsed, 1) if elapsed else None
+        return self.stats
+
+    def import_chunk(self, chunk, first_line=1):
+        self.stats['rows'] += len(chunk)
+        valid_rows = self.validate_chunk(chunk, first_line)
+        valid_rows = self.drop_duplicates(valid_rows)
+        if not valid_rows:
+            return
+
+        with db_transaction.atomic():
+            tags = self.resolve_tags(valid_rows)
+            # bulk_create no llama a Transaction.save(): las marcas de conciliación y anulación se fijan aquí
+            now = timezone.now()
+            transactions = Transaction.objects.bulk_create([
+                Transaction(
+                    organization=self.organization,
+                    created_by=self.user,
+                    is_imported=True,
+                    type=row['type'],
+                    status=row['status'],
+                    amount=row['amount'],
+                    date=row['date'],
+                    description=row.get('description') or None,
+                    merchant=row.get('merchant') or None,
+                    category_id=row.get('category_id'),
+                    bank_transaction_id=row.get('bank_transaction_id') or None,
+                    reconciled_at=now if row['status'] == 'reconciled' else None,
+                    voided_at=now if row['status'] == 'void' else None,
+                )
+                for row in valid_rows
+            ], batch_size=self.chunk_size)
+
+            Through = Transaction.tags.through
+            Through.objects.bulk_create([
+                Through(transaction_id=transaction.pk, tag_id=tags[name])
+                for transaction, row in zip(transactions, valid_rows)
+                for name in set(row.get('tag_names', []))
+            ], batch_size=self.chunk_size, ignore_conflicts=True)
+
+            self.apply_ledger_deltas(valid_rows)
+            # bulk_create no dispara señales: las nuevas transacciones se indexan tras el commit
+            SearchIndexQueue.enqueue([transaction.pk for transaction in transactions], self.organization.id)
+
+        self.stats['created'] += len(transactions)
+
+    def validate_chunk(self, chunk, first_line):
+        valid_rows = []
+        for offset, row in enumerate(chunk):
+            try:
+                valid_rows.append(self.validator.run_validation(row))
+            except serializers.ValidationError as exc:
+                self.stats['invalid'] += 1
+                if len(self.stats['errors']) < self.MAX_REPORTED_ERRORS:
+                    self.stats['errors'].append({'row': first_line + offset, 'errors': exc.detail})
+        return valid_rows
+
+    def drop_duplicates(self, rows):
+        """Descarta filas cuyo bank_transaction_id ya existe en la organización o en el archivo"""
+        bank_ids = {row['bank_transaction_id'] for row in rows if row.get('bank_transaction_id')}
+        existing = set()
+        if bank_ids:
+            existing = set(Transaction.objects.filter(
+                organization=self.organization, bank_transaction_id__in=bank_ids
+            ).values_list('bank_transaction_id', flat=True))
+
+        unique_rows = []
+        for row in rows:
+            bank_id = row.get('bank_transaction_id')
+            if bank_id and (bank_id in existing or bank_id in self.seen_bank_ids):
+                self.stats['duplicates'] += 1
+                continue
+            if bank_id:
+                self.seen_bank_ids.add(bank_id)
+            unique_rows.append(row)
+        return unique_rows
+
+    def resolve_tags(self, rows):
+        """Mapa nombre -> id de todos los tags del bloque, creando los que falten"""
+        names = {name for row in rows for name in row.get('tag_names', [])}
+        if not names:
+            return {}
+        tags = dict(Tag.objects.filter(name__in=names).values_list('name', 'id'))
+        missing = names - tags.keys()
+        if missing:
+            Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+            tags.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+        return tags
+
+    def apply_ledger_deltas(self, rows):
+        deltas = defaultdict(Decimal)
+        for row in rows:
+            if row['type'] == 'EXPENSE' and row.get('category_id'):
+                period = MonthlyCategorySpend.period_for(row['date'])
+                deltas[(row['category_id'], period)] += row['amount']
+        for (category_id, period), amount in deltas.items():
+            MonthlyCategorySpend.apply_delta(self.organization.id, category_id, period, amount)
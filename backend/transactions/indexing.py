@@ -0,0 +1,462 @@
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from elasticsearch.helpers import bulk, parallel_bulk, scan
+from elasticsearch_dsl import connections
+from .documents import TransactionDocument
+from .models import Transaction, Tag
+
+logger = logging.getLogger(__name__)
+
+
+def configure_connection():
+    """Configura la conexión por defecto de Elasticsearch a partir de ``ELASTICSEARCH_DSL``"""
+    connections.configure(**settings.ELASTICSEARCH_DSL)
+    return connections.get_connection()
+
+
+def get_routing(organization_id):
+    """Routing de los documentos de una organización: todos van al mismo shard"""
+    return str(organization_id)
+
+
+def get_indexing_queryset():
+    """
+    Transacciones en orden de clave primaria, con los tags precargados.
+
+    Solo se cargan las columnas que usa el documento.
+    """
+    return Transaction.objects.only(
+        'id', 'organization_id', 'type', 'description', 'amount', 'date', 'source_account_id',
+        'destination_account_id',
+    ).prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+    ).order_by('pk')
+
+
+class IndexCheckpoint:
+    """Progreso de una reindexación guardado en un archivo JSON (último pk confirmado)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        with open(self.path) as handle:
+            return json.load(handle)
+
+    def save(self, **state):
+        if not self.path:
+            return
+        # Escritura atómica: un corte a mitad no deja el archivo corrupto
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as handle:
+            json.dump(state, handle)
+        os.replace(tmp_path, self.path)
+
+    def update(self, **state):
+        self.save(**dict(self.load(), **state))
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TransactionIndexer:
+    """
+    Reindexación masiva de transacciones en Elasticsearch.
+
+    Recorre la tabla con ``iterator(chunk_size=...)`` (los tags se precargan por
+    bloque) y envía los documentos a ``parallel_bulk`` con ``workers`` hilos. Los
+    resultados llegan en el orden de envío, así que tras cada bloque confirmado
+    se guarda en el checkpoint el último pk indexado; una ejecución con
+    ``resume=True`` continúa desde ahí.
+    """
+    DEFAULT_CHUNK_SIZE = 500
+    DEFAULT_WORKERS = 4
+    MAX_REPORTED_ERRORS = 100
+
+    def __init__(self, client=None, index=None, chunk_size=None, workers=None, checkpoint_path=None,
+                 progress=None):
+        self.client = client
+        self.index = index or TransactionDocument._index._name
+        self.chunk_size = chunk_size or getattr(settings, 'ELASTICSEARCH_INDEX_CHUNK_SIZE', self.DEFAULT_CHUNK_SIZE)
+        self.workers = workers or getattr(settings, 'ELASTICSEARCH_INDEX_WORKERS', self.DEFAULT_WORKERS)
+        self.checkpoint = IndexCheckpoint(checkpoint_path)
+        self.progress = progress
+        self.document = TransactionDocument()
+
+    def get_actions(self, queryset):
+        for instance in queryset.iterator(chunk_size=self.chunk_size):
+            yield {
+                '_op_type': 'index',
+                '_index': self.index,
+                '_id': instance.pk,
+                '_routing': get_routing(instance.organization_id),
+                '_source': self.document.prepare(instance),
+            }
+
+    def run(self, resume=False, queryset=None):
+        """
+        Indexa todas las transacciones (o las restantes si ``resume``) y devuelve las estadísticas
+
+        Args:
+            resume: Continuar desde el último pk del checkpoint
+            queryset: Subconjunto a indexar (por defecto ``get_indexing_queryset()``)
+        """
+        if resume:
+            state = self.checkpoint.load()
+        else:
+            state = {}
+            self.checkpoint.save(index=self.index)
+        last_pk = state.get('last_pk')
+        stats = {
+            'indexed': state.get('indexed', 0),
+            'errors': state.get('errors', 0),
+            'error_details': [],
+            'resumed_from': last_pk,
+        }
+
+        client = self.client or configure_connection()
+        queryset = queryset if queryset is not None else get_indexing_queryset()
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        started = time.monotonic()
+        processed = 0
+
+        results = parallel_bulk(
+            client,
+            self.get_actions(queryset),
+            thread_count=self.workers,
+            chunk_size=self.chunk_size,
+            raise_on_error=False,
+            raise_on_exception=False,
+        )
+        for ok, info in results:
+            item = info.get('index', info)
+            processed += 1
+            if ok:
+                stats['indexed'] += 1
+            else:
+                stats['errors'] += 1
+                if len(stats['error_details']) < self.MAX_REPORTED_ERRORS:
+                    stats['error_details'].append(item)
+            last_pk = int(item['_id'])
+
+            if processed % self.chunk_size == 0:
+                self.checkpoint.update(index=self.index, last_pk=last_pk, indexed=stats['indexed'], errors=stats['errors'])
+                if self.progress:
+                    self.progress(stats['indexed'], self.rate(processed, started))
+
+        self.checkpoint.update(index=self.index, last_pk=last_pk, indexed=stats['indexed'], errors=stats['errors'])
+
+        elapsed = time.monotonic() - started
+        stats['last_pk'] = last_pk
+        stats['processed'] = processed
+        stats['seconds'] = round(elapsed, 3)
+        stats['docs_per_second'] = self.rate(processed, started)
+        return stats
+
+    @staticmethod
+    def rate(processed, started):
+        elapsed = time.monotonic() - started
+        return round(processed / elapsed, 1) if elapsed else None
+
+
+class TransactionIndexManager:
+    """
+    Índices físicos versionados detrás del alias ``transactions``.
+
+    Las búsquedas y las escrituras usan siempre el alias (el nombre del índice
+    de ``TransactionDocument``). Una reconstrucción crea un índice nuevo
+    ``transactions-<fecha>`` con réplicas a 0 y sin refresh, lo llena con
+    ``TransactionIndexer``, reindexa las transacciones modificadas durante la
+    carga, quita las que se borraron mientras tanto, restaura réplicas y
+    ``refresh_interval`` y mueve el alias en una sola operación
+    ``update_aliases``: el índice anterior sigue sirviendo hasta ese instante.
+
+    Mientras dura la reconstrucción, el índice nuevo queda anotado en la caché
+    y ``SearchIndexQueue`` escribe cada cambio también en él, así que nada de
+    lo que pase entre el catch-up y el cambio de alias se pierde. Tras el
+    cambio se hace un segundo catch-up de lo modificado desde el primero. Se conservan ``keep`` índices anteriores para poder volver atrás.
+    """
+    BUILD_SETTINGS = {'number_of_replicas': 0, 'refresh_interval': '-1'}
+    PRUNE_BATCH_SIZE = 1000
+    BUILDING_INDEX_CACHE_KEY = 'transactions:search:building_index'
+    BUILDING_INDEX_TIMEOUT = 24 * 60 * 60  # Un rebuild interrumpido deja de recibir escrituras
+
+    @classmethod
+    def get_building_index(cls):
+        """Índice que se está reconstruyendo, o None"""
+        try:
+            return cache.get(cls.BUILDING_INDEX_CACHE_KEY)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el índice en reconstrucción: {e}")
+            return None
+
+    def __init__(self, client=None):
+        self.client = client or configure_connection()
+        self.alias = TransactionDocument._index._name
+
+    def new_index_name(self):
+        return f"{self.alias}-{timezone.now().strftime('%Y%m%d%H%M%S%f')}"
+
+    def get_live_settings(self):
+        """Réplicas y refresh que debe tener el índice en servicio"""
+        index_settings = TransactionDocument._index.to_dict().get('settings', {})
+        return {
+            'number_of_replicas': index_settings.get('number_of_replicas', 1),
+            'refresh_interval': index_settings.get('refresh_interval', '1s'),
+        }
+
+    def get_alias_indices(self):
+        """Índices físicos a los que apunta el alias (vacío si el alias no existe)"""
+        if not self.client.indices.exists_alias(name=self.alias):
+            return []
+        return sorted(self.client.indices.get_alias(name=self.alias).keys())
+
+    def get_versioned_indices(self):
+        return sorted(self.client.indices.get(index=f"{self.alias}-*").keys())
+
+    def create_index(self, name, build=True):
+        """Crea un índice físico con el mapping del documento (en modo carga si ``build``)"""
+        body = TransactionDocument._index.to_dict()
+        if build:
+            body['settings'] = dict(body.get('settings', {}), **self.BUILD_SETTINGS)
+        self.client.indices.create(index=name, settings=body.get('settings'), mappings=body.get('mappings'))
+        return name
+
+    def finalize_index(self, name):
+        """Restaura réplicas y refresh tras la carga y refresca el índice"""
+        self.client.indices.put_settings(index=name, settings={'index': self.get_live_settings()})
+        self.client.indices.refresh(index=name)
+
+    def swap_alias(self, name):
+        """Apunta el alias al índice ``name`` de forma atómica y devuelve los índices que dejó"""
+        previous = self.get_alias_indices()
+        actions = [{'remove': {'index': index, 'alias': self.alias}} for index in previous if index != name]
+        actions.append({'add': {'index': name, 'alias': self.alias, 'is_write_index': True}})
+        if not previous and self.client.indices.exists(index=self.alias):
+            # Índice antiguo sin versionar con el nombre del alias: se borra en la misma operación
+            actions.append({'remove_index': {'index': self.alias}})
+        self.client.indices.update_aliases(actions=actions)
+        return [index for index in previous if index != name]
+
+    def ensure_alias(self):
+        """Crea el primer índice versionado y el alias si todavía no existen"""
+        indices = self.get_alias_indices()
+        if indices:
+            return indices[0]
+        name = self.create_index(self.new_index_name(), build=False)
+        self.swap_alias(name)
+        return name
+
+    def prune_deleted(self, name):
+        """Borra del índice ``name`` los documentos cuyas transacciones ya no existen y devuelve cuántos"""
+        actions = []
+        batch = {}
+        hits = scan(self.client, index=name, query={'query': {'match_all': {}}}, _source=False,
+                    size=self.PRUNE_BATCH_SIZE)
+        for hit in itertools.chain(hits, [None]):
+            if hit is not None:
+                batch[int(hit['_id'])] = hit.get('_routing')
+            if batch and (hit is None or len(batch) >= self.PRUNE_BATCH_SIZE):
+                existing = set(Transaction.objects.filter(pk__in=batch).values_list('pk', flat=True))
+                actions.extend({'_op_type': 'delete', '_index': name, '_id': pk, '_routing': routing}
+                               for pk, routing in batch.items() if pk not in existing)
+                batch = {}
+        if actions:
+            bulk(self.client, actions, raise_on_error=False, refresh=True)
+        return len(actions)
+
+    def cleanup(self, keep=1):
+        """Borra los índices versionados antiguos que no están en el alias, salvo los ``keep`` más recientes"""
+        live = set(self.get_alias_indices())
+        stale = [index for index in self.get_versioned_indices() if index not in live]
+        to_delete = stale[:-keep] if keep else stale
+        for index in to_delete:
+            self.client.indices.delete(index=index)
+        return to_delete
+
+    def rebuild(self, keep=1, resume=False, checkpoint_path=None, **indexer_options):
+        """
+        Reconstruye el índice completo sin cortar el servicio.
+
+        Returns:
+            dict: Estadísticas del indexador más ``index``, ``catch_up``, ``pruned`` y ``deleted``
+        """
+        checkpoint = IndexCheckpoint(checkpoint_path)
+        state = checkpoint.load() if resume else {}
+        if not state.get('build_started'):
+            state = {
+                'index': self.create_index(self.new_index_name()),
+                'build_started': timezone.now().isoformat(),
+            }
+            checkpoint.save(**state)
+        name = state['index']
+        build_started = parse_datetime(state['build_started'])
+        # Desde aquí las señales escriben también en el índice nuevo
+        cache.set(self.BUILDING_INDEX_CACHE_KEY, name, self.BUILDING_INDEX_TIMEOUT)
+
+        indexer = TransactionIndexer(client=self.client, index=name, checkpoint_path=checkpoint_path,
+                                     **indexer_options)
+        stats = indexer.run(resume=True)
+
+        # Cambios hechos mientras se cargaba: la carga pudo escribir una versión anterior
+        catch_up_started = timezone.now()
+        catch_up = TransactionIndexer(client=self.client, index=name, **indexer_options).run(
+            queryset=get_indexing_queryset().filter(modified_at__gte=build_started)
+        )
+
+        self.finalize_index(name)
+        # Las transacciones borradas durante la carga no aparecen en el catch-up
+        pruned = self.prune_deleted(name)
+        self.swap_alias(name)
+        cache.delete(self.BUILDING_INDEX_CACHE_KEY)
+        checkpoint.clear()
+
+        # Lo escrito mientras se ejecutaban el catch-up y la poda, por si alguna tarea no vio el índice nuevo
+        late_catch_up = TransactionIndexer(client=self.client, index=name, **indexer_options).run(
+            queryset=get_indexing_queryset().filter(modified_at__gte=catch_up_started)
+        )
+        stats.update(index=name, catch_up=catch_up['indexed'] + late_catch_up['indexed'], pruned=pruned,
+                     deleted=self.cleanup(keep=keep))
+        return stats
+
+
+def get_client():
+    """Conexión por defecto de Elasticsearch, configurándola la primera vez"""
+    try:
+        return connections.get_connection()
+    except KeyError:
+        return configure_connection()
+
+
+class SearchIndexQueue:
+    """
+    Actualización asíncrona del índice de búsqueda a partir de las señales.
+
+    Los cambios de transacciones se acumulan por hilo mientras la transacción de
+    base de datos está abierta (un id repetido cuenta una vez) y se envían al
+    confirmarse como una tarea Celery ``update_search_index`` por bloque de
+    ``ELASTICSEARCH_SIGNAL_BATCH_SIZE`` ids. La tarea vuelve a leer las filas y
+    las envía con una única petición ``bulk``, sin refresh: los ids que ya no
+    existen se borran del índice. Cada id viaja con su organización, que es el
+    routing del documento y hace falta para borrarlo. Durante una
+    reconstrucción cada acción se repite sobre el índice nuevo.
+    """
+    DEFAULT_BATCH_SIZE = 500
+
+    _local = threading.local()
+
+    @classmethod
+    def get_batch_size(cls):
+        return getattr(settings, 'ELASTICSEARCH_SIGNAL_BATCH_SIZE', cls.DEFAULT_BATCH_SIZE)
+
+    @classmethod
+    def enqueue(cls, transaction_ids, organization_id=None):
+        """
+        Marca transacciones para reindexar cuando se confirme la transacción actual
+
+        ``organization_id`` puede faltar si las filas siguen existiendo (se lee al indexarlas)
+        """
+        if not transaction_ids:
+            return
+        changes = {pk: organization_id for pk in transaction_ids}
+        connection = db_transaction.get_connection()
+        callback = getattr(cls._local, 'callback', None)
+        registered = callback is not None and connection.in_atomic_block and any(
+            func is callback for _, func, _ in connection.run_on_commit
+        )
+        if registered:
+            pending = cls._local.pending
+            for pk, org_id in changes.items():
+                if org_id is not None or pk not in pending:
+                    pending[pk] = org_id
+            return
+        # Lo que quedara pendiente es de una transacción revertida
+        cls._local.pending = changes
+        cls._local.callback = functools.partial(cls.flush)
+        db_transaction.on_commit(cls._local.callback)
+
+    @classmethod
+    def flush(cls):
+        pending = getattr(cls._local, 'pending', None) or {}
+        changes = [[pk, pending[pk]] for pk in sorted(pending)]
+        cls._local.pending = {}
+        cls._local.callback = None
+        batch_size = cls.get_batch_size()
+        for start in range(0, len(changes), batch_size):
+            batch = changes[start:start + batch_size]
+            try:
+                from transactions.tasks import update_search_index
+                update_search_index.delay(batch)
+            except Exception as e:
+                # Sin broker se indexa en este proceso; un fallo de Elasticsearch no debe romper el request
+                logger.warning(f"No se pudo encolar la indexación de {len(batch)} transacciones: {e}")
+                try:
+                    cls.process(batch)
+                except Exception as e:
+                    logger.error(f"Error indexando {len(batch)} transacciones: {e}")
+
+    @classmethod
+    def process(cls, changes, client=None):
+        """
+        Indexa (o borra, si ya no existen) las transacciones con una petición bulk
+
+        Args:
+            changes: Pares ``[transaction_id, organization_id]`` (o solo ids)
+
+        Returns:
+            dict: Documentos indexados, borrados y errores
+        """
+        organizations = {}
+        for change in changes:
+            pk, organization_id = change if isinstance(change, (list, tuple)) else (change, None)
+            if organizations.get(pk) is None:
+                organizations[pk] = organization_id
+        document = TransactionDocument()
+        indices = [TransactionDocument._index._name]
+        building_index = TransactionIndexManager.get_building_index()
+        if building_index:
+            indices.append(building_index)
+        actions = []
+        for instance in get_indexing_queryset().filter(pk__in=organizations):
+            organizations.pop(instance.pk)
+            source = document.prepare(instance)
+            actions.extend({'_op_type': 'index', '_index': index, '_id': instance.pk,
+                            '_routing': get_routing(instance.organization_id),
+                            '_source': source} for index in indices)
+        unrouted = sorted(pk for pk, organization_id in organizations.items() if organization_id is None)
+        if unrouted:
+            # Sin organización no se puede localizar el documento para borrarlo
+            logger.warning(f"Transacciones borradas sin organización, no se quitan del índice: {unrouted}")
+        transaction_ids = {pk: organization_id for pk, organization_id in organizations.items()
+                           if organization_id is not None}
+        actions.extend({'_op_type': 'delete', '_index': index, '_id': pk,
+                        '_routing': get_routing(transaction_ids[pk])}
+                       for pk in sorted(transaction_ids) for index in indices)
+
+        if not actions:
+            return {'indexed': 0, 'deleted': 0, 'errors': 0}
+        _, errors = bulk(client or get_client(), actions, raise_on_error=False, refresh=False)
+        # Borrar un documento que nunca se indexó no es un error
+        errors = [error for error in errors if error.get('delete', {}).get('status') != 404]
+        if errors:
+            logger.error(f"Errores al actualizar el índice de búsqueda: {errors[:10]}")
+        return {
+            'indexed': len(actions) // len(indices) - len(transaction_ids),
+            'deleted': len(transaction_ids),
+            'errors': len(errors),
+        }
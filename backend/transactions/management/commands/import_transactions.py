@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from organizations.models import Organization
+from transactions.importers import TransactionImporter, get_parser
+
+
+class Command(BaseCommand):
+    help = 'Importa masivamente transacciones desde un extracto CSV u OFX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Ruta del archivo a importar')
+        parser.add_argument('--organization', type=int, required=True, help='ID de la organización')
+        parser.add_argument('--user', type=int, help='ID del usuario que figura como creador')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'ofx', 'qfx'],
+                            help='Formato del archivo (por defecto, según la extensión)')
+        parser.add_argument('--chunk-size', type=int, default=TransactionImporter.DEFAULT_CHUNK_SIZE,
+                            help='Filas por bloque de validación e inserción')
+
+    def handle(self, *args, **options):
+        try:
+            organization = Organization.objects.get(pk=options['organization'])
+        except Organization.DoesNotExist:
+            raise CommandError(f"La organización {options['organization']} no existe")
+
+        user = None
+        if options['user']:
+            user = get_user_model().objects.filter(pk=options['user']).first()
+            if user is None:
+                raise CommandError(f"El usuario {options['user']} no existe")
+
+        try:
+            parser = get_parser(options['file_format'], options['path'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        importer = TransactionImporter(organization, user=user, chunk_size=options['chunk_size'])
+        self.stdout.write(f"Importando {options['path']} en {organization}...")
+        with open(options['path'], 'rb') as stream:
+            stats = importer.run(parser(stream))
+
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(f"Fila {error['row']}: {error['errors']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['created']} transacciones creadas de {stats['rows']} filas "
+            f"({stats['duplicates']} duplicadas, {stats['invalid']} inválidas) "
+            f"en {stats['seconds']}s ({stats['rows_per_second']} filas/s)"
+        ))
@@ -1,38 +1,45 @@
 from django.core.management.base import BaseCommand
-from elasticsearch_dsl import connections
-from transactions.documents import TransactionDocument
-from transactions.models import Transaction
+from transactions.indexing import TransactionIndexer, TransactionIndexManager, configure_connection
+
 
 class Command(BaseCommand):
-    help = 'Indexa todas las transacciones en Elasticsearch'
+    help = 'Indexa todas las transacciones en Elasticsearch (en bloques, con checkpoint reanudable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Documentos por bloque (lectura y bulk)')
+        parser.add_argument('--workers', type=int, help='Hilos de parallel_bulk')
+        parser.add_argument('--checkpoint', help='Archivo donde guardar el progreso (último pk indexado)')
+        parser.add_argument('--resume', action='store_true', help='Continuar desde el checkpoint')
 
     def handle(self, *args, **options):
-        # Configurar la conexión
-        connections.configure(
-            default={
-                'hosts': 'http://localhost:9200',
-                'timeout': 30,
-                'retry_on_timeout': True,
-                'max_retries': 3,
-            }
+        if options['resume'] and not options['checkpoint']:
+            self.stderr.write(self.style.ERROR('--resume requiere --checkpoint'))
+            return
+
+        client = configure_connection()
+
+        # Asegurarse de que el alias y su índice versionado existen
+        manager = TransactionIndexManager(client)
+        self.stdout.write(f'Indexando en {manager.ensure_alias()} (alias {manager.alias})')
+
+        indexer = TransactionIndexer(
+            client=client,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            checkpoint_path=options['checkpoint'],
+            progress=lambda indexed, rate: self.stdout.write(f'  {indexed} documentos ({rate} docs/s)'),
         )
+        if options['resume']:
+            self.stdout.write(f"Reanudando desde el pk {indexer.checkpoint.load().get('last_pk')}...")
+        self.stdout.write(f'Indexando transacciones con {indexer.workers} hilos en bloques de {indexer.chunk_size}...')
+
+        stats = indexer.run(resume=options['resume'])
 
-        # Asegurarse de que el índice existe
-        TransactionDocument.init()
-        
-        # Obtener todas las transacciones
-        transactions = Transaction.objects.all()
-        total = transactions.count()
-        
-        self.stdout.write(f'Indexando {total} transacciones...')
-        
-        # Indexar las transacciones
-        doc = TransactionDocument()
-        success, errors = doc.update(transactions)
-        
-        if errors:
-            self.stdout.write(self.style.WARNING(f'Se encontraron {len(errors)} errores durante la indexación'))
-            for error in errors:
+        if stats['errors']:
+            self.stdout.write(self.style.WARNING(f"Se encontraron {stats['errors']} errores durante la indexación"))
+            for error in stats['error_details']:
                 self.stdout.write(self.style.ERROR(f'Error: {error}'))
-        else:
-            self.stdout.write(self.style.SUCCESS(f'Se indexaron {total} transacciones correctamente')) 
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(
+            f"Se indexaron {stats['indexed']} transacciones en {stats['seconds']}s "
+            f"({stats['docs_per_second']} docs/s, último pk {stats['last_pk']})"
+        ))
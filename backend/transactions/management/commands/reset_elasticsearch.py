@@ -1,40 +1,43 @@
 from django.core.management.base import BaseCommand
-from elasticsearch_dsl import connections
-from transactions.documents import TransactionDocument
+from transactions.indexing import TransactionIndexManager
 
 class Command(BaseCommand):
-    help = 'Resetea el índice de Elasticsearch y reindexa las transacciones'
+    help = 'Reconstruye el índice de transacciones en un índice versionado nuevo y cambia el alias sin cortar la búsqueda'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Documentos por bloque (lectura y bulk)')
+        parser.add_argument('--workers', type=int, help='Hilos de parallel_bulk')
+        parser.add_argument('--checkpoint', help='Archivo donde guardar el progreso de la reconstrucción')
+        parser.add_argument('--resume', action='store_true', help='Continuar una reconstrucción interrumpida')
+        parser.add_argument('--keep', type=int, default=1, help='Índices anteriores a conservar para volver atrás')
 
     def handle(self, *args, **options):
-        # Configurar la conexión
-        connections.configure(
-            default={
-                'hosts': 'http://localhost:9200',
-                'timeout': 30,
-                'retry_on_timeout': True,
-                'max_retries': 3,
-            }
-        )
+        if options['resume'] and not options['checkpoint']:
+            self.stderr.write(self.style.ERROR('--resume requiere --checkpoint'))
+            return
 
-        # Eliminar el índice si existe
-        if TransactionDocument._index.exists():
-            self.stdout.write('Eliminando índice existente...')
-            TransactionDocument._index.delete()
-            self.stdout.write(self.style.SUCCESS('Índice eliminado correctamente'))
+        manager = TransactionIndexManager()
+        previous = manager.get_alias_indices()
+        self.stdout.write(f"Alias {manager.alias} -> {', '.join(previous) or '(sin índice)'}")
+        self.stdout.write('Construyendo índice nuevo (réplicas 0, refresh desactivado)...')
 
-        # Crear el índice con la nueva configuración
-        self.stdout.write('Creando nuevo índice...')
-        TransactionDocument.init()
-        self.stdout.write(self.style.SUCCESS('Índice creado correctamente'))
+        stats = manager.rebuild(
+            keep=options['keep'],
+            resume=options['resume'],
+            checkpoint_path=options['checkpoint'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            progress=lambda indexed, rate: self.stdout.write(f'  {indexed} documentos ({rate} docs/s)'),
+        )
 
-        # Reindexar las transacciones
-        self.stdout.write('Reindexando transacciones...')
-        doc = TransactionDocument()
-        success, errors = doc.update(doc.get_queryset())
-        
-        if errors:
-            self.stdout.write(self.style.WARNING(f'Se encontraron {len(errors)} errores durante la indexación'))
-            for error in errors:
+        if stats['errors']:
+            self.stdout.write(self.style.WARNING(f"Se encontraron {stats['errors']} errores durante la indexación"))
+            for error in stats['error_details']:
                 self.stdout.write(self.style.ERROR(f'Error: {error}'))
-        else:
-            self.stdout.write(self.style.SUCCESS('Transacciones indexadas correctamente')) 
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(
+            f"Alias {manager.alias} -> {stats['index']}: {stats['indexed']} transacciones en {stats['seconds']}s "
+            f"({stats['docs_per_second']} docs/s), {stats['catch_up']} actualizadas y "
+            f"{stats['pruned']} borradas durante la carga"
+        ))
+        if stats['deleted']:
+            self.stdout.write(f"Índices antiguos eliminados: {', '.join(stats['deleted'])}")
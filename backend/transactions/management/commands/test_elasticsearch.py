@@ -2,11 +2,15 @@ import os
 from django.core.management.base import BaseCommand
 from elasticsearch import Elasticsearch
 from elasticsearch_dsl import connections
-from transactions.documents import TransactionDocument
+from transactions.indexing import TransactionIndexer, TransactionIndexManager, get_indexing_queryset
 
 class Command(BaseCommand):
     help = 'Prueba la conexión con Elasticsearch y el índice de transacciones'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10,
+                            help='Transacciones que se indexan como prueba')
+
     def handle(self, *args, **options):
         # Configurar la conexión
         connections.configure(
@@ -32,14 +36,18 @@ class Command(BaseCommand):
         # Probar índice de transacciones
         self.stdout.write('Probando índice de transacciones...')
         try:
-            # Crear el índice si no existe
-            TransactionDocument.init()
+            # Crear el alias y su índice versionado si no existen
+            TransactionIndexManager().ensure_alias()
             self.stdout.write(self.style.SUCCESS('Índice de transacciones creado/verificado correctamente'))
             
-            # Intentar indexar una transacción de prueba
-            doc = TransactionDocument()
-            doc.update(doc.get_queryset())
-            self.stdout.write(self.style.SUCCESS('Transacciones indexadas correctamente'))
+            # Indexar unas pocas transacciones con su routing, como el indexador masivo
+            stats = TransactionIndexer().run(queryset=get_indexing_queryset()[:options['limit']])
+            if stats['errors']:
+                self.stdout.write(self.style.ERROR(f"{stats['errors']} transacciones no se pudieron indexar"))
+                for error in stats['error_details']:
+                    self.stdout.write(self.style.ERROR(f'Error: {error}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{stats['indexed']} transacciones indexadas correctamente"))
             
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error al trabajar con el índice: {str(e)}')) 
\ No newline at end of file
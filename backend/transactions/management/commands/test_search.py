@@ -1,12 +1,18 @@
 from django.core.management.base import BaseCommand
 from elasticsearch_dsl import connections
+from organizations.models import Organization
 from transactions.services import TransactionSearchService
 from datetime import datetime, timedelta
 
 class Command(BaseCommand):
     help = 'Prueba todas las funcionalidades de búsqueda de transacciones'
 
+    def add_arguments(self, parser):
+        parser.add_argument('organization_id', type=int, help='Organización sobre la que buscar')
+
     def handle(self, *args, **options):
+        organization = Organization.objects.get(pk=options['organization_id'])
+
         # Configurar la conexión
         connections.configure(
             default={
@@ -19,7 +25,7 @@ class Command(BaseCommand):
 
         # 1. Búsqueda básica con fuzzy matching
         self.stdout.write("\n=== Búsqueda básica con fuzzy matching ===")
-        service = TransactionSearchService()
+        service = TransactionSearchService(organization)
         response = service.search_by_description('UHC').execute()
         self.print_results(response)
 
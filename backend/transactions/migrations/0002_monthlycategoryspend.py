@@ -0,0 +1,98 @@
+# Generated by Django 5.1.9 on 2026-10-18 01:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_monthly_spend(apps, schema_editor):
+    Category = apps.get_model("transactions", "Category")
+    Transaction = apps.get_model("transactions", "Transaction")
+    MonthlyCategorySpend = apps.get_model("transactions", "MonthlyCategorySpend")
+
+    parents = dict(Category.objects.values_list("id", "parent_id"))
+    organizations = dict(Category.objects.values_list("id", "organization_id"))
+    direct = (
+        Transaction.objects.filter(type="EXPENSE", category__isnull=False)
+        .annotate(year=ExtractYear("date"), month=ExtractMonth("date"))
+        .values("organization_id", "category_id", "year", "month")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+
+    totals = {}
+    for row in direct:
+        period = f"{row['year']:04d}-{row['month']:02d}"
+        node_id, seen = row["category_id"], set()
+        while node_id is not None and node_id not in seen:
+            seen.add(node_id)
+            key = (row["organization_id"], node_id, period)
+            totals[key] = totals.get(key, 0) + row["total"]
+            node_id = parents.get(node_id)
+
+    MonthlyCategorySpend.objects.bulk_create(
+        [
+            MonthlyCategorySpend(
+                organization_id=organization_id,
+                category_id=category_id,
+                period=period,
+                amount=amount,
+            )
+            for (organization_id, category_id, period), amount in totals.items()
+            if category_id in organizations
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organizations", "0001_initial"),
+        ("transactions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyCategorySpend",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period", models.CharField(max_length=7)),
+                (
+                    "amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="monthly_spend",
+                        to="transactions.category",
+                    ),
+                ),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="category_spend",
+                        to="organizations.organization",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Monthly category spend",
+                "unique_together": {("organization", "category", "period")},
+            },
+        ),
+        migrations.RunPython(backfill_monthly_spend, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.9 on 2026-10-18 01:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_category_closure(apps, schema_editor):
+    Category = apps.get_model("transactions", "Category")
+    CategoryClosure = apps.get_model("transactions", "CategoryClosure")
+
+    parents = dict(Category.objects.values_list("id", "parent_id"))
+    links = []
+    for category_id in parents:
+        node_id, depth = category_id, 0
+        while node_id is not None and depth <= len(parents):
+            links.append(
+                CategoryClosure(
+                    ancestor_id=node_id, descendant_id=category_id, depth=depth
+                )
+            )
+            node_id, depth = parents.get(node_id), depth + 1
+    CategoryClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0002_monthlycategoryspend"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField()),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="transactions.category",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="transactions.category",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["descendant", "depth"],
+                        name="transaction_descend_3184ee_idx",
+                    )
+                ],
+                "unique_together": {("ancestor", "descendant")},
+            },
+        ),
+        migrations.RunPython(backfill_category_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.9 on 2026-10-18 01:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chartofaccounts", "0002_account_currency_account_functional_type_and_more"),
+        ("organizations", "0001_initial"),
+        ("transactions", "0003_categoryclosure"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="transaction",
+            name="transaction_organiz_1a5868_idx",
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["organization", "date", "id"],
+                name="transaction_organiz_13764f_idx",
+            ),
+        ),
+    ]
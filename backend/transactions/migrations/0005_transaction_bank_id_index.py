@@ -0,0 +1,20 @@
+# Generated by Django 5.1.9 on 2026-10-18 02:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0004_transaction_keyset_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(
+                fields=["organization", "bank_transaction_id"],
+                name="transaction_organiz_d9e58f_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.9 on 2026-10-18 09:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Debe coincidir con PostgresTransactionSearchService.SEARCH_CONFIG
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('simple', coalesce({row}description, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}merchant, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}notes, '')), 'C')
+"""
+
+CREATE_TRIGGER_SQL = f"""
+CREATE FUNCTION transactions_transaction_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR_SQL.format(row='NEW.')};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_transaction_search_vector_trigger
+BEFORE INSERT OR UPDATE OF description, merchant, notes, search_vector ON transactions_transaction
+FOR EACH ROW EXECUTE FUNCTION transactions_transaction_search_vector_update();
+
+UPDATE transactions_transaction SET search_vector = {SEARCH_VECTOR_SQL.format(row='')};
+"""
+
+DROP_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS transactions_transaction_search_vector_trigger ON transactions_transaction;
+DROP FUNCTION IF EXISTS transactions_transaction_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transactions", "0005_transaction_bank_id_index"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="transaction",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # El trigger también cubre bulk_create y update(), que no pasan por save()
+        migrations.RunSQL(CREATE_TRIGGER_SQL, DROP_TRIGGER_SQL),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="transaction_search_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["merchant"], name="transaction_merchant_trgm", opclasses=["gin_trgm_ops"]
+            ),
+        ),
+    ]
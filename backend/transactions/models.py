@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F
 from accounts.models import User
 from organizations.models import Organization
 from chartofaccounts.models import Account
@@ -14,6 +17,21 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+class CategoryQuerySet(models.QuerySet):
+    def descendants_of(self, category, include_self=True):
+        """All categories below ``category`` in the tree, resolved with one closure-table join."""
+        queryset = self.filter(ancestor_links__ancestor=category)
+        if not include_self:
+            queryset = queryset.filter(ancestor_links__depth__gt=0)
+        return queryset
+
+    def ancestors_of(self, category, include_self=False):
+        """All categories above ``category``, nearest parent first."""
+        queryset = self.filter(descendant_links__descendant=category)
+        if not include_self:
+            queryset = queryset.filter(descendant_links__depth__gt=0)
+        return queryset.order_by('descendant_links__depth')
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     icon = models.CharField(max_length=50, blank=True, null=True)
@@ -24,6 +42,8 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Categories"
         unique_together = ('name', 'organization', 'parent')
@@ -31,6 +51,86 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+    def get_descendant_ids(self, include_self=True):
+        """IDs of this category and all its subcategories, at any depth."""
+        links = CategoryClosure.objects.filter(ancestor_id=self.pk)
+        if not include_self:
+            links = links.filter(depth__gt=0)
+        return list(links.values_list('descendant_id', flat=True))
+
+    def get_ancestor_ids(self, include_self=False):
+        """IDs of the ancestors of this category, nearest parent first."""
+        links = CategoryClosure.objects.filter(descendant_id=self.pk)
+        if not include_self:
+            links = links.filter(depth__gt=0)
+        return list(links.order_by('depth').values_list('ancestor_id', flat=True))
+
+class CategoryClosure(models.Model):
+    """
+    Closure table for the Category hierarchy: one row per (ancestor, descendant)
+    pair, including a depth-0 row for each category with itself.
+
+    Maintained by the Category signals in ``transactions.signals`` so descendant
+    and ancestor lookups are a single indexed query instead of one per level.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def insert_node(cls, category):
+        """Add the paths for a newly created category."""
+        links = [cls(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+        if category.parent_id:
+            links += [
+                cls(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1)
+                for ancestor_id, depth in cls.objects.filter(
+                    descendant_id=category.parent_id
+                ).values_list('ancestor_id', 'depth')
+            ]
+        cls.objects.bulk_create(links)
+
+    @classmethod
+    def move_subtree(cls, category):
+        """Re-attach the subtree rooted at ``category`` under its current parent."""
+        subtree = list(cls.objects.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth'))
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if category.parent_id:
+            ancestors = cls.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth')
+            cls.objects.bulk_create([
+                cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + 1 + depth)
+                for ancestor_id, ancestor_depth in ancestors
+                for descendant_id, depth in subtree
+            ], batch_size=1000)
+
+    @classmethod
+    def rebuild(cls, organization_id=None):
+        """Recompute the closure rows from the ``parent`` links."""
+        categories = Category.objects.all()
+        if organization_id is not None:
+            categories = categories.filter(organization_id=organization_id)
+        parents = dict(categories.values_list('id', 'parent_id'))
+
+        links = []
+        for category_id in parents:
+            node_id, depth = category_id, 0
+            while node_id is not None and depth <= len(parents):
+                links.append(cls(ancestor_id=node_id, descendant_id=category_id, depth=depth))
+                node_id, depth = parents.get(node_id), depth + 1
+
+        cls.objects.filter(descendant_id__in=list(parents)).delete()
+        cls.objects.bulk_create(links, batch_size=1000)
+
 class Transaction(models.Model):
     TRANSACTION_TYPES = [
         ('INCOME', 'Income'),
@@ -96,13 +196,19 @@ class Transaction(models.Model):
     ai_category_suggestion = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='ai_suggested_transactions')
     ai_notes = models.TextField(blank=True, null=True)
 
+    # Búsqueda de texto en PostgreSQL: lo mantiene un trigger (migración 0006)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering = ['-date', '-created_at']
         indexes = [
-            models.Index(fields=['organization', 'date']),
+            models.Index(fields=['organization', 'date', 'id']),
             models.Index(fields=['type', 'status']),
             models.Index(fields=['category']),
             models.Index(fields=['merchant']),
+            models.Index(fields=['organization', 'bank_transaction_id']),
+            GinIndex(fields=['search_vector'], name='transaction_search_gin'),
+            GinIndex(fields=['merchant'], name='transaction_merchant_trgm', opclasses=['gin_trgm_ops']),
         ]
 
     def __str__(self):
@@ -132,25 +238,25 @@ class Budget(models.Model):
         return f"{self.category.name} - {self.period}"
 
     def get_all_subcategory_ids(self, category):
-        """Recursively get all subcategory IDs for a given category."""
-        subcategories = list(category.children.all())
-        ids = [category.id]
-        for subcat in subcategories:
-            ids += self.get_all_subcategory_ids(subcat)
-        return ids
+        """Get all subcategory IDs for a given category (including itself)."""
+        return category.get_descendant_ids()
 
     @property
     def spent_amount(self):
-        """Calculate the total spent amount for this budget's category and all subcategories in the current period"""
-        year, month = map(int, self.period.split('-'))
-        category_ids = self.get_all_subcategory_ids(self.category)
-        return Transaction.objects.filter(
-            category_id__in=category_ids,
-            organization=self.organization,
-            type='EXPENSE',
-            date__year=year,
-            date__month=month
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        """
+        Total spent for this budget's category and all its subcategories in the period.
+
+        Read from the spend ledger; ``BudgetViewSet`` annotates ``ledger_spent`` so
+        listing budgets doesn't hit the database once per row.
+        """
+        if hasattr(self, 'ledger_spent'):
+            return self.ledger_spent or 0
+        self.ledger_spent = MonthlyCategorySpend.objects.filter(
+            organization_id=self.organization_id,
+            category_id=self.category_id,
+            period=self.period
+        ).values_list('amount', flat=True).first() or 0
+        return self.ledger_spent
 
     @property
     def remaining_amount(self):
@@ -163,5 +269,84 @@ class Budget(models.Model):
         if self.amount == 0:
             return 0
         return (self.spent_amount / self.amount) * 100
-    
-    
\ No newline at end of file
+
+
+class MonthlyCategorySpend(models.Model):
+    """
+    Incrementally maintained EXPENSE totals per (organization, category, period).
+
+    ``amount`` is rolled up over the category tree: a row for a parent category
+    includes the spend of all its subcategories, so a budget's spent amount is a
+    single indexed lookup. Rows are kept up to date by the Transaction and
+    Category signals in ``transactions.signals``.
+    """
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='category_spend')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='monthly_spend')
+    period = models.CharField(max_length=7)  # Format: YYYY-MM
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('organization', 'category', 'period')
+        verbose_name_plural = "Monthly category spend"
+
+    def __str__(self):
+        return f"{self.category_id} - {self.period}: {self.amount}"
+
+    @staticmethod
+    def period_for(date):
+        """Return the YYYY-MM period a transaction date belongs to."""
+        return str(date)[:7]
+
+    @staticmethod
+    def category_chain(category_id):
+        """Return the category id followed by the ids of all its ancestors."""
+        return list(
+            CategoryClosure.objects.filter(descendant_id=category_id)
+            .order_by('depth').values_list('ancestor_id', flat=True)
+        )
+
+    @classmethod
+    def apply_delta(cls, organization_id, category_id, period, delta):
+        """Add ``delta`` to the category and every ancestor for the given period."""
+        if not delta or category_id is None or organization_id is None:
+            return
+        for node_id in cls.category_chain(category_id):
+            updated = cls.objects.filter(
+                organization_id=organization_id, category_id=node_id, period=period
+            ).update(amount=F('amount') + delta)
+            if not updated:
+                row, created = cls.objects.get_or_create(
+                    organization_id=organization_id, category_id=node_id, period=period,
+                    defaults={'amount': delta}
+                )
+                if not created:
+                    cls.objects.filter(pk=row.pk).update(amount=F('amount') + delta)
+
+    @classmethod
+    def rebuild(cls, organization_id):
+        """Recompute every ledger row of an organization from its transactions."""
+        if not Organization.objects.filter(pk=organization_id).exists():
+            return
+        parents = dict(Category.objects.filter(organization_id=organization_id).values_list('id', 'parent_id'))
+        direct = Transaction.objects.filter(
+            organization_id=organization_id, type='EXPENSE', category__isnull=False
+        ).annotate(
+            year=ExtractYear('date'), month=ExtractMonth('date')
+        ).values('category_id', 'year', 'month').annotate(total=Sum('amount')).order_by()
+
+        totals = {}
+        for row in direct:
+            period = f"{row['year']:04d}-{row['month']:02d}"
+            node_id, seen = row['category_id'], set()
+            while node_id is not None and node_id not in seen:
+                seen.add(node_id)
+                totals[(node_id, period)] = totals.get((node_id, period), 0) + row['total']
+                node_id = parents.get(node_id)
+
+        cls.objects.filter(organization_id=organization_id).delete()
+        cls.objects.bulk_create([
+            cls(organization_id=organization_id, category_id=category_id, period=period, amount=amount)
+            for (category_id, period), amount in totals.items()
+            if category_id in parents
+        ], batch_size=1000)
@@ -0,0 +1,135 @@
+from base64 import b64decode, b64encode
+from urllib import parse
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class TransactionKeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) para transacciones ordenadas por (-date, -id).
+
+    El cursor guarda la última posición (fecha, id) vista, de modo que cada página
+    es un rango sobre el índice (organization, date, id) en lugar de un OFFSET, y
+    no se ejecuta COUNT(*). Devuelve solo ``next``, ``previous`` y ``results``.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        reverse, position = cursor if cursor else (False, None)
+
+        if reverse:
+            queryset = queryset.order_by('date', 'id')
+        else:
+            queryset = queryset.order_by('-date', '-id')
+
+        if position:
+            position_date, position_id = position
+            if reverse:
+                queryset = queryset.filter(Q(date__gt=position_date) | Q(date=position_date, id__gt=position_id))
+            else:
+                queryset = queryset.filter(Q(date__lt=position_date) | Q(date=position_date, id__lt=position_id))
+
+        # Una fila extra indica si hay más resultados en esta dirección
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        last = self.page[-1]
+        return self.encode_cursor(reverse=False, position=(last.date, last.id))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        first = self.page[0]
+        return self.encode_cursor(reverse=True, position=(first.date, first.id))
+
+    def decode_cursor(self, request):
+        """Devuelve (reverse, (fecha, id)) o None si no hay cursor."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            position_date, position_id = tokens['p'][0].split('|')
+            position_date = parse_date(position_date)
+            if position_date is None:
+                raise ValueError(position_date)
+            return reverse, (position_date, int(position_id))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, reverse, position):
+        tokens = {'p': f'{position[0].isoformat()}|{position[1]}'}
+        if reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens, doseq=True)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        url = remove_query_param(self.base_url, 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'previous': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
@@ -36,9 +36,16 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_by', 'created_at', 'modified_at']
 
     def get_children(self, obj):
+        # En modo árbol los hijos los enlaza CategoryTreeSerializer en memoria
+        if isinstance(self.parent, CategoryTreeSerializer):
+            return []
         # Solo serializar subcategorías si estamos en el nivel superior
         if obj.parent is None:
-            children = Category.objects.filter(parent=obj, organization=obj.organization)
+            if 'children' in getattr(obj, '_prefetched_objects_cache', {}):
+                # Hijos precargados con prefetch_related (p. ej. en el listado de transacciones)
+                children = obj.children.all()
+            else:
+                children = Category.objects.filter(parent=obj, organization=obj.organization)
             return CategorySerializer(children, many=True).data
         return []
 
@@ -47,19 +54,43 @@ class CategorySerializer(serializers.ModelSerializer):
 
     def validate(self, data):
         # Validar que una categoría no sea su propia subcategoría
-        if 'parent' in data and data['parent']:
-            if data['parent'].id == self.instance.id if self.instance else None:
+        if 'parent' in data and data['parent'] and self.instance:
+            if data['parent'].id == self.instance.id:
                 raise serializers.ValidationError("Una categoría no puede ser su propia subcategoría")
             
-            # Validar que no se cree un ciclo en la jerarquía
-            parent = data['parent']
-            while parent:
-                if parent.id == self.instance.id if self.instance else None:
-                    raise serializers.ValidationError("No se puede crear un ciclo en la jerarquía de categorías")
-                parent = parent.parent
+            # Validar que no se cree un ciclo en la jerarquía (una sola consulta a la tabla de cierre)
+            if Category.objects.descendants_of(self.instance).filter(pk=data['parent'].pk).exists():
+                raise serializers.ValidationError("No se puede crear un ciclo en la jerarquía de categorías")
 
         return data
 
+class CategoryTreeSerializer(serializers.ListSerializer):
+    """
+    Serializa todas las categorías de una organización como un árbol anidado.
+
+    Recibe las categorías ya cargadas (una sola consulta, con ``select_related('parent')``),
+    serializa cada nodo una vez y enlaza los hijos en memoria en O(N).
+    Uso: ``CategoryTreeSerializer(queryset, child=CategorySerializer(), context=...)``.
+    """
+
+    def to_representation(self, data):
+        categories = data.all() if hasattr(data, 'all') else data
+        nodes = {}
+        parents = {}
+        for category in categories:
+            node = self.child.to_representation(category)
+            nodes[category.id] = node
+            parents[category.id] = category.parent_id
+
+        roots = []
+        for category_id, node in nodes.items():
+            parent = nodes.get(parents[category_id])
+            if parent is None:
+                roots.append(node)
+            else:
+                parent['children'].append(node)
+        return roots
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -126,6 +157,47 @@ class TransactionSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
+class TransactionListSerializer(serializers.ModelSerializer):
+    """
+    Variante plana y de solo lectura para listados: ids + nombres en lugar de
+    objetos anidados. Espera el queryset de TransactionViewSet (select_related
+    de categoría y cuentas, prefetch de tags).
+    """
+    category_id = serializers.IntegerField(read_only=True)
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    source_account_id = serializers.IntegerField(read_only=True)
+    source_account_name = serializers.CharField(source='source_account.name', read_only=True)
+    destination_account_id = serializers.IntegerField(read_only=True)
+    destination_account_name = serializers.CharField(source='destination_account.name', read_only=True)
+    tags = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Transaction
+        fields = [
+            'id',
+            'description',
+            'amount',
+            'date',
+            'category_id',
+            'category_name',
+            'status',
+            'type',
+            'tags',
+            'source_account_id',
+            'source_account_name',
+            'destination_account_id',
+            'destination_account_name',
+            'created_at',
+            'modified_at',
+            'is_imported',
+            'bank_transaction_id',
+            'merchant',
+        ]
+        read_only_fields = fields
+
+    def get_tags(self, obj):
+        return [tag.name for tag in obj.tags.all()]
+
 class BudgetSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     spent_amount = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
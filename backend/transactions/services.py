@@ -1,12 +1,36 @@
+import re
 from datetime import datetime, timedelta
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.db.models import Avg, Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
 from elasticsearch_dsl import Q, Search
 from elasticsearch_dsl.query import MultiMatch, Range, Terms, Match
 from elasticsearch_dsl.aggs import Terms as TermsAgg, Stats, DateHistogram
 from .documents import TransactionDocument
+from .indexing import get_client, get_routing
+from .models import Transaction
 
 class TransactionSearchService:
-    def __init__(self):
-        self.search = Search(index='transactions')
+    """
+    Búsqueda de transacciones de una organización.
+
+    La organización es obligatoria: toda búsqueda filtra por ``organization_id``
+    y se envía con su routing, así que solo consulta el shard de esa organización.
+    """
+
+    def __init__(self, organization, using=None):
+        if organization is None:
+            raise ValueError("TransactionSearchService requiere una organización")
+        organization_id = getattr(organization, 'pk', organization)
+        self.aggregations = False
+        self.search = Search(
+            using=using or get_client(), index=TransactionDocument._index._name
+        ).params(
+            routing=get_routing(organization_id)
+        ).filter('term', organization_id=str(organization_id))
 
     def search_by_description(self, query, fuzzy=True):
         """Búsqueda por descripción con opción de fuzzy matching"""
@@ -59,7 +83,10 @@ class TransactionSearchService:
     def filter_by_accounts(self, account_ids):
         """Filtrar por IDs de cuentas"""
         if account_ids:
-            self.search = self.search.filter('terms', account_id=[str(id) for id in account_ids])
+            account_ids = [str(id) for id in account_ids]
+            self.search = self.search.filter(
+                Q('terms', source_account_id=account_ids) | Q('terms', destination_account_id=account_ids)
+            )
         return self
 
     def filter_by_tags(self, tags):
@@ -80,6 +107,7 @@ class TransactionSearchService:
 
     def add_aggregations(self):
         """Agregar agregaciones útiles"""
+        self.aggregations = True
         # Agregación por tipo
         self.search.aggs.bucket(
             'por_tipo',
@@ -129,4 +157,200 @@ class TransactionSearchService:
 
     def get_total(self):
         """Obtener el total de resultados sin paginación"""
-        return self.search.count() 
\ No newline at end of file
+        return self.search.count() 
+
+    def get_page(self):
+        """Ejecutar la búsqueda y devolver total, documentos y agregaciones"""
+        response = self.execute()
+        page = {
+            'count': response.hits.total.value,
+            'results': [dict(hit.to_dict(), id=int(hit.meta.id)) for hit in response],
+        }
+        if self.aggregations:
+            page['aggregations'] = response.aggregations.to_dict()
+        return page
+
+
+class PostgresTransactionSearchService:
+    """
+    Búsqueda de transacciones en PostgreSQL, con la interfaz de TransactionSearchService.
+
+    Descripción, comercio y notas se buscan en ``search_vector`` (tsvector con
+    índice GIN, mantenido por un trigger) y el comercio además por similitud de
+    trigramas (pg_trgm, también con GIN), que tolera errores de escritura. Sin
+    otro orden, los resultados salen por relevancia. No necesita Elasticsearch.
+    """
+    # Debe coincidir con la configuración del trigger (migración 0006)
+    SEARCH_CONFIG = 'simple'
+    SORT_FIELDS = {'description.raw': 'description'}
+    AGGREGATION_SIZE = 10
+
+    def __init__(self, organization):
+        if organization is None:
+            raise ValueError("PostgresTransactionSearchService requiere una organización")
+        self.queryset = Transaction.objects.filter(organization_id=getattr(organization, 'pk', organization))
+        self.rank = None
+        self.ordering = None
+        self.page = 1
+        self.size = 10
+        self.aggregations = False
+
+    @classmethod
+    def get_search_query(cls, query):
+        return SearchQuery(query, config=cls.SEARCH_CONFIG, search_type='websearch')
+
+    @classmethod
+    def get_match(cls, query, fuzzy=True):
+        """Condición que resuelven los índices GIN: texto completo y, si ``fuzzy``, trigramas del comercio"""
+        match = models.Q(search_vector=cls.get_search_query(query))
+        if fuzzy:
+            match |= models.Q(merchant__trigram_similar=query)
+        return match
+
+    @classmethod
+    def get_rank(cls, query, fuzzy=True):
+        rank = SearchRank(F('search_vector'), cls.get_search_query(query))
+        if fuzzy:
+            rank = rank + Coalesce(TrigramSimilarity('merchant', query), Value(0.0))
+        return rank
+
+    def search_by_description(self, query, fuzzy=True):
+        """Búsqueda de texto ordenada por relevancia"""
+        self.queryset = self.queryset.filter(self.get_match(query, fuzzy))
+        self.rank = self.get_rank(query, fuzzy)
+        return self
+
+    def filter_by_amount_range(self, min_amount=None, max_amount=None):
+        """Filtrar por rango de monto"""
+        if min_amount is not None:
+            self.queryset = self.queryset.filter(amount__gte=min_amount)
+        if max_amount is not None:
+            self.queryset = self.queryset.filter(amount__lte=max_amount)
+        return self
+
+    def filter_by_date_range(self, start_date=None, end_date=None, days=None):
+        """Filtrar por rango de fechas"""
+        if days is not None:
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=days)
+        if start_date:
+            self.queryset = self.queryset.filter(date__gte=start_date)
+        if end_date:
+            self.queryset = self.queryset.filter(date__lte=end_date)
+        return self
+
+    def filter_by_types(self, types):
+        """Filtrar por tipos de transacción"""
+        if types:
+            self.queryset = self.queryset.filter(type__in=types)
+        return self
+
+    def filter_by_accounts(self, account_ids):
+        """Filtrar por IDs de cuentas (origen o destino)"""
+        if account_ids:
+            self.queryset = self.queryset.filter(
+                models.Q(source_account_id__in=account_ids) | models.Q(destination_account_id__in=account_ids)
+            )
+        return self
+
+    def filter_by_tags(self, tags):
+        """Filtrar por tags"""
+        if tags:
+            # Subconsulta en lugar de JOIN: una transacción con varios tags no se duplica
+            tagged = Transaction.tags.through.objects.filter(tag__name__in=tags).values('transaction_id')
+            self.queryset = self.queryset.filter(pk__in=tagged)
+        return self
+
+    def sort_by(self, field, order='asc'):
+        """Ordenar resultados"""
+        field = self.SORT_FIELDS.get(field, field)
+        self.ordering = f"-{field}" if order == 'desc' else field
+        return self
+
+    def paginate(self, page=1, size=10):
+        """Paginación de resultados"""
+        self.page, self.size = page, size
+        return self
+
+    def add_aggregations(self):
+        """Agregar agregaciones útiles (mismo formato que las de Elasticsearch)"""
+        self.aggregations = True
+        return self
+
+    def get_aggregations(self):
+        queryset = self.queryset.order_by()
+        stats = queryset.aggregate(count=Count('id'), min=Min('amount'), max=Max('amount'),
+                                   avg=Avg('amount'), sum=Sum('amount'))
+        by_type = queryset.values('type').annotate(doc_count=Count('id')).order_by('-doc_count')
+        by_month = queryset.annotate(month=TruncMonth('date')).values('month').annotate(
+            doc_count=Count('id')).order_by('month')
+        by_tag = Transaction.tags.through.objects.filter(
+            transaction_id__in=queryset.values('pk')
+        ).values('tag__name').annotate(doc_count=Count('transaction_id')).order_by('-doc_count')
+        return {
+            'por_tipo': {'buckets': [
+                {'key': row['type'], 'doc_count': row['doc_count']} for row in by_type[:self.AGGREGATION_SIZE]
+            ]},
+            'estadisticas_monto': {
+                key: float(value) if value is not None else None for key, value in stats.items()
+            },
+            'por_mes': {'buckets': [
+                {'key_as_string': row['month'].strftime('%Y-%m'), 'doc_count': row['doc_count']} for row in by_month
+            ]},
+            'por_tags': {'buckets': [
+                {'key': row['tag__name'], 'doc_count': row['doc_count']} for row in by_tag[:self.AGGREGATION_SIZE]
+            ]},
+        }
+
+    def get_suggestions(self, prefix, size=5):
+        """Descripciones que empiezan por las palabras de ``prefix`` (prefijos sobre el índice GIN)"""
+        words = re.findall(r'\w+', prefix)
+        if not words:
+            return []
+        query = SearchQuery(' & '.join(f"{word}:*" for word in words), config=self.SEARCH_CONFIG,
+                            search_type='raw')
+        return list(
+            self.queryset.filter(search_vector=query).exclude(description=None)
+            .order_by('description').values_list('description', flat=True).distinct()[:size]
+        )
+
+    def execute(self):
+        """Ejecutar la búsqueda: transacciones de la página pedida"""
+        queryset = self.queryset
+        if self.rank is not None:
+            queryset = queryset.annotate(rank=self.rank)
+        ordering = self.ordering or ('-rank' if self.rank is not None else '-date')
+        start = (self.page - 1) * self.size
+        queryset = queryset.defer('search_vector').prefetch_related('tags').order_by(ordering, '-id')
+        return list(queryset[start:start + self.size])
+
+    def get_total(self):
+        """Obtener el total de resultados sin paginación"""
+        return self.queryset.count()
+
+    def get_page(self):
+        """Ejecutar la búsqueda y devolver total, documentos y agregaciones"""
+        document = TransactionDocument()
+        page = {
+            'count': self.get_total(),
+            'results': [dict(document.prepare(instance), id=instance.pk) for instance in self.execute()],
+        }
+        if self.aggregations:
+            page['aggregations'] = self.get_aggregations()
+        return page
+
+
+SEARCH_BACKENDS = {
+    'elasticsearch': TransactionSearchService,
+    'postgres': PostgresTransactionSearchService,
+}
+
+
+def get_search_service(organization, backend=None):
+    """Servicio de búsqueda del motor configurado en ``TRANSACTION_SEARCH_BACKEND``"""
+    backend = backend or getattr(settings, 'TRANSACTION_SEARCH_BACKEND', 'elasticsearch')
+    try:
+        service_class = SEARCH_BACKENDS[backend]
+    except KeyError:
+        raise ImproperlyConfigured(f"TRANSACTION_SEARCH_BACKEND desconocido: {backend}")
+    return service_class(organization)
@@ -0,0 +1,169 @@
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_save, pre_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Transaction, Category, CategoryClosure, MonthlyCategorySpend
+from .indexing import SearchIndexQueue
+from .summary import TransactionSummaryService
+
+
+def _ledger_key(type, organization_id, category_id, date, amount):
+    """Ledger contribution of a transaction, or None if it doesn't count as spend."""
+    if type != 'EXPENSE' or category_id is None or organization_id is None or date is None:
+        return None
+    return (organization_id, category_id, MonthlyCategorySpend.period_for(date)), amount or 0
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_spend(sender, instance, raw=False, **kwargs):
+    """
+    Guardar la contribución previa al ledger antes de actualizar la transacción
+    """
+    instance._previous_spend = None
+    if raw or not instance.pk:
+        return
+    previous = Transaction.objects.filter(pk=instance.pk).values(
+        'type', 'organization_id', 'category_id', 'date', 'amount'
+    ).first()
+    if previous:
+        instance._previous_spend = _ledger_key(**previous)
+
+
+@receiver(post_save, sender=Transaction)
+def update_spend_ledger_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Aplicar al ledger de gasto mensual la diferencia introducida por la transacción
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_previous_spend', None)
+    current = _ledger_key(
+        instance.type, instance.organization_id, instance.category_id, instance.date, instance.amount
+    )
+    if previous == current:
+        return
+    if previous:
+        (organization_id, category_id, period), amount = previous
+        MonthlyCategorySpend.apply_delta(organization_id, category_id, period, -amount)
+    if current:
+        (organization_id, category_id, period), amount = current
+        MonthlyCategorySpend.apply_delta(organization_id, category_id, period, amount)
+    instance._previous_spend = current
+
+
+@receiver(post_delete, sender=Transaction)
+def update_spend_ledger_on_delete(sender, instance, **kwargs):
+    """
+    Descontar del ledger el gasto de una transacción eliminada
+    """
+    current = _ledger_key(
+        instance.type, instance.organization_id, instance.category_id, instance.date, instance.amount
+    )
+    if current:
+        (organization_id, category_id, period), amount = current
+        MonthlyCategorySpend.apply_delta(organization_id, category_id, period, -amount)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_transaction_summary(sender, instance, **kwargs):
+    """
+    Invalidar los resúmenes cacheados de la organización tras cualquier escritura
+    (las categorías también, porque el resumen incluye sus nombres)
+    """
+    if instance.organization_id:
+        TransactionSummaryService.invalidate(instance.organization_id)
+
+
+@receiver(pre_save, sender=Category)
+def remember_previous_parent(sender, instance, raw=False, **kwargs):
+    """
+    Guardar el padre anterior para detectar cuando una categoría se mueve en el árbol
+    """
+    instance._previous_parent_id = None
+    if not raw and instance.pk:
+        instance._previous_parent_id = Category.objects.filter(pk=instance.pk).values_list(
+            'parent_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Category)
+def maintain_category_closure(sender, instance, created, raw=False, **kwargs):
+    """
+    Mantener la tabla de cierre al crear o mover una categoría
+    """
+    if raw:
+        return
+    if created:
+        CategoryClosure.insert_node(instance)
+    elif instance.parent_id != getattr(instance, '_previous_parent_id', None):
+        CategoryClosure.move_subtree(instance)
+
+
+@receiver(post_save, sender=Category)
+def rebuild_spend_ledger_on_move(sender, instance, created, raw=False, **kwargs):
+    """
+    Recalcular los acumulados del ledger cuando cambia la jerarquía de categorías
+    """
+    if raw or created or instance.parent_id == getattr(instance, '_previous_parent_id', None):
+        return
+    organization_id = instance.organization_id
+    db_transaction.on_commit(lambda: MonthlyCategorySpend.rebuild(organization_id))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_spend(sender, instance, **kwargs):
+    """
+    Marcar si la categoría eliminada tenía gasto registrado en el ledger
+    """
+    instance._had_spend = instance.monthly_spend.exclude(amount=0).exists()
+
+
+@receiver(post_delete, sender=Category)
+def rebuild_spend_ledger_on_delete(sender, instance, **kwargs):
+    """
+    Las transacciones de una categoría eliminada quedan sin categoría (SET_NULL) sin
+    pasar por las señales, así que se recalcula el ledger de la organización
+    """
+    if not getattr(instance, '_had_spend', False):
+        return
+    organization_id = instance.organization_id
+    db_transaction.on_commit(lambda: MonthlyCategorySpend.rebuild(organization_id))
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def queue_search_index_update(sender, instance, raw=False, **kwargs):
+    """
+    Reindexar la transacción en Elasticsearch tras el commit (en bloque, vía Celery)
+    """
+    if not raw:
+        SearchIndexQueue.enqueue([instance.pk], instance.organization_id)
+
+
+@receiver(m2m_changed, sender=Transaction.tags.through)
+def queue_search_index_tags_update(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Los tags forman parte del documento: reindexar al cambiarlos
+
+    También se actualiza ``modified_at``, que es lo que la reconstrucción del
+    índice usa para recuperar los cambios hechos durante la carga.
+    """
+    if reverse and action == 'pre_clear':
+        # Desde el tag, post_clear no recibe los ids de las transacciones afectadas
+        instance._cleared_transaction_ids = set(instance.transactions.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        transaction_ids = {instance.pk}
+        organization_id = instance.organization_id
+    else:
+        transaction_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_transaction_ids', set())
+        organization_id = None
+    if not transaction_ids:
+        return
+    Transaction.objects.filter(pk__in=transaction_ids).update(modified_at=timezone.now())
+    SearchIndexQueue.enqueue(sorted(transaction_ids), organization_id)
@@ -0,0 +1,136 @@
+import hashlib
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from core.services.cache_versions import CacheVersionService
+
+
+class TransactionSummaryService:
+    """
+    Resumen de transacciones en una sola consulta con agregación condicional.
+
+    Agrupa el queryset filtrado por (tipo, estado, mes, categoría) en un único
+    GROUP BY y arma en memoria los totales generales y los desgloses. El resultado
+    se puede cachear por organización + parámetros de filtro; la caché se invalida
+    subiendo la versión de la organización en cada escritura de transacciones.
+    """
+
+    CACHE_KEY_PREFIX = 'transactions:summary:'
+
+    @classmethod
+    def get_cache_timeout(cls):
+        return getattr(settings, 'TRANSACTION_SUMMARY_CACHE_TIMEOUT', 300)
+
+    @classmethod
+    def get_version_key(cls, org_id):
+        return f"{cls.CACHE_KEY_PREFIX}version:{org_id}"
+
+    @classmethod
+    def get_version(cls, org_id):
+        """Versión actual del resumen de la organización"""
+        return CacheVersionService.get_version(cls.get_version_key(org_id))
+
+    @classmethod
+    def invalidate(cls, org_id):
+        """Invalidar todos los resúmenes cacheados de una organización"""
+        key = cls.get_version_key(org_id)
+        CacheVersionService.bump(key)
+        # Un lector concurrente pudo cachear el resumen previo al commit con la versión nueva
+        db_transaction.on_commit(lambda: CacheVersionService.bump(key))
+
+    @classmethod
+    def get_cache_key(cls, org_id, params):
+        """Clave de caché para una organización y un conjunto de filtros"""
+        normalized = '&'.join(
+            f"{key}={','.join(sorted(values))}" for key, values in sorted(params.items())
+        )
+        digest = hashlib.md5(normalized.encode()).hexdigest()
+        return f"{cls.CACHE_KEY_PREFIX}{org_id}:{cls.get_version(org_id)}:{digest}"
+
+    @classmethod
+    def get_summary(cls, organization, queryset, params=None, use_cache=True):
+        """
+        Resumen del queryset, cacheado por organización y filtros.
+
+        Args:
+            organization: Organización dueña del queryset
+            queryset: Transacciones ya filtradas
+            params: dict {parámetro: [valores]} con los filtros aplicados
+            use_cache: Permite saltarse la caché
+        """
+        timeout = cls.get_cache_timeout()
+        if not use_cache or not timeout:
+            return cls.summarize(queryset)
+
+        cache_key = cls.get_cache_key(organization.id, params or {})
+        summary = cache.get(cache_key)
+        if summary is None:
+            summary = cls.summarize(queryset)
+            cache.set(cache_key, summary, timeout)
+        return summary
+
+    @classmethod
+    def summarize(cls, queryset):
+        """Calcula totales y desgloses por tipo, estado, mes y categoría en una consulta"""
+        rows = (
+            queryset.order_by()
+            .annotate(month=TruncMonth('date'))
+            .values('type', 'status', 'month', 'category_id', 'category__name')
+            .annotate(total=Sum('amount'), count=Count('id'))
+        )
+
+        by_type, by_status, by_month, by_category = {}, {}, {}, {}
+        income = expenses = Decimal('0')
+        total_transactions = 0
+
+        for row in rows:
+            total, count = row['total'] or Decimal('0'), row['count']
+            total_transactions += count
+            if row['type'] == 'INCOME':
+                income += total
+            elif row['type'] == 'EXPENSE':
+                expenses += total
+
+            cls._add(by_type, row['type'], {'type': row['type']}, total, count)
+            cls._add(by_status, row['status'], {'status': row['status']}, total, count)
+
+            month = row['month'].strftime('%Y-%m') if row['month'] else None
+            cls._add_flow(by_month, month, {'month': month}, row['type'], total, count)
+            cls._add_flow(
+                by_category, row['category_id'],
+                {'category_id': row['category_id'], 'category_name': row['category__name']},
+                row['type'], total, count
+            )
+
+        return {
+            'income': income,
+            'expenses': expenses,
+            'net': income - expenses,
+            'total_transactions': total_transactions,
+            'by_type': sorted(by_type.values(), key=lambda item: item['type']),
+            'by_status': sorted(by_status.values(), key=lambda item: item['status']),
+            'by_month': sorted(by_month.values(), key=lambda item: item['month'] or ''),
+            'by_category': sorted(by_category.values(), key=lambda item: -item['expenses']),
+        }
+
+    @staticmethod
+    def _add(groups, key, base, total, count):
+        group = groups.setdefault(key, {**base, 'total': Decimal('0'), 'count': 0})
+        group['total'] += total
+        group['count'] += count
+
+    @staticmethod
+    def _add_flow(groups, key, base, type, total, count):
+        group = groups.setdefault(key, {
+            **base, 'income': Decimal('0'), 'expenses': Decimal('0'), 'net': Decimal('0'), 'count': 0
+        })
+        if type == 'INCOME':
+            group['income'] += total
+            group['net'] += total
+        elif type == 'EXPENSE':
+            group['expenses'] += total
+            group['net'] -= total
+        group['count'] += count
@@ -0,0 +1,10 @@
+from celery import shared_task
+from elasticsearch import ConnectionError, ConnectionTimeout
+
+
+@shared_task(ignore_result=True, autoretry_for=(ConnectionError, ConnectionTimeout), retry_backoff=True,
+             max_retries=5)
+def update_search_index(changes):
+    """Reindexar en bloque las transacciones modificadas (o borrarlas del índice)"""
+    from transactions.indexing import SearchIndexQueue
+    return SearchIndexQueue.process(changes)
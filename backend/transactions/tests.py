@@ -1,3 +1,847 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import skipUnless
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.models import User
+from organizations.models import Organization, OrganizationMembership
+from chartofaccounts.models import Account
+from core.services.org_context import OrgContextService
+from .models import Transaction, Category, CategoryClosure, Budget, MonthlyCategorySpend, Tag
+from .serializers import CategorySerializer
+from .summary import TransactionSummaryService
+from .importers import parse_ofx
+from .indexing import SearchIndexQueue, TransactionIndexer, TransactionIndexManager
+from .services import PostgresTransactionSearchService, TransactionSearchService, get_search_service
 
-# Create your tests here.
+
+class MonthlyCategorySpendTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ledger_user', password='pass')
+        self.org = Organization.objects.create(name='Ledger Org')
+        self.food = Category.objects.create(name='Food', organization=self.org)
+        self.groceries = Category.objects.create(name='Groceries', organization=self.org, parent=self.food)
+
+    def _expense(self, amount, category, day=date(2025, 6, 10), **kwargs):
+        return Transaction.objects.create(
+            type=kwargs.pop('type', 'EXPENSE'),
+            amount=Decimal(amount),
+            date=day,
+            category=category,
+            organization=self.org,
+            created_by=self.user,
+            **kwargs
+        )
+
+    def _spent(self, category, period='2025-06'):
+        return MonthlyCategorySpend.objects.filter(
+            organization=self.org, category=category, period=period
+        ).values_list('amount', flat=True).first() or 0
+
+    def test_expense_rolls_up_to_parent_categories(self):
+        self._expense('40.00', self.groceries)
+        self._expense('10.00', self.food)
+        self._expense('99.00', self.food, type='INCOME')
+
+        self.assertEqual(self._spent(self.groceries), Decimal('40.00'))
+        self.assertEqual(self._spent(self.food), Decimal('50.00'))
+
+    def test_update_and_delete_adjust_the_ledger(self):
+        transaction = self._expense('40.00', self.groceries)
+
+        transaction.amount = Decimal('25.00')
+        transaction.date = date(2025, 7, 1)
+        transaction.save()
+        self.assertEqual(self._spent(self.food), 0)
+        self.assertEqual(self._spent(self.food, '2025-07'), Decimal('25.00'))
+
+        transaction.delete()
+        self.assertEqual(self._spent(self.food, '2025-07'), 0)
+
+    def test_rebuild_matches_incremental_totals(self):
+        self._expense('40.00', self.groceries)
+        self._expense('15.50', self.food)
+        incremental = dict(MonthlyCategorySpend.objects.values_list('category_id', 'amount'))
+
+        MonthlyCategorySpend.rebuild(self.org.id)
+
+        self.assertEqual(dict(MonthlyCategorySpend.objects.values_list('category_id', 'amount')), incremental)
+
+    def test_budget_spent_amount_reads_the_ledger(self):
+        self._expense('40.00', self.groceries)
+        budget = Budget.objects.create(category=self.food, organization=self.org, amount=Decimal('200.00'), period='2025-06')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(budget.spent_amount, Decimal('40.00'))
+            self.assertEqual(budget.remaining_amount, Decimal('160.00'))
+            self.assertEqual(budget.percentage_used, Decimal('20'))
+
+
+class CategoryClosureTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Closure Org')
+        self.food = Category.objects.create(name='Food', organization=self.org)
+        self.groceries = Category.objects.create(name='Groceries', organization=self.org, parent=self.food)
+        self.produce = Category.objects.create(name='Produce', organization=self.org, parent=self.groceries)
+        self.travel = Category.objects.create(name='Travel', organization=self.org)
+
+    def test_descendants_and_ancestors_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertCountEqual(
+                Category.objects.descendants_of(self.food).values_list('id', flat=True),
+                [self.food.id, self.groceries.id, self.produce.id]
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(self.produce.get_ancestor_ids(), [self.groceries.id, self.food.id])
+
+    def test_moving_a_subtree_updates_paths(self):
+        self.groceries.parent = self.travel
+        self.groceries.save()
+
+        self.assertEqual(self.produce.get_ancestor_ids(), [self.groceries.id, self.travel.id])
+        self.assertEqual(self.food.get_descendant_ids(), [self.food.id])
+
+        links = set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        CategoryClosure.rebuild(self.org.id)
+        self.assertEqual(set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')), links)
+
+    def test_serializer_rejects_cycles(self):
+        serializer = CategorySerializer(self.food, data={'parent': self.produce.id}, partial=True)
+        self.assertFalse(serializer.is_valid())
+
+
+class OrganizationAPITestCase(TestCase):
+    """Cliente autenticado con JWT y header X-Organization-ID para un admin de la organización."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='api_admin', password='pass')
+        self.org = Organization.objects.create(name='API Org')
+        OrganizationMembership.objects.create(user=self.user, organization=self.org, role='admin')
+        # Precargar las membresías para que los conteos de consultas no dependan de la caché
+        OrgContextService.clear()
+        OrgContextService.get_memberships(self.user)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}',
+            HTTP_X_ORGANIZATION_ID=str(self.org.id)
+        )
+
+
+class CategoryTreeAPITests(OrganizationAPITestCase):
+    url = '/api/transactions/categories/'
+
+    def setUp(self):
+        super().setUp()
+        food = Category.objects.create(name='Food', organization=self.org)
+        groceries = Category.objects.create(name='Groceries', organization=self.org, parent=food)
+        Category.objects.create(name='Produce', organization=self.org, parent=groceries)
+        Category.objects.create(name='Travel', organization=self.org)
+
+    def test_tree_nests_all_levels(self):
+        response = self.client.get(self.url, {'tree': 'true'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([node['name'] for node in response.data], ['Food', 'Travel'])
+        groceries = response.data[0]['children'][0]
+        self.assertEqual(groceries['parent_name'], 'Food')
+        self.assertEqual([node['name'] for node in groceries['children']], ['Produce'])
+
+    def test_tree_query_count_does_not_grow_with_categories(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url, {'tree': 'true'})
+        for i in range(10):
+            Category.objects.create(name=f'Extra {i}', organization=self.org)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(self.url, {'tree': 'true'})
+        self.assertEqual(len(small), len(large))
+
+    def test_tree_returns_not_modified_for_matching_etag(self):
+        response = self.client.get(self.url, {'tree': 'true'})
+        etag = response['ETag']
+
+        cached = self.client.get(self.url, {'tree': 'true'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+
+        Category.objects.create(name='Health', organization=self.org)
+        changed = self.client.get(self.url, {'tree': 'true'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+
+class TransactionListQueryCountTests(OrganizationAPITestCase):
+    url = '/api/transactions/'
+
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', organization=self.org)
+        self.groceries = Category.objects.create(name='Groceries', organization=self.org, parent=self.food)
+        self.bank = Account.objects.create(name='Bank', code='1000', type='BANK', organization=self.org)
+        self.card = Account.objects.create(name='Card', code='2000', type='CREDIT', organization=self.org)
+        self.tags = [Tag.objects.create(name='monthly'), Tag.objects.create(name='food')]
+        self.sequence = 0
+
+    def _create_transactions(self, count):
+        for _ in range(count):
+            self.sequence += 1
+            transaction = Transaction.objects.create(
+                type='EXPENSE',
+                amount=Decimal('10.00'),
+                date=date(2025, 6, 1 + self.sequence % 28),
+                description=f'Transaction {self.sequence}',
+                category=self.food if self.sequence % 2 else self.groceries,
+                source_account=self.bank,
+                destination_account=self.card,
+                organization=self.org,
+                created_by=self.user
+            )
+            transaction.tags.set(self.tags)
+
+    def _count_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_is_constant_per_page(self):
+        for params in ({}, {'lean': 'true'}):
+            with self.subTest(params=params):
+                self.sequence = 0
+                Transaction.objects.all().delete()
+                self._create_transactions(3)
+                small, _ = self._count_queries(params)
+                self._create_transactions(15)
+                large, response = self._count_queries(params)
+                self.assertEqual(len(response.data['results']), 18)
+                self.assertEqual(small, large)
+
+    def test_lean_serializer_returns_flat_rows(self):
+        self._create_transactions(1)
+        _, response = self._count_queries({'lean': 'true'})
+        row = response.data['results'][0]
+
+        self.assertEqual(row['category_id'], self.food.id)
+        self.assertEqual(row['category_name'], 'Food')
+        self.assertEqual(row['source_account_name'], 'Bank')
+        self.assertEqual(row['destination_account_id'], self.card.id)
+        self.assertCountEqual(row['tags'], ['monthly', 'food'])
+
+
+class TransactionKeysetPaginationTests(OrganizationAPITestCase):
+    url = '/api/transactions/'
+
+    def setUp(self):
+        super().setUp()
+        # Varias transacciones por día para ejercitar el desempate por id
+        for i in range(7):
+            Transaction.objects.create(
+                type='EXPENSE', amount=Decimal('1.00'), date=date(2025, 6, 1 + i // 2),
+                organization=self.org, created_by=self.user
+            )
+        self.expected = list(Transaction.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+    def _ids(self, response):
+        return [row['id'] for row in response.data['results']]
+
+    def test_walks_forward_and_back_without_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 3})
+        self.assertNotIn('count', first.data)
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries))
+        self.assertIsNone(first.data['previous'])
+
+        second = self.client.get(first.data['next'])
+        third = self.client.get(second.data['next'])
+        self.assertEqual(self._ids(first) + self._ids(second) + self._ids(third), self.expected)
+        self.assertIsNone(third.data['next'])
+
+        back = self.client.get(third.data['previous'])
+        self.assertEqual(self._ids(back), self._ids(second))
+
+    def test_invalid_cursor_returns_not_found(self):
+        response = self.client.get(self.url, {'pagination': 'cursor', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class TransactionSummaryTests(OrganizationAPITestCase):
+    url = '/api/transactions/summary/'
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.food = Category.objects.create(name='Food', organization=self.org)
+        for amount, type, day in (('100.00', 'INCOME', 1), ('30.00', 'EXPENSE', 2), ('20.00', 'EXPENSE', 40)):
+            Transaction.objects.create(
+                type=type, amount=Decimal(amount), date=date(2025, 6, 1) + timedelta(days=day),
+                category=self.food, organization=self.org, created_by=self.user
+            )
+
+    def test_summary_totals_and_breakdowns(self):
+        data = self.client.get(self.url).data
+
+        self.assertEqual(data['income'], Decimal('100.00'))
+        self.assertEqual(data['expenses'], Decimal('50.00'))
+        self.assertEqual(data['net'], Decimal('50.00'))
+        self.assertEqual(data['total_transactions'], 3)
+        self.assertEqual([row['month'] for row in data['by_month']], ['2025-06', '2025-07'])
+        self.assertEqual(data['by_category'][0]['category_name'], 'Food')
+        self.assertEqual(data['by_category'][0]['expenses'], Decimal('50.00'))
+        self.assertEqual({row['type']: row['count'] for row in data['by_type']}, {'INCOME': 1, 'EXPENSE': 2})
+
+    def test_summary_runs_a_single_aggregate_query(self):
+        queryset = Transaction.objects.filter(organization=self.org)
+        with self.assertNumQueries(1):
+            TransactionSummaryService.summarize(queryset)
+
+    def test_cached_summary_is_invalidated_on_write(self):
+        self.client.get(self.url, {'type': 'EXPENSE'})
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(self.url, {'type': 'EXPENSE'})
+        self.assertFalse(any('GROUP BY' in query['sql'] for query in cached))
+
+        Transaction.objects.create(
+            type='EXPENSE', amount=Decimal('5.00'), date=date(2025, 6, 3),
+            organization=self.org, created_by=self.user
+        )
+        self.assertEqual(self.client.get(self.url, {'type': 'EXPENSE'}).data['expenses'], Decimal('55.00'))
+
+    def test_summary_cached_before_commit_is_invalidated_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                type='EXPENSE', amount=Decimal('5.00'), date=date(2025, 6, 3),
+                organization=self.org, created_by=self.user
+            )
+            # Un lector concurrente cachea el resumen previo al commit con la versión ya incrementada
+            stale_key = TransactionSummaryService.get_cache_key(self.org.id, {})
+            cache.set(stale_key, {'expenses': Decimal('50.00')})
+
+        self.assertNotEqual(TransactionSummaryService.get_cache_key(self.org.id, {}), stale_key)
+
+    def test_deleting_a_category_invalidates_the_cached_summary(self):
+        self.assertEqual(self.client.get(self.url).data['by_category'][0]['category_name'], 'Food')
+
+        self.food.delete()
+
+        self.assertNotIn('Food', [row['category_name'] for row in self.client.get(self.url).data['by_category']])
+
+
+class TransactionImportTests(OrganizationAPITestCase):
+    url = '/api/transactions/import/'
+
+    def setUp(self):
+        super().setUp()
+        self.food = Category.objects.create(name='Food', organization=self.org)
+        Tag.objects.create(name='groceries')
+
+    def upload(self, name, content):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(self.url, {'file': upload}, format='multipart')
+
+    def test_csv_import_bulk_inserts_tags_and_ledger(self):
+        csv_content = (
+            "date,amount,type,description,category_id,bank_transaction_id,tags\n"
+            f"2025-06-01,10.00,EXPENSE,Market,{self.food.id},B-1,groceries;weekly\n"
+            f"2025-06-02,5.50,EXPENSE,Bakery,{self.food.id},B-2,weekly\n"
+            f"2025-06-02,5.50,EXPENSE,Bakery,{self.food.id},B-2,weekly\n"
+            "not-a-date,1.00,EXPENSE,Broken,,B-3,\n"
+        )
+        response = self.upload('statement.csv', csv_content)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['duplicates'], 1)
+        self.assertEqual(response.data['invalid'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 4)
+
+        market = Transaction.objects.get(bank_transaction_id='B-1')
+        self.assertTrue(market.is_imported)
+        self.assertEqual(sorted(market.tags.values_list('name', flat=True)), ['groceries', 'weekly'])
+        self.assertEqual(Tag.objects.filter(name='weekly').count(), 1)
+        self.assertEqual(
+            MonthlyCategorySpend.objects.get(category=self.food, period='2025-06').amount, Decimal('15.50')
+        )
+
+        # Reimportar el mismo extracto no duplica transacciones
+        response = self.upload('statement.csv', csv_content)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(Transaction.objects.filter(organization=self.org).count(), 2)
+
+    def test_ofx_import(self):
+        ofx_content = (
+            "OFXHEADER:100\nDATA:OFXSGML\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n"
+            "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250603120000<TRNAMT>-42.10<FITID>F-1<NAME>Shell<MEMO>Fuel\n"
+            "</STMTTRN>\n"
+            "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250604<TRNAMT>1500.00<FITID>F-2<NAME>Payroll\n"
+            "</STMTTRN>\n"
+            "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n"
+        )
+        response = self.upload('statement.ofx', ofx_content)
+
+        self.assertEqual(response.data['created'], 2)
+        fuel = Transaction.objects.get(bank_transaction_id='F-1')
+        self.assertEqual((fuel.type, fuel.amount, fuel.date), ('EXPENSE', Decimal('42.10'), date(2025, 6, 3)))
+        self.assertEqual((fuel.merchant, fuel.description), ('Shell', 'Fuel'))
+        self.assertEqual(Transaction.objects.get(bank_transaction_id='F-2').type, 'INCOME')
+
+    def test_ofx_is_parsed_incrementally(self):
+        ofx_content = (
+            "<OFX><BANKTRANLIST>"
+            + "".join(
+                f"<STMTTRN><DTPOSTED>202506{day:02d}<TRNAMT>-{day}.00<FITID>F-{day}<NAME>Shop {day}"
+                for day in range(1, 11)
+            )
+            + "</BANKTRANLIST></OFX>"
+        ).encode()
+        rows = list(parse_ofx(io.BytesIO(ofx_content), block_size=7))
+
+        self.assertEqual(rows, list(parse_ofx(ofx_content)))
+        self.assertEqual([row['bank_transaction_id'] for row in rows], [f'F-{day}' for day in range(1, 11)])
+
+    def test_imported_status_sets_reconciled_and_voided_timestamps(self):
+        self.upload('statement.csv', (
+            "date,amount,status,bank_transaction_id\n"
+            "2025-06-01,10.00,reconciled,S-1\n"
+            "2025-06-02,20.00,void,S-2\n"
+            "2025-06-03,30.00,pending,S-3\n"
+        ))
+
+        reconciled, void, pending = Transaction.objects.order_by('bank_transaction_id')
+        self.assertIsNotNone(reconciled.reconciled_at)
+        self.assertIsNone(reconciled.voided_at)
+        self.assertIsNotNone(void.voided_at)
+        self.assertIsNone(pending.reconciled_at)
+        self.assertIsNone(pending.voided_at)
+
+
+class FakeParallelBulk:
+    """Sustituto de elasticsearch.helpers.parallel_bulk: guarda las acciones y confirma cada documento."""
+
+    def __init__(self, fail_after=None):
+        self.actions = []
+        self.fail_after = fail_after
+
+    def __call__(self, client, actions, thread_count=4, chunk_size=500, **kwargs):
+        for action in actions:
+            if self.fail_after is not None and len(self.actions) >= self.fail_after:
+                raise ConnectionError('Elasticsearch no disponible')
+            self.actions.append(action)
+            yield True, {'index': {'_id': str(action['_id']), 'status': 201}}
+
+
+class TransactionIndexingTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Index Org')
+        tags = [Tag.objects.create(name='rent'), Tag.objects.create(name='fixed')]
+        self.transactions = []
+        for index in range(5):
+            transaction = Transaction.objects.create(
+                organization=self.org, type='EXPENSE', amount=Decimal('10.00') + index,
+                date=date(2025, 6, index + 1), description=f'Pago {index}'
+            )
+            transaction.tags.set(tags[:index % 3])
+            self.transactions.append(transaction)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.checkpoint = os.path.join(self.tmpdir.name, 'checkpoint.json')
+
+    def test_streams_documents_with_prefetched_tags(self):
+        fake_bulk = FakeParallelBulk()
+        indexer = TransactionIndexer(client=object(), chunk_size=2, workers=3)
+        # Una consulta (cursor) de transacciones + una de tags por bloque de 2, sin consultas por documento
+        with self.assertNumQueries(4), patch('transactions.indexing.parallel_bulk', fake_bulk):
+            stats = indexer.run()
+
+        self.assertEqual(stats['indexed'], 5)
+        self.assertEqual(stats['last_pk'], self.transactions[-1].pk)
+        self.assertIsNotNone(stats['docs_per_second'])
+        documents = {action['_id']: action['_source'] for action in fake_bulk.actions}
+        self.assertEqual(documents[self.transactions[2].pk]['tags'], ['rent', 'fixed'])
+        self.assertEqual(documents[self.transactions[0].pk]['tags'], [])
+        self.assertEqual(documents[self.transactions[0].pk]['amount'], 10.0)
+
+    def test_resumes_from_checkpoint(self):
+        indexer = TransactionIndexer(client=object(), chunk_size=2, checkpoint_path=self.checkpoint)
+        with patch('transactions.indexing.parallel_bulk', FakeParallelBulk(fail_after=3)):
+            with self.assertRaises(ConnectionError):
+                indexer.run()
+        # Solo el primer bloque completo quedó confirmado
+        self.assertEqual(indexer.checkpoint.load()['last_pk'], self.transactions[1].pk)
+
+        fake_bulk = FakeParallelBulk()
+        with patch('transactions.indexing.parallel_bulk', fake_bulk):
+            stats = indexer.run(resume=True)
+
+        self.assertEqual([action['_id'] for action in fake_bulk.actions], [t.pk for t in self.transactions[2:]])
+        self.assertEqual((stats['indexed'], stats['resumed_from']), (5, self.transactions[1].pk))
+
+
+class FakeIndicesClient:
+    """API de índices de Elasticsearch en memoria: índices, settings y alias."""
+
+    def __init__(self):
+        self.indices = {}
+        self.aliases = {}
+        self.alias_updates = []
+
+    def exists(self, index):
+        return index in self.indices
+
+    def exists_alias(self, name):
+        return name in self.aliases.values()
+
+    def get_alias(self, name):
+        return {index: {'aliases': {name: {}}} for index, alias in self.aliases.items() if alias == name}
+
+    def get(self, index):
+        prefix = index.rstrip('*')
+        return {name: {} for name in self.indices if name.startswith(prefix)}
+
+    def create(self, index, settings=None, mappings=None):
+        self.indices[index] = {'settings': dict(settings or {}), 'mappings': mappings}
+
+    def put_settings(self, index, settings):
+        self.indices[index]['settings'].update(settings['index'])
+
+    def refresh(self, index):
+        pass
+
+    def delete(self, index):
+        self.indices.pop(index)
+        self.aliases.pop(index, None)
+
+    def update_aliases(self, actions):
+        self.alias_updates.append(actions)
+        for action in actions:
+            if 'remove' in action:
+                self.aliases.pop(action['remove']['index'])
+            elif 'remove_index' in action:
+                self.delete(action['remove_index']['index'])
+            else:
+                self.aliases[action['add']['index']] = action['add']['alias']
+
+
+class FakeElasticsearch:
+    def __init__(self):
+        self.indices = FakeIndicesClient()
+
+
+class TransactionIndexAliasTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Alias Org')
+        self.transactions = [
+            Transaction.objects.create(
+                organization=self.org, type='EXPENSE', amount=Decimal('5.00'), date=date(2025, 6, day)
+            )
+            for day in (1, 2, 3)
+        ]
+        self.client = FakeElasticsearch()
+        self.manager = TransactionIndexManager(client=self.client)
+
+    def test_rebuild_swaps_alias_atomically_and_restores_settings(self):
+        oldest = self.manager.ensure_alias()
+        self.manager.swap_alias(self.manager.create_index(self.manager.new_index_name()))
+        previous = self.manager.get_alias_indices()
+        self.client.indices.alias_updates.clear()
+
+        seen_settings = []
+        documents = {}
+        building = []
+
+        def parallel_bulk(client, actions, **kwargs):
+            for action in actions:
+                seen_settings.append(dict(self.client.indices.indices[action['_index']]['settings']))
+                if action['_id'] == self.transactions[0].pk:
+                    # Escritura y borrado concurrentes durante la carga
+                    Transaction.objects.filter(pk=self.transactions[1].pk).update(modified_at=timezone.now())
+                    Transaction.objects.filter(pk=self.transactions[2].pk).delete()
+                documents[action['_id']] = action['_routing']
+                building.append(TransactionIndexManager.get_building_index())
+                yield True, {'index': {'_id': str(action['_id'])}}
+
+        def scan(client, index, **kwargs):
+            return [{'_id': str(pk), '_routing': routing} for pk, routing in documents.items()]
+
+        deletes = []
+
+        def bulk(client, actions, **kwargs):
+            deletes.extend(actions)
+            return len(deletes), []
+
+        with patch('transactions.indexing.parallel_bulk', parallel_bulk), \
+                patch('transactions.indexing.scan', scan), patch('transactions.indexing.bulk', bulk):
+            stats = self.manager.rebuild(keep=1)
+
+        new_index = stats['index']
+        self.assertEqual(self.manager.get_alias_indices(), [new_index])
+        # Un único update_aliases que quita el índice anterior y añade el nuevo
+        self.assertEqual(self.client.indices.alias_updates, [[
+            {'remove': {'index': previous[0], 'alias': 'transactions'}},
+            {'add': {'index': new_index, 'alias': 'transactions', 'is_write_index': True}},
+        ]])
+        self.assertEqual(seen_settings[0]['refresh_interval'], '-1')
+        self.assertEqual(seen_settings[0]['number_of_replicas'], 0)
+        self.assertEqual(self.client.indices.indices[new_index]['settings']['refresh_interval'], '1s')
+        self.assertEqual((stats['indexed'], stats['catch_up'], stats['pruned']), (3, 1, 1))
+        # Las señales escriben también en el índice nuevo solo mientras se construye
+        self.assertEqual(set(building), {new_index})
+        self.assertIsNone(TransactionIndexManager.get_building_index())
+        self.assertEqual(deletes, [{'_op_type': 'delete', '_index': new_index, '_id': self.transactions[2].pk,
+                                    '_routing': str(self.org.id)}])
+        # Se conserva el índice anterior para volver atrás y se borra el más antiguo
+        self.assertEqual(stats['deleted'], [oldest])
+        self.assertIn(previous[0], self.client.indices.indices)
+
+    def test_replaces_legacy_unversioned_index(self):
+        self.client.indices.create('transactions')
+        name = self.manager.ensure_alias()
+        self.assertNotIn('transactions', self.client.indices.indices)
+        self.assertEqual(self.manager.get_alias_indices(), [name])
+        # El índice antiguo se borra en el mismo update_aliases que crea el alias
+        self.assertEqual(self.client.indices.alias_updates, [[
+            {'add': {'index': name, 'alias': 'transactions', 'is_write_index': True}},
+            {'remove_index': {'index': 'transactions'}},
+        ]])
+
+
+class SearchIndexQueueTests(TestCase):
+    def setUp(self):
+        self.org = Organization.objects.create(name='Queue Org')
+        self.tag = Tag.objects.create(name='travel')
+
+    def create(self, **kwargs):
+        return Transaction.objects.create(
+            organization=self.org, type='EXPENSE', amount=Decimal('7.00'), date=date(2025, 6, 1), **kwargs
+        )
+
+    def test_changes_are_deduplicated_and_sent_once_per_commit(self):
+        with patch('transactions.tasks.update_search_index.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.create(description='Hotel')
+                first.description = 'Hotel Madrid'
+                first.save()
+                first.tags.add(self.tag)
+                second = self.create()
+                self.tag.transactions.add(second)
+            self.assertEqual(delay.call_count, 1)
+            delay.assert_called_with([[first.pk, self.org.id], [second.pk, self.org.id]])
+
+            with self.settings(ELASTICSEARCH_SIGNAL_BATCH_SIZE=1), self.captureOnCommitCallbacks(execute=True):
+                first.delete()
+                second.save()
+            self.assertEqual(delay.call_count, 3)
+
+    def test_process_indexes_existing_and_deletes_missing_in_one_bulk(self):
+        transaction = self.create(description='Tren')
+        transaction.tags.add(self.tag)
+        bulk_calls = []
+
+        def fake_bulk(client, actions, **kwargs):
+            bulk_calls.append((list(actions), kwargs))
+            return len(bulk_calls[-1][0]), [{'delete': {'_id': '999', 'status': 404}}]
+
+        with patch('transactions.indexing.bulk', fake_bulk):
+            stats = SearchIndexQueue.process(
+                [[transaction.pk, self.org.id], [999, self.org.id], [transaction.pk, self.org.id]], client=object()
+            )
+
+        self.assertEqual(stats, {'indexed': 1, 'deleted': 1, 'errors': 0})
+        self.assertEqual(len(bulk_calls), 1)
+        actions, options = bulk_calls[0]
+        self.assertEqual([(a['_op_type'], a['_id']) for a in actions], [('index', transaction.pk), ('delete', 999)])
+        self.assertEqual(actions[0]['_source']['tags'], ['travel'])
+        self.assertEqual(actions[0]['_index'], 'transactions')
+        # Documentos y borrados van al shard de su organización
+        self.assertEqual([a['_routing'] for a in actions], [str(self.org.id)] * 2)
+        self.assertEqual(actions[0]['_source']['organization_id'], str(self.org.id))
+        self.assertFalse(options['refresh'])
+
+    def test_process_also_writes_to_the_index_being_built(self):
+        transaction = self.create()
+        bulk_calls = []
+
+        def fake_bulk(client, actions, **kwargs):
+            bulk_calls.append(list(actions))
+            return len(bulk_calls[-1]), []
+
+        cache.set(TransactionIndexManager.BUILDING_INDEX_CACHE_KEY, 'transactions-new')
+        self.addCleanup(cache.delete, TransactionIndexManager.BUILDING_INDEX_CACHE_KEY)
+        with patch('transactions.indexing.bulk', fake_bulk):
+            stats = SearchIndexQueue.process([[transaction.pk, self.org.id], [999, self.org.id]], client=object())
+
+        self.assertEqual(stats, {'indexed': 1, 'deleted': 1, 'errors': 0})
+        self.assertEqual(
+            [(a['_op_type'], a['_index'], a['_id']) for a in bulk_calls[0]],
+            [('index', 'transactions', transaction.pk), ('index', 'transactions-new', transaction.pk),
+             ('delete', 'transactions', 999), ('delete', 'transactions-new', 999)]
+        )
+
+    def test_tag_changes_touch_modified_at(self):
+        old = timezone.now() - timedelta(days=1)
+
+        with patch('transactions.tasks.update_search_index.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                transaction = self.create()
+            Transaction.objects.filter(pk=transaction.pk).update(modified_at=old)
+            with self.captureOnCommitCallbacks(execute=True):
+                transaction.tags.add(self.tag)
+            transaction.refresh_from_db()
+            self.assertGreater(transaction.modified_at, old)
+
+            Transaction.objects.filter(pk=transaction.pk).update(modified_at=old)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.tag.transactions.clear()
+            transaction.refresh_from_db()
+            self.assertGreater(transaction.modified_at, old)
+            # Quitar el tag desde el propio tag también reindexa la transacción
+            delay.assert_called_with([[transaction.pk, None]])
+
+
+class FakeSearchResponse:
+    """Respuesta mínima de Search.execute() para la vista de búsqueda."""
+
+    def __init__(self, hits):
+        self.hits = SimpleNamespace(total=SimpleNamespace(value=len(hits)))
+        self._hits = [
+            SimpleNamespace(meta=SimpleNamespace(id=str(pk)), to_dict=lambda source=source: source)
+            for pk, source in hits
+        ]
+
+    def __iter__(self):
+        return iter(self._hits)
+
+
+class TransactionSearchTests(OrganizationAPITestCase):
+    def test_service_requires_organization_and_routes_to_its_shard(self):
+        with self.assertRaises(ValueError):
+            TransactionSearchService(None)
+
+        service = TransactionSearchService(self.org, using=object()).filter_by_accounts([3])
+        query = service.search.to_dict()['query']['bool']['filter']
+        self.assertEqual(query[0], {'term': {'organization_id': str(self.org.id)}})
+        self.assertEqual(query[1]['bool']['should'], [
+            {'terms': {'source_account_id': ['3']}}, {'terms': {'destination_account_id': ['3']}},
+        ])
+        self.assertEqual(service.search._params, {'routing': str(self.org.id)})
+
+    def test_search_endpoint_is_scoped_to_request_organization(self):
+        searches = []
+
+        def execute(search):
+            searches.append(search)
+            return FakeSearchResponse([(7, {'description': 'Hotel', 'organization_id': str(self.org.id)})])
+
+        with patch('transactions.services.get_client', return_value=object()), \
+                patch('elasticsearch_dsl.Search.execute', execute):
+            response = self.client.get('/api/transactions/search/', {'q': 'hotel', 'type': 'EXPENSE', 'page_size': 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'id': 7, 'description': 'Hotel', 'organization_id': str(self.org.id)}])
+        body = searches[0].to_dict()
+        self.assertIn({'term': {'organization_id': str(self.org.id)}}, body['query']['bool']['filter'])
+        self.assertEqual(body['size'], 5)
+        self.assertEqual(searches[0]._params['routing'], str(self.org.id))
+
+    def test_search_endpoint_rejects_unknown_sort_field(self):
+        response = self.client.get('/api/transactions/search/', {'sort': 'organization_id'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_endpoint_rejects_invalid_filters(self):
+        for params in (
+            {'min_amount': 'abc'}, {'max_amount': 'NaN'}, {'start_date': '2025-13-01'},
+            {'end_date': 'ayer'}, {'account': 'x'}, {'page': 101, 'page_size': 100},
+        ):
+            with self.subTest(params=params), patch('elasticsearch_dsl.Search.execute') as execute:
+                response = self.client.get('/api/transactions/search/', params)
+                self.assertEqual(response.status_code, 400)
+                execute.assert_not_called()
+
+
+@override_settings(TRANSACTION_SEARCH_BACKEND='postgres')
+class PostgresTransactionSearchTests(OrganizationAPITestCase):
+    def setUp(self):
+        super().setUp()
+        other_org = Organization.objects.create(name='Other Org')
+        travel = Tag.objects.create(name='travel')
+        self.hotel = Transaction.objects.create(
+            organization=self.org, type='EXPENSE', amount=Decimal('120.00'), date=date(2025, 6, 3),
+            description='Hotel Madrid', merchant='Booking'
+        )
+        self.hotel.tags.add(travel)
+        self.salary = Transaction.objects.create(
+            organization=self.org, type='INCOME', amount=Decimal('2000.00'), date=date(2025, 5, 28),
+            description='Nómina', merchant='Acme'
+        )
+        self.books = Transaction.objects.create(
+            organization=self.org, type='EXPENSE', amount=Decimal('30.00'), date=date(2025, 6, 10),
+            description='Libros sobre hoteles', merchant='Amazon'
+        )
+        Transaction.objects.create(
+            organization=other_org, type='EXPENSE', amount=Decimal('99.00'), date=date(2025, 6, 4),
+            description='Hotel Roma', merchant='Booking'
+        )
+
+    def test_backend_is_selected_by_setting(self):
+        self.assertIsInstance(get_search_service(self.org), PostgresTransactionSearchService)
+        with self.assertRaises(ImproperlyConfigured):
+            get_search_service(self.org, backend='solr')
+        with self.assertRaises(ValueError):
+            PostgresTransactionSearchService(None)
+
+    def test_search_endpoint_filters_and_aggregates_in_the_database(self):
+        response = self.client.get('/api/transactions/search/', {
+            'type': 'EXPENSE', 'tag': 'travel', 'aggregations': 'true'
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['id'], self.hotel.pk)
+        self.assertEqual(data['results'][0]['tags'], ['travel'])
+        self.assertEqual(data['aggregations']['por_tipo']['buckets'], [{'key': 'EXPENSE', 'doc_count': 1}])
+
+        response = self.client.get('/api/transactions/search/', {
+            'sort': 'amount', 'order': 'asc', 'page_size': 2, 'aggregations': 'true'
+        })
+        data = response.json()
+        # Solo la organización del request
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([row['id'] for row in data['results']], [self.books.pk, self.hotel.pk])
+        self.assertEqual(data['aggregations']['estadisticas_monto']['sum'], 2150.0)
+        self.assertEqual([bucket['key_as_string'] for bucket in data['aggregations']['por_mes']['buckets']],
+                         ['2025-05', '2025-06'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Búsqueda de texto de PostgreSQL')
+    def test_ranked_full_text_and_trigram_search(self):
+        service = PostgresTransactionSearchService(self.org).search_by_description('hotel')
+        sql = str(service.queryset.query)
+        # @@ (tsvector) y % (pg_trgm) los resuelven los índices GIN; ILIKE recorrería la tabla
+        self.assertIn('@@', sql)
+        self.assertNotIn('LIKE', sql.upper())
+
+        results = service.execute()
+        self.assertEqual(results[0], self.hotel)
+        self.assertNotIn(self.salary, results)
+
+        # Errores de escritura en el comercio se resuelven por trigramas
+        results = PostgresTransactionSearchService(self.org).search_by_description('amazn').execute()
+        self.assertEqual(results, [self.books])
+
+        response = self.client.get('/api/transactions/', {'search': 'madrid'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [self.hotel.pk])
+
+    def test_list_search_keeps_substring_matching(self):
+        # Palabras a medias en la descripción y fragmentos del comercio siguen encontrando la transacción
+        for search, expected in (('madr', self.hotel), ('amaz', self.books), ('oteles', self.books)):
+            with self.subTest(search=search):
+                response = self.client.get('/api/transactions/', {'search': search})
+                self.assertEqual([row['id'] for row in response.json()['results']], [expected.pk])
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TransactionViewSet, TagViewSet, CategoryViewSet, BudgetViewSet
+from .views import TransactionViewSet, TagViewSet, CategoryViewSet, BudgetViewSet, TransactionSearchView
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='categories')
@@ -9,5 +9,7 @@ router.register(r'budgets', BudgetViewSet, basename='budgets')
 router.register(r'', TransactionViewSet, basename='transactions')
 
 urlpatterns = [
+    # Antes del router: si no, 'search/' se resolvería como el detalle de una transacción
+    path('search/', TransactionSearchView.as_view(), name='transaction-search'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
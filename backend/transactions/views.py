@@ -33,14 +33,29 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Sum, Count, Q
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.views import APIView
+from elasticsearch import ApiError, TransportError
+from django.db.models import Sum, Count, Max, Q, OuterRef, Prefetch, Subquery, Value, DecimalField
+from django.db.models.functions import Coalesce
 from django.db.models.functions import ExtractYear, ExtractMonth
 from django.utils import timezone
-from .models import Transaction, Category, Tag, Budget
-from .serializers import TransactionSerializer, CategorySerializer, TagSerializer, BudgetSerializer
+from django.utils.dateparse import parse_date
+from django.utils.http import parse_etags, quote_etag
+import hashlib
+from decimal import Decimal, InvalidOperation
+import logging
+from .models import Transaction, Category, Tag, Budget, MonthlyCategorySpend
+from .serializers import TransactionSerializer, TransactionListSerializer, CategorySerializer, CategoryTreeSerializer, TagSerializer, BudgetSerializer
 from organizations.models import Organization
 from accounts.access_control import require_access, has_pro_access
 from rest_framework.pagination import PageNumberPagination
+from .pagination import TransactionKeysetPagination
+from .summary import TransactionSummaryService
+from .importers import TransactionImporter, get_parser
+from .services import get_search_service
+
+logger = logging.getLogger(__name__)
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
@@ -53,6 +68,18 @@ class TransactionViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = StandardResultsSetPagination
 
+    @property
+    def paginator(self):
+        # Paginación por cursor opcional (?pagination=cursor): sin OFFSET ni COUNT(*)
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = TransactionKeysetPagination()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     @require_access(required_roles=["admin", "accountant"], allow_accountant_always=True)
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
@@ -80,13 +107,29 @@ class TransactionViewSet(viewsets.ModelViewSet):
             
         search = self.request.query_params.get('search', None)
         if search:
+            # Coincidencia por subcadena; la búsqueda indexada (texto completo) está en /search/
             queryset = queryset.filter(
                 Q(description__icontains=search) |
                 Q(merchant__icontains=search)
             )
-            
+
+        # Plan de consultas: relaciones en el mismo SELECT y tags/subcategorías precargados,
+        # para que el costo de una página no dependa del número de filas
+        queryset = queryset.select_related(
+            'category', 'category__parent', 'source_account', 'destination_account'
+        ).prefetch_related(
+            'tags',
+            Prefetch('category__children', queryset=Category.objects.order_by('id')),
+        )
+
         return queryset.order_by('-date', '-id')
 
+    def get_serializer_class(self):
+        # Variante plana para listados: ?lean=true
+        if self.action == 'list' and self.request.query_params.get('lean', 'false').lower() == 'true':
+            return TransactionListSerializer
+        return super().get_serializer_class()
+
     @require_access(required_roles=["admin", "accountant"], allow_accountant_always=True)
     def perform_create(self, serializer):
         serializer.save(
@@ -123,18 +166,39 @@ class TransactionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def summary(self, request):
         queryset = self.get_queryset()
-        
-        # Calcular totales
-        income = queryset.filter(type='INCOME').aggregate(total=Sum('amount'))['total'] or 0
-        expenses = queryset.filter(type='EXPENSE').aggregate(total=Sum('amount'))['total'] or 0
-        net = income - expenses
-        
-        return Response({
-            'income': income,
-            'expenses': expenses,
-            'net': net,
-            'total_transactions': queryset.count()
-        })
+
+        # Totales y desgloses (tipo, estado, mes, categoría) en una sola consulta,
+        # cacheados por filtros hasta la próxima escritura en la organización
+        params = {
+            key: values for key, values in request.query_params.lists()
+            if key not in ('cache', 'page', 'page_size', 'pagination', 'cursor', 'lean')
+        }
+        summary = TransactionSummaryService.get_summary(
+            request.organization,
+            queryset,
+            params=params,
+            use_cache=request.query_params.get('cache', 'true').lower() != 'false'
+        )
+        return Response(summary)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    @require_access(required_roles=["admin", "accountant"], allow_accountant_always=True)
+    def import_file(self, request):
+        """
+        Importación masiva de un extracto CSV u OFX (campo ``file``).
+        El formato se toma de ``file_format`` o de la extensión del archivo.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Debes adjuntar un archivo en el campo "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            parser = get_parser(request.data.get('file_format'), upload.name)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = TransactionImporter(request.organization, user=request.user)
+        stats = importer.run(parser(upload.file))
+        return Response(stats, status=status.HTTP_201_CREATED if stats['created'] else status.HTTP_200_OK)
 
 # Tag ViewSet
 class TagViewSet(viewsets.ModelViewSet):
@@ -196,10 +260,36 @@ class CategoryViewSet(viewsets.ModelViewSet):
         instance.delete()
 
     def list(self, request, *args, **kwargs):
+        if request.query_params.get('tree', 'false').lower() == 'true':
+            return self.tree(request)
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @require_access(required_roles=["admin", "accountant"], allow_accountant_always=True)
+    def tree(self, request):
+        """
+        Árbol completo de categorías de la organización en una sola consulta,
+        con ETag para que el frontend pueda reutilizar su copia en caché.
+        """
+        queryset = Category.objects.filter(organization=request.organization)
+        stats = queryset.aggregate(count=Count('id'), last_modified=Max('modified_at'))
+        last_modified = stats['last_modified'].isoformat() if stats['last_modified'] else ''
+        etag = quote_etag(hashlib.md5(
+            f"{request.organization.id}:{stats['count']}:{last_modified}".encode()
+        ).hexdigest())
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        serializer = CategoryTreeSerializer(
+            queryset.select_related('parent').order_by('name'),
+            child=CategorySerializer(),
+            context=self.get_serializer_context()
+        )
+        return Response(serializer.data, headers=headers)
+
 class BudgetViewSet(viewsets.ModelViewSet):
     serializer_class = BudgetSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -221,6 +311,20 @@ class BudgetViewSet(viewsets.ModelViewSet):
         if category_id:
             queryset = queryset.filter(category_id=category_id)
         
+        # Gasto acumulado leído del ledger en la misma consulta (evita N+1 por presupuesto)
+        spent = MonthlyCategorySpend.objects.filter(
+            organization_id=OuterRef('organization_id'),
+            category_id=OuterRef('category_id'),
+            period=OuterRef('period')
+        ).values('amount')[:1]
+        queryset = queryset.annotate(
+            ledger_spent=Coalesce(
+                Subquery(spent),
+                Value(0),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            )
+        )
+
         return queryset.select_related('category', 'organization', 'created_by')
 
     @require_access(required_roles=["admin", "accountant"], allow_accountant_always=True)
@@ -233,4 +337,95 @@ class BudgetViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         if not hasattr(self.request, 'organization'):
             raise PermissionDenied("No se ha especificado una organización. Por favor, incluye el header 'X-Organization-ID' en tu solicitud.")
-        serializer.save()
\ No newline at end of file
+        serializer.save()
+
+
+# Búsqueda (Elasticsearch o PostgreSQL, según TRANSACTION_SEARCH_BACKEND)
+class TransactionSearchView(APIView):
+    """
+    Búsqueda de transacciones de la organización del request.
+
+    Parámetros: ``q``, ``min_amount``, ``max_amount``, ``start_date``, ``end_date``,
+    ``days``, ``type`` / ``account`` / ``tag`` (repetibles), ``sort``, ``order``,
+    ``page``, ``page_size`` y ``aggregations=true``.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+    MAX_RESULT_WINDOW = 10000  # index.max_result_window de Elasticsearch
+    SORT_FIELDS = ('date', 'amount', 'description.raw', 'type')
+
+    @require_access(required_roles=["admin", "accountant"], allow_accountant_always=True)
+    def get(self, request):
+        params = request.query_params
+        try:
+            page = max(int(params.get('page', 1)), 1)
+            page_size = min(max(int(params.get('page_size', self.PAGE_SIZE)), 1), self.MAX_PAGE_SIZE)
+            days = int(params['days']) if params.get('days') else None
+            accounts = [int(account) for account in params.getlist('account')]
+        except ValueError:
+            return Response({'error': 'page, page_size, days y account deben ser enteros'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if page * page_size > self.MAX_RESULT_WINDOW:
+            return Response({'error': f'page * page_size no puede superar {self.MAX_RESULT_WINDOW}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            min_amount = self._parse_amount(params, 'min_amount')
+            max_amount = self._parse_amount(params, 'max_amount')
+            start_date = self._parse_date(params, 'start_date')
+            end_date = self._parse_date(params, 'end_date')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        sort = params.get('sort')
+        if sort and sort not in self.SORT_FIELDS:
+            return Response({'error': f"sort debe ser uno de: {', '.join(self.SORT_FIELDS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # El servicio filtra siempre por la organización (en Elasticsearch, además, la enruta a su shard)
+        service = get_search_service(request.organization)
+        if params.get('q'):
+            service.search_by_description(params['q'])
+        service.filter_by_amount_range(min_amount, max_amount)
+        service.filter_by_date_range(start_date, end_date, days=days)
+        service.filter_by_types(params.getlist('type'))
+        service.filter_by_accounts(accounts)
+        service.filter_by_tags(params.getlist('tag'))
+        if sort or not params.get('q'):
+            # Con texto y sin orden explícito se ordena por relevancia
+            service.sort_by(sort or 'date', 'asc' if params.get('order') == 'asc' else 'desc')
+        service.paginate(page=page, size=page_size)
+        if params.get('aggregations', '').lower() == 'true':
+            service.add_aggregations()
+
+        try:
+            page_data = service.get_page()
+        except (ApiError, TransportError) as e:
+            logger.error(f"Error en la búsqueda de transacciones: {e}")
+            return Response({'error': 'La búsqueda no está disponible en este momento'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        return Response(dict(page_data, page=page, page_size=page_size))
+
+    @staticmethod
+    def _parse_amount(params, name):
+        if not params.get(name):
+            return None
+        try:
+            amount = Decimal(params[name])
+        except InvalidOperation:
+            amount = None
+        if amount is None or not amount.is_finite():
+            raise ValueError(f'{name} debe ser un número')
+        return amount
+
+    @staticmethod
+    def _parse_date(params, name):
+        if not params.get(name):
+            return None
+        try:
+            value = parse_date(params[name])
+        except ValueError:
+            value = None
+        if value is None:
+            raise ValueError(f'{name} debe ser una fecha YYYY-MM-DD')
+        return value